@@ -0,0 +1,121 @@
+"""
+Benchmark concurrent-session throughput of sync vs async graph nodes.
+
+Builds a coordinator -> planner -> supervisor -> reporter chain, mirroring
+the node shapes in src/graph/nodes.py, on a fake chat model with a fixed
+per-call latency, and streams it with astream_events as the API does. Sync
+nodes (`.invoke`/`.stream`) are run by LangGraph in the default thread pool,
+so they tie up one thread per in-flight call; async nodes
+(`.ainvoke`/`.astream`) only await. No API keys are needed.
+
+Usage:
+    uv run python -m benchmarks.bench_async_nodes --sessions 100 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Any, List, Optional
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langgraph.graph import END, START, MessagesState, StateGraph
+
+
+class SlowFakeChatModel(BaseChatModel):
+    """Chat model that answers after a fixed delay, in both sync and async calls."""
+
+    latency: float = 0.2
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow-fake"
+
+    def _result(self) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="ok"))])
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self.latency)
+        return self._result()
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._result()
+
+
+NODES = ("coordinator", "planner", "supervisor", "reporter")
+
+
+def _build(llm: BaseChatModel, use_async: bool):
+    def make_node(name: str):
+        if use_async:
+
+            async def node(state: MessagesState):
+                response = await llm.ainvoke(state["messages"])
+                return {"messages": [HumanMessage(content=response.content, name=name)]}
+
+        else:
+
+            def node(state: MessagesState):
+                response = llm.invoke(state["messages"])
+                return {"messages": [HumanMessage(content=response.content, name=name)]}
+
+        return node
+
+    builder = StateGraph(MessagesState)
+    previous = START
+    for name in NODES:
+        builder.add_node(name, make_node(name))
+        builder.add_edge(previous, name)
+        previous = name
+    builder.add_edge(previous, END)
+    return builder.compile()
+
+
+async def _session(graph, session: int) -> None:
+    async for _ in graph.astream_events(
+        {"messages": [{"role": "user", "content": f"session {session}"}]},
+        version="v2",
+    ):
+        pass
+
+
+async def main(sessions: int, latency: float) -> None:
+    llm = SlowFakeChatModel(latency=latency)
+    ideal = len(NODES) * latency
+    for label, use_async in (("sync nodes", False), ("async nodes", True)):
+        graph = _build(llm, use_async)
+        start = time.perf_counter()
+        await asyncio.gather(*(_session(graph, i) for i in range(sessions)))
+        elapsed = time.perf_counter() - start
+        print(
+            f"{label:>12}: {sessions} concurrent sessions in {elapsed:.2f}s "
+            f"({sessions / elapsed:.1f} sessions/s, single session floor {ideal:.2f}s)"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument(
+        "--latency", type=float, default=0.2, help="Seconds per LLM call"
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.sessions, args.latency))
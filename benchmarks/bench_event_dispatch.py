@@ -0,0 +1,161 @@
+"""
+Micro-benchmark of per-event overhead in run_agent_workflow.
+
+Replays a synthetic LangGraph v2 event mix, shaped like a planner/researcher
+run, through:
+
+- the previous path: every event is extracted into a tuple and walked
+  through an if/elif chain with list membership tests;
+- the dispatch table used now, fed only the events that pass the
+  include_types/include_names filters pushed into astream_events.
+
+Usage:
+    uv run python -m benchmarks.bench_event_dispatch --events 200000
+"""
+
+import argparse
+import time
+import uuid
+from collections import deque
+from types import SimpleNamespace
+
+from src.constants import STREAMING_LLM_AGENTS, EventType
+from src.config import TEAM_MEMBERS
+from src.service.workflow_service import (
+    STREAM_INCLUDE_NAMES,
+    STREAM_INCLUDE_TYPES,
+    _build_dispatch_table,
+    _handle_chain_end,
+    _handle_chain_start,
+    _handle_chat_model_end,
+    _handle_chat_model_start,
+    _handle_chat_model_stream,
+    _handle_tool_end,
+    _handle_tool_start,
+)
+
+
+def _event(kind: str, run_type: str, name: str, node: str) -> dict:
+    chunk = SimpleNamespace(content="tok", id="msg-1", additional_kwargs={})
+    return {
+        "event": kind,
+        "name": name,
+        "run_id": uuid.uuid4(),
+        "run_type": run_type,
+        "data": {"chunk": chunk, "input": {}, "output": None},
+        "metadata": {"checkpoint_ns": f"{node}:abc", "langgraph_step": 3},
+    }
+
+
+def event_mix(total: int) -> list:
+    """A stream dominated by token chunks, with nested chain/prompt/parser noise."""
+    pattern = [
+        _event("on_chat_model_stream", "chat_model", "ChatOpenAI", "planner")
+    ] * 20 + [
+        _event("on_chain_start", "chain", "RunnableSequence", "researcher"),
+        _event("on_prompt_start", "prompt", "ChatPromptTemplate", "researcher"),
+        _event("on_prompt_end", "prompt", "ChatPromptTemplate", "researcher"),
+        _event("on_parser_start", "parser", "JsonOutputParser", "supervisor"),
+        _event("on_parser_end", "parser", "JsonOutputParser", "supervisor"),
+        _event("on_chain_end", "chain", "RunnableSequence", "researcher"),
+        _event("on_chat_model_start", "chat_model", "ChatOpenAI", "supervisor"),
+        _event("on_chat_model_end", "chat_model", "ChatOpenAI", "supervisor"),
+        _event("on_tool_start", "tool", "tavily_search", "researcher"),
+        _event("on_tool_end", "tool", "tavily_search", "researcher"),
+        _event("on_chain_start", "chain", "planner", "planner"),
+        _event("on_chain_end", "chain", "planner", "planner"),
+    ]
+    return (pattern * (total // len(pattern) + 1))[:total]
+
+
+def _legacy_extract(event):
+    kind = event.get("event")
+    data = event.get("data")
+    name = event.get("name")
+    metadata = event.get("metadata", {})
+    node = ""
+    if metadata.get("checkpoint_ns") is not None:
+        node = metadata.get("checkpoint_ns").split(":")[0]
+    langgraph_step = ""
+    if metadata.get("langgraph_step") is not None:
+        langgraph_step = str(metadata["langgraph_step"])
+    run_id = ""
+    if event.get("run_id") is not None:
+        run_id = str(event["run_id"])
+    return kind, data, name, node, langgraph_step, run_id
+
+
+def _legacy_process(
+    kind, data, name, node, workflow_id, step, run_id, inputs, team_members
+):
+    if kind == EventType.CHAIN_START.value and name in STREAMING_LLM_AGENTS:
+        yield from _handle_chain_start(name, workflow_id, step, inputs)
+    elif kind == EventType.CHAIN_END.value and name in STREAMING_LLM_AGENTS:
+        yield from _handle_chain_end(name, workflow_id, step)
+    elif kind == EventType.CHAT_MODEL_START.value and node in STREAMING_LLM_AGENTS:
+        yield from _handle_chat_model_start(node)
+    elif kind == EventType.CHAT_MODEL_END.value and node in STREAMING_LLM_AGENTS:
+        yield from _handle_chat_model_end(node)
+    elif kind == EventType.CHAT_MODEL_STREAM.value and node in STREAMING_LLM_AGENTS:
+        yield from _handle_chat_model_stream(data, node)
+    elif kind == EventType.TOOL_START.value and node in team_members:
+        yield from _handle_tool_start(node, name, data, workflow_id, run_id)
+    elif kind == EventType.TOOL_END.value and node in team_members:
+        yield from _handle_tool_end(node, name, data, workflow_id, run_id)
+
+
+def run_legacy(events: list) -> int:
+    out = deque(maxlen=1)
+    count = 0
+    for event in events:
+        kind, data, name, node, step, run_id = _legacy_extract(event)
+        for ydata in _legacy_process(
+            kind, data, name, node, "wf", step, run_id, [], TEAM_MEMBERS
+        ):
+            out.append(ydata)
+            count += 1
+    return count
+
+
+def run_dispatch(events: list) -> int:
+    # What astream_events still delivers with the pushed-down filters
+    include_types, include_names = set(STREAM_INCLUDE_TYPES), set(STREAM_INCLUDE_NAMES)
+    events = [
+        e
+        for e in events
+        if e["run_type"] in include_types or e["name"] in include_names
+    ]
+
+    dispatch = _build_dispatch_table("wf", [], TEAM_MEMBERS)
+    out = deque(maxlen=1)
+    count = 0
+    for event in events:
+        handler = dispatch.get(event.get("event"))
+        if handler is None:
+            continue
+        for ydata in handler(event):
+            out.append(ydata)
+            count += 1
+    return count
+
+
+def main(total: int) -> None:
+    events = event_mix(total)
+    for label, run in (
+        ("if/elif, unfiltered", run_legacy),
+        ("dispatch, filtered", run_dispatch),
+    ):
+        start = time.perf_counter()
+        produced = run(events)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{label:>20}: {total} events -> {produced} outputs in {elapsed:.3f}s "
+            f"({elapsed / total * 1e9:.0f} ns/event)"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--events", type=int, default=200000)
+    args = parser.parse_args()
+    main(args.events)
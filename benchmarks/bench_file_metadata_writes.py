@@ -0,0 +1,83 @@
+"""
+Benchmark file metadata writes under concurrent uploads.
+
+Compares the old one-commit-per-file pattern against the batched
+add_file_metadata path on a temporary WAL-mode SQLite database and prints
+rows written per second.
+
+Usage:
+    uv run python -m benchmarks.bench_file_metadata_writes --uploads 20 --files 100
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from src.database import Base, _set_sqlite_pragma
+from src.entity.entity import FileMetadata
+from src.service import file_service
+
+
+def _records(upload: int, files: int) -> list[dict]:
+    return [
+        {
+            "session_id": f"bench-{upload}",
+            "name": f"file-{i}.csv",
+            "path": f"bench-{upload}/data/file-{i}.csv",
+            "size": 1024,
+        }
+        for i in range(files)
+    ]
+
+
+async def _per_row_upload(session_factory, upload: int, files: int) -> None:
+    for record in _records(upload, files):
+        async with session_factory() as db:
+            db.add(FileMetadata(**record))
+            await db.commit()
+
+
+async def _batched_upload(upload: int, files: int) -> None:
+    await file_service.add_file_metadata(_records(upload, files))
+
+
+async def main(uploads: int, files: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_async_engine(
+            f"sqlite+aiosqlite:///{Path(tmp_dir) / 'bench.db'}",
+            pool_size=5,
+            max_overflow=10,
+        )
+        event.listen(engine.sync_engine, "connect", _set_sqlite_pragma)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        file_service.AsyncSessionLocal = session_factory
+
+        total = uploads * files
+        for label, run in (
+            ("per-row commit", lambda i: _per_row_upload(session_factory, i, files)),
+            ("batched", lambda i: _batched_upload(i, files)),
+        ):
+            start = time.perf_counter()
+            await asyncio.gather(*(run(i) for i in range(uploads)))
+            elapsed = time.perf_counter() - start
+            print(
+                f"{label:>15}: {total} rows from {uploads} concurrent uploads "
+                f"in {elapsed:.3f}s ({total / elapsed:.0f} rows/s)"
+            )
+
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--uploads", type=int, default=20)
+    parser.add_argument("--files", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.uploads, args.files))
@@ -0,0 +1,105 @@
+"""
+Benchmark of SSE throughput against uvicorn worker count.
+
+Starts a minimal SSE app (the chat stream's serialisation and framing, with
+no LLM behind it) under `uvicorn --workers N` for each N, opens many
+concurrent streams with httpx and reports events per second across all of
+them.
+
+Usage:
+    uv run python -m benchmarks.bench_sse_workers --workers 1 2 4 --clients 64
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI
+from sse_starlette.sse import EventSourceResponse
+
+app = FastAPI()
+
+
+@app.get("/stream")
+async def stream(events: int = 500):
+    async def generate():
+        for seq in range(1, events + 1):
+            # Shaped like a coalesced message delta from the chat stream
+            data = {"message_id": "m1", "delta": {"content": "token " * 8}, "seq": seq}
+            yield {"id": f"run:{seq}", "event": "message", "data": json.dumps(data)}
+
+    return EventSourceResponse(generate())
+
+
+async def _consume(client: httpx.AsyncClient, url: str) -> int:
+    count = 0
+    async with client.stream("GET", url) as response:
+        async for line in response.aiter_lines():
+            if line.startswith("data:"):
+                count += 1
+    return count
+
+
+async def _load(port: int, clients: int, events: int) -> tuple:
+    url = f"http://127.0.0.1:{port}/stream?events={events}"
+    limits = httpx.Limits(max_connections=clients)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+        start = time.perf_counter()
+        counts = await asyncio.gather(*(_consume(client, url) for _ in range(clients)))
+        return sum(counts), time.perf_counter() - start
+
+
+async def _wait_ready(port: int, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(f"http://127.0.0.1:{port}/stream?events=1")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError("Server did not start")
+
+
+def main(workers: list, clients: int, events: int, port: int) -> None:
+    for count in workers:
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "uvicorn",
+                "benchmarks.bench_sse_workers:app",
+                "--port",
+                str(port),
+                "--workers",
+                str(count),
+                "--log-level",
+                "warning",
+            ],
+            env={**os.environ, "SERVER_WORKERS": str(count)},
+        )
+        try:
+            asyncio.run(_wait_ready(port))
+            received, elapsed = asyncio.run(_load(port, clients, events))
+            print(
+                f"{count:>2} worker(s): {received} events over {clients} streams in "
+                f"{elapsed:.2f}s ({received / elapsed:,.0f} events/s)"
+            )
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    main(args.workers, args.clients, args.events, args.port)
@@ -2,7 +2,9 @@
 Server script for running the BiaGhosterCoder API.
 """
 
+import argparse
 import logging
+import os
 import uvicorn
 import sys
 
@@ -19,14 +21,29 @@ logger = logging.getLogger(__name__)
 find_and_add_target_path()
 
 if __name__ == "__main__":
-    logger.info("Starting BiaGhosterCoder API server")
+    parser = argparse.ArgumentParser(description="Run the BiaGhosterCoder API server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("SERVER_WORKERS", "1")),
+        help="Number of worker processes (default: SERVER_WORKERS or 1)",
+    )
+    args = parser.parse_args()
+
+    # Workers read this to take their share of the server-wide limits
+    os.environ["SERVER_WORKERS"] = str(args.workers)
+
+    logger.info(f"Starting BiaGhosterCoder API server with {args.workers} worker(s)")
     reload = False
     if sys.platform.startswith("win"):
         reload = False
     uvicorn.run(
         "src.api.app:app",
-        host="0.0.0.0",
-        port=8000,
+        host=args.host,
+        port=args.port,
         reload=reload,
+        workers=args.workers,
         log_level="info",
     )
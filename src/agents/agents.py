@@ -1,3 +1,12 @@
+import ghostcoder.config
+
+from src.utils.workflow_context import WorkflowScopedConfig
+
+# GhostCoder's modules take TASK_ID from this object when they are imported
+# below; the proxy resolves it to the workflow running in the current context
+if not isinstance(ghostcoder.config.ghostcoder_config, WorkflowScopedConfig):
+    ghostcoder.config.ghostcoder_config = WorkflowScopedConfig(ghostcoder.config.ghostcoder_config)
+
 from ghostcoder.graph import create_ghostcoder_agent
 from langgraph.prebuilt import create_react_agent
 
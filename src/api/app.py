@@ -8,25 +8,74 @@ import logging
 import os
 import os.path
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 
 from src.config.config import DEFAULT_WORK
-from src.database import SessionLocal, engine
+from src.database import engine
 from src.entity.entity import FileMetadata as DBFileMetadata
-from src.schema.schemas import HttpResponse, ChatRequest
-from src.utils.file_utils import save_file, get_file_path, delete_file_async, list_files_in_task
-from fastapi import HTTPException, Request
+from src.schema.schemas import (
+    HttpResponse,
+    ChatRequest,
+    UploadInitRequest,
+    UploadCompleteRequest,
+    UploadLinkRequest,
+)
+from src.utils.file_utils import (
+    save_file,
+    get_file_path,
+    delete_file_async,
+    read_text_window,
+    resolve_within,
+)
+from src.utils.anndata_utils import get_h5ad_preview
+from src.utils.archive_utils import (
+    ARCHIVE_FORMATS,
+    export_root,
+    start_export,
+    get_export_progress,
+)
+from src.utils.image_utils import get_thumbnail
+from src.utils.upload_utils import (
+    UploadOffsetMismatch,
+    init_upload,
+    get_upload_status,
+    write_chunk,
+    complete_upload,
+    link_existing_upload,
+)
+from fastapi import HTTPException, Request, Response, Query
 from fastapi import UploadFile, File, BackgroundTasks, Form
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi_offline import FastAPIOffline
+from sqlalchemy.exc import OperationalError
 
 from sse_starlette.sse import EventSourceResponse
 
+from src.api.file_responses import file_response
 from src.config import TEAM_MEMBER_CONFIGRATIONS, BROWSER_HISTORY_DIR
 from src.graph import build_graph
-from src.service.workflow_service import run_agent_workflow
+from src.service.workflow_service import run_agent_workflow, get_session_history
+from src.service.stream_service import on_disconnect
+from src.service.run_service import (
+    RemoteRun,
+    WorkflowRun,
+    follow_run,
+    get_run,
+    parse_event_id,
+    start_run,
+)
+from src.service.scheduler import (
+    RETRY_AFTER_SECONDS,
+    SchedulerFull,
+    SessionLimitExceeded,
+    scheduler,
+)
+from src.service.file_service import add_file_metadata, delete_file_metadata, write_stats
+from src.service.artifact_service import list_task_artifacts, record_uploads, delete_artifact
+from src.utils.worker_utils import WORKER_ID
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -48,7 +97,20 @@ app.add_middleware(
 )
 
 # Create database tables
-DBFileMetadata.metadata.create_all(bind=engine)
+try:
+    DBFileMetadata.metadata.create_all(bind=engine)
+except OperationalError as e:
+    # Another worker process created them at the same moment
+    logger.debug(f"Skipping table creation: {e}")
+
+
+@app.middleware("http")
+async def add_worker_id_header(request: Request, call_next):
+    """Tag responses with the worker process that served them, for diagnostics."""
+    response = await call_next(request)
+    response.headers["X-Worker-Id"] = WORKER_ID
+    return response
+
 
 @app.post("/upload/")
 async def upload_files(
@@ -65,84 +127,259 @@ async def upload_files(
 
     Returns:
         List of FileUploadResponse containing file IDs and metadata
+
+    Raises:
+        HTTPException: 400 if the session id or file name is invalid
     """
-    results = []
-    db = SessionLocal()
+    records = []
+    for file in files:
+        # Save file
+        try:
+            file_info = await save_file(session_id, file, Path(storage_path))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        records.append({
+            "session_id": session_id,
+            "name": file.filename,
+            "path": file_info["path"],
+            "size": file_info["size"],
+        })
+
+    # Save metadata for all files in one transaction
+    await add_file_metadata(records)
+    await record_uploads(session_id, records)
+
+    return HttpResponse.success([record["path"] for record in records])
+
+@app.post("/upload/init/")
+def upload_init(request: UploadInitRequest):
+    """Start a resumable chunked upload.
+
+    Args:
+        request: Session, file name and optional total size of the upload
+
+    Returns:
+        HttpResponse containing 'upload_id', 'offset' and 'chunk_size'
 
+    Raises:
+        HTTPException: 400 if the session id or file name is invalid
+    """
     try:
-        for file in files:
-            # Save file
-            file_info = await save_file(session_id, file, Path(storage_path))
+        result = init_upload(request.session_id, request.filename, request.total_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return HttpResponse.success(result)
+
+@app.post("/upload/link/")
+async def upload_link(request: UploadLinkRequest):
+    """Add a file to a session by content hash, skipping the upload if the server has it.
+
+    Clients hash the file locally and call this first; only if 'exists' is false
+    do they need to send the bytes through /upload/ or /upload/init/. Content
+    is only linked if this session, or the caller's source_session_id, holds
+    an unchanged copy of it.
+
+    Args:
+        request: Session, file name and sha256 of the content
+
+    Returns:
+        HttpResponse with 'exists' and, if true, the stored file path, size and sha256
+
+    Raises:
+        HTTPException: 400 if the session id or file name is invalid
+    """
+    try:
+        file_info = await link_existing_upload(
+            request.session_id,
+            request.filename,
+            request.sha256,
+            source_session_id=request.source_session_id,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if file_info is None:
+        return HttpResponse.success({"exists": False})
+
+    record = {
+        "session_id": file_info["session_id"],
+        "name": file_info["name"],
+        "path": file_info["path"],
+        "size": file_info["size"],
+    }
+    await add_file_metadata([record])
+    await record_uploads(file_info["session_id"], [record])
+    return HttpResponse.success({"exists": True, **file_info})
+
+@app.get("/upload/{upload_id}")
+def upload_status(upload_id: str):
+    """Get the current offset of an upload so the client can resume it.
+
+    Args:
+        upload_id: ID returned by /upload/init/
+
+    Returns:
+        HttpResponse containing the upload offset and declared size
+
+    Raises:
+        HTTPException: 404 if the upload does not exist
+    """
+    try:
+        return HttpResponse.success(get_upload_status(upload_id))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+
+@app.put("/upload/{upload_id}")
+async def upload_chunk(upload_id: str, offset: int, request: Request):
+    """Append the raw request body to an upload at the given offset.
 
-            # Save metadata to database
-            db_file = DBFileMetadata(
-                session_id=session_id,
-                name=file.filename,
-                path=file_info["path"],
-                size=file_info["size"]
-            )
-            db.add(db_file)
-            db.commit()
-            db.refresh(db_file)
+    Args:
+        upload_id: ID returned by /upload/init/
+        offset: Byte offset of this chunk, must equal the current upload offset
+        request: The FastAPI request whose body is streamed to disk
 
-            results.append(db_file.path)
+    Returns:
+        HttpResponse containing the new offset
 
-        return HttpResponse.success(results)
-    finally:
-        db.close()
+    Raises:
+        HTTPException: 404 if the upload does not exist, 409 if the offset does not
+            match (the current offset is returned in the detail), 413 if the chunk
+            exceeds the declared size
+    """
+    try:
+        new_offset = await write_chunk(upload_id, offset, request.stream())
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except UploadOffsetMismatch as e:
+        raise HTTPException(status_code=409, detail={"offset": e.expected})
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return HttpResponse.success({"upload_id": upload_id, "offset": new_offset})
+
+@app.post("/upload/{upload_id}/complete")
+async def upload_complete(upload_id: str, request: UploadCompleteRequest):
+    """Finish a chunked upload and store its metadata in database.
+
+    Args:
+        upload_id: ID returned by /upload/init/
+        request: Optional checksum to verify
+
+    Returns:
+        HttpResponse containing the stored file path, size and sha256
+
+    Raises:
+        HTTPException: 404 if the upload does not exist, 400 if size or checksum
+            verification fails
+    """
+    try:
+        file_info = await complete_upload(upload_id, request.sha256)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    record = {
+        "session_id": file_info["session_id"],
+        "name": file_info["name"],
+        "path": file_info["path"],
+        "size": file_info["size"],
+    }
+    await add_file_metadata([record])
+    await record_uploads(file_info["session_id"], [record])
+
+    return HttpResponse.success(file_info)
 
 @app.get("/files/{session_id}/{task_id}")
-def get_files_by_task_id(session_id: str, task_id: str):
-    """List all files associated with a specific task.
+async def get_files_by_task_id(
+        session_id: str,
+        task_id: str,
+        request: Request,
+        response: Response,
+        kind: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = Query(200, ge=1, le=1000),
+):
+    """List metadata of the files associated with a specific task.
+
+    Answered from the artifact catalog. File content is not included; fetch it
+    per file through /content/ or /download/.
 
     Args:
         session_id: ID of the current session
         task_id: ID of the task to list files for
+        request: The FastAPI request, used for If-None-Match
+        response: The FastAPI response, used to set the ETag header
+        kind: Only list files of this kind (codes, figures, results or data)
+        cursor: Cursor returned as 'next_cursor' by the previous page
+        limit: Maximum number of files per page
 
     Returns:
-        FileListResponse containing list of files
+        HttpResponse containing one page of file metadata, or 304 if unchanged
+
+    Raises:
+        HTTPException: 400 if the session id, task id or cursor is invalid
     """
-    result = list_files_in_task(session_id, task_id)
+    try:
+        result = await list_task_artifacts(
+            session_id, task_id, kind=kind, cursor=cursor, limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    etag = result["etag"]
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
     return HttpResponse.success(result)
 
 @app.get("/download/")
-def download_file(session_id: str, task_id: str, filename: str):
+def download_file(request: Request, session_id: str, task_id: str, filename: str):
     """Download a specific file by its filename.
 
+    Supports Range requests and conditional GET (If-None-Match / If-Modified-Since).
+    Pass the file mtime as ?v= to get immutable cache headers.
+
     Args:
+        request: The FastAPI request object
         session_id: ID of the current session
         task_id: ID of the associated task
-        filename: Name of the file to download
+        filename: Name of the file to download, relative to the task directory
 
     Returns:
-        FileResponse for downloading the file
+        Response streaming the file, or 304 if the client copy is current
 
     Raises:
         HTTPException: 404 if file not found
     """
-    session_id = "session_id"
-    task_id = "task_id"
     file_path = get_file_path(session_id, task_id, filename)
     if not file_path:
         raise HTTPException(status_code=404, detail="File not found")
 
-    return FileResponse(
+    return file_response(
+        request,
         file_path,
-        filename=filename,
+        filename=file_path.name,
         media_type="application/octet-stream"
     )
 
 @app.get("/content/")
-def get_file_content(session_id: str, task_id: str, filename: str):
-    """Get the content of a text file as string.
+async def get_file_content(
+        session_id: str,
+        task_id: str,
+        filename: str,
+        offset: int = Query(0, ge=0),
+        length: int = Query(1024 * 1024, ge=1024, le=16 * 1024 * 1024),
+):
+    """Get a window of the content of a text file as string.
 
     Args:
         session_id: ID of the current session
         task_id: ID of the associated task
-        filename: Name of the file to read
+        filename: Name of the file to read, relative to the task directory
+        offset: Byte offset to start reading at
+        length: Maximum number of bytes to read
 
     Returns:
-        FileContentResponse containing file content
+        HttpResponse containing 'content', 'offset', 'next_offset', 'size' and 'eof'
 
     Raises:
         HTTPException: 404 if file not found, 400 if read error
@@ -152,14 +389,117 @@ def get_file_content(session_id: str, task_id: str, filename: str):
         raise HTTPException(status_code=404, detail="File not found")
 
     try:
-        with open(file_path, "r") as f:
-            content = f.read()
-        return HttpResponse.success({"content": content})
+        result = await run_in_threadpool(read_text_window, file_path, offset, length)
+        return HttpResponse.success(result)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error reading file: {str(e)}")
 
+@app.get("/anndata/preview/")
+async def preview_anndata(
+        session_id: str,
+        task_id: str,
+        filename: str,
+        rows: int = Query(10, ge=0, le=50),
+):
+    """Summarise an .h5ad file without loading its matrix.
+
+    Uploaded files live under task_id "data".
+
+    Args:
+        session_id: ID of the current session
+        task_id: ID of the associated task
+        filename: Name of the .h5ad file, relative to the task directory
+        rows: Number of obs/var rows to include in the head
+
+    Returns:
+        HttpResponse with shape, X storage info, obs/var columns and head rows,
+        and the keys of layers, obsm, varm, obsp, varp and uns
+
+    Raises:
+        HTTPException: 404 if file not found, 400 if it is not a readable .h5ad file
+    """
+    file_path = get_file_path(session_id, task_id, filename)
+    if not file_path:
+        raise HTTPException(status_code=404, detail="File not found")
+    if file_path.suffix.lower() != ".h5ad":
+        raise HTTPException(status_code=400, detail="Not an .h5ad file")
+
+    try:
+        return HttpResponse.success(await get_h5ad_preview(file_path, rows))
+    except Exception as e:
+        logger.error(f"Error previewing {file_path}: {e}")
+        raise HTTPException(status_code=400, detail=f"Error reading AnnData file: {str(e)}")
+
+@app.get("/export/")
+def export_workspace(
+        session_id: str,
+        task_id: Optional[str] = None,
+        format: str = Query("zip", pattern="^(zip|tar|tar\\.zst)$"),
+        store: bool = False,
+):
+    """Stream an archive of a task directory, or of the whole session if no task is given.
+
+    The archive is generated while it is sent, without staging it on disk.
+
+    Args:
+        session_id: ID of the session to export
+        task_id: ID of the task to export; exports the whole session if omitted
+        format: Archive format, one of zip, tar or tar.zst
+        store: Store files without compression (zip only; already-compressed
+            files such as PNG, gz or h5ad are always stored)
+
+    Returns:
+        StreamingResponse with the archive. The X-Export-Id header identifies the
+        export for /export/{export_id}/progress; X-Archive-Files and
+        X-Archive-Bytes give the number and total uncompressed size of the files.
+
+    Raises:
+        HTTPException: 400 for an invalid path or unavailable format, 404 if the
+            directory does not exist
+    """
+    root = export_root(session_id, task_id)
+    if root is None:
+        raise HTTPException(status_code=400, detail="Invalid path")
+    if not root.is_dir():
+        raise HTTPException(status_code=404, detail="Directory not found")
+
+    try:
+        progress, body = start_export(root, format, store)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    media_type, extension = ARCHIVE_FORMATS[format]
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{root.name}{extension}"',
+            "X-Export-Id": progress["export_id"],
+            "X-Archive-Files": str(progress["files_total"]),
+            "X-Archive-Bytes": str(progress["bytes_total"]),
+        },
+    )
+
+@app.get("/export/{export_id}/progress")
+def export_progress(export_id: str):
+    """Get the progress of a running or recently finished export.
+
+    Args:
+        export_id: ID from the X-Export-Id header of /export/
+
+    Returns:
+        HttpResponse with status, files_done/files_total and bytes_done/bytes_total
+
+    Raises:
+        HTTPException: 404 if the export is unknown
+    """
+    progress = get_export_progress(export_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Export not found")
+    return HttpResponse.success(progress)
+
 @app.delete("/delete/")
-def delete_file(
+async def delete_file(
         background_tasks: BackgroundTasks,
         session_id: str,
         task_id: str,
@@ -186,15 +526,9 @@ def delete_file(
         raise HTTPException(status_code=404, detail="File not found")
 
     # Delete record from database
-    db = SessionLocal()
-    db_file = db.query(DBFileMetadata).filter(DBFileMetadata.id == file_id).first()
-    if not db_file:
-        db.close()
+    if not await delete_file_metadata(file_id):
         raise HTTPException(status_code=404, detail="File metadata not found")
-
-    db.delete(db_file)
-    db.commit()
-    db.close()
+    await delete_artifact(session_id, task_id, filename)
 
     # Async file deletion
     background_tasks.add_task(delete_file_async, file_path)
@@ -202,19 +536,27 @@ def delete_file(
     return {"message": "File deletion scheduled"}
 
 @app.get("/image/")
-async def get_image(img_path: str) -> FileResponse:
+async def get_image(
+        request: Request,
+        img_path: str,
+        w: Optional[int] = Query(None, ge=1, le=4096),
+) -> Response:
     """Retrieve an image file by its relative path.
 
     Fetches and returns an image file from the default storage directory based on the provided relative path.
     The image can be directly previewed in browsers or used by frontend applications.
+    With `w`, a cached WebP variant at the nearest configured width is served instead
+    of the full-resolution figure (vector formats are always served as-is).
 
     Args:
+        request: The FastAPI request object, used for Range and conditional headers
         img_path (str): Relative path to the image from the default storage directory.
                        Example: 'products/123.jpg' or 'users/avatar.png'
+        w (int, optional): Requested width of a thumbnail/preview in pixels
 
     Returns:
-        FileResponse: FastAPI FileResponse object that streams the image file with proper
-                     content-type headers for browser preview.
+        Response: streams the image file with proper content-type, ETag and cache
+                  headers for browser preview, or 304 if the client copy is current.
 
     Raises:
         HTTPException 400: If the path is invalid or contains directory traversal attempts
@@ -233,33 +575,114 @@ async def get_image(img_path: str) -> FileResponse:
         [image binary data]
         ```
     """
-    # Security check: prevent directory traversal attacks
-    if not img_path or '../' in img_path:
+    # Security check: stay inside the work directory (no absolute paths, `..`
+    # or symlinks leading out) and out of the server's own dot-directories
+    image_path = resolve_within(DEFAULT_WORK, img_path) if img_path else None
+    if image_path is None or any(
+        part.startswith(".") for part in image_path.relative_to(DEFAULT_WORK.resolve()).parts
+    ):
         raise HTTPException(status_code=400, detail="Invalid image path")
 
-    image_abs_path = os.path.join(str(DEFAULT_WORK), img_path)
-
     # Verify file exists
-    if not os.path.isfile(image_abs_path):
+    if not image_path.is_file():
         raise HTTPException(status_code=404, detail="Image not found")
 
-    return FileResponse(image_abs_path)
+    if w:
+        thumbnail = await get_thumbnail(image_path, w)
+        if thumbnail:
+            return file_response(request, thumbnail, media_type="image/webp")
+
+    return file_response(request, image_path)
 # Create the graph
 graph = build_graph()
 
 
+def _run_event_response(req: Request, run: WorkflowRun | RemoteRun, after_seq: int = 0) -> EventSourceResponse:
+    """Stream a run's events after after_seq, each with id '<run_id>:<seq>'."""
+    subscription = run.subscribe(after_seq)
+
+    async def event_generator():
+        try:
+            # A disconnect only detaches this client; the run goes on for a
+            # grace period in case the client reattaches with Last-Event-ID
+            async with on_disconnect(req, subscription.close):
+                async for seq, event, data in subscription:
+                    yield {"id": f"{run.run_id}:{seq}", "event": event, "data": data}
+        except asyncio.CancelledError:
+            logger.info("Stream processing cancelled")
+            raise
+
+    return EventSourceResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        sep="\n",
+    )
+
+
+def _reattach(req: Request, last_event_id: str) -> EventSourceResponse:
+    try:
+        run_id, seq = parse_event_id(last_event_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # A run held by another worker is followed through its shared event log
+    run = get_run(run_id) or follow_run(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Run not found or expired")
+    return _run_event_response(req, run, seq)
+
+
+def _admission_key(request: ChatRequest, req: Request) -> str:
+    """
+    Who a chat run counts against for the per-session limits.
+
+    Requests without a session_id all fall back to the "default" session;
+    counting them together would let unrelated clients queue behind (and be
+    rejected because of) each other, so they are counted per client address.
+    """
+    if "session_id" in request.model_fields_set and request.session_id:
+        return request.session_id
+    return f"client:{req.client.host if req.client else 'unknown'}"
+
+
 @app.post("/chat/stream")
 async def chat_endpoint(request: ChatRequest, req: Request):
     """
     Chat endpoint for LangGraph invoke.
 
+    The workflow runs detached from the request. Every event carries an SSE id
+    '<run_id>:<seq>'; repeating the request with that id in the Last-Event-ID
+    header reattaches to the run and replays the events missed since, instead
+    of starting a new workflow.
+
     Args:
         request: The chat request
         req: The FastAPI request object for connection state checking
 
     Returns:
-        The streamed response
+        The streamed response, starting with a 'start_of_run' event; while
+        waiting for a slot it carries 'queued' events with the run's queue position
+
+    Raises:
+        HTTPException: 429 if the session (or, without a session_id, the client)
+            has too many runs pending, 503 if the server's queue is full, 404 if
+            Last-Event-ID names an expired run
     """
+    last_event_id = req.headers.get("last-event-id")
+    if last_event_id:
+        return _reattach(req, last_event_id)
+
+    # Admission control happens before the stream opens, so rejections are fast
+    try:
+        ticket = scheduler.submit(_admission_key(request, req), request.priority)
+    except SessionLimitExceeded as e:
+        raise HTTPException(
+            status_code=429, detail=str(e), headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        )
+    except SchedulerFull as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        )
+
     try:
         # Convert Pydantic models to dictionaries and normalize content format
         messages = []
@@ -284,41 +707,73 @@ async def chat_endpoint(request: ChatRequest, req: Request):
 
             messages.append(message_dict)
 
-        async def event_generator():
-            try:
-                async for event in run_agent_workflow(
-                    messages,
-                    request.debug,
-                    request.deep_thinking_mode,
-                    request.search_before_planning,
-                    request.team_members,
-                    request.session_id,
-                ):
-                    # Check if client is still connected
-                    if await req.is_disconnected():
-                        logger.info("Client disconnected, stopping workflow")
-                        break
-                    yield {
-                        "event": event["event"],
-                        "data": json.dumps(event["data"], ensure_ascii=False),
-                    }
-            except asyncio.CancelledError:
-                logger.info("Stream processing cancelled")
-                raise
-            except Exception as e:
-                logger.error(f"Error in workflow: {e}")
-                raise
-
-        return EventSourceResponse(
-            event_generator(),
-            media_type="text/event-stream",
-            sep="\n",
+        run = start_run(
+            request.session_id,
+            ticket,
+            run_agent_workflow(
+                messages,
+                request.debug,
+                request.deep_thinking_mode,
+                request.search_before_planning,
+                request.team_members,
+                request.session_id,
+                request.history,
+                request.speculative_planning,
+            ),
         )
+        return _run_event_response(req, run)
     except Exception as e:
+        scheduler.release(ticket)
         logger.error(f"Error in chat endpoint: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/chat/runs/{run_id}/stream")
+async def chat_run_stream(
+    run_id: str,
+    req: Request,
+    last_event_id: Optional[str] = Query(None, description="Alternative to the Last-Event-ID header"),
+):
+    """
+    Reattach to a detached workflow run.
+
+    Args:
+        run_id: Run identifier, the part of an event id before ':'
+        req: The FastAPI request object
+        last_event_id: Id of the last event received; the Last-Event-ID header
+            takes precedence. Without either the run is replayed from the start.
+
+    Returns:
+        The streamed events after the given one
+    """
+    event_id = req.headers.get("last-event-id") or last_event_id or f"{run_id}:0"
+    if not event_id.startswith(f"{run_id}:"):
+        raise HTTPException(status_code=400, detail="Last-Event-ID belongs to another run")
+    return _reattach(req, event_id)
+
+
+@app.get("/chat/history/{session_id}")
+async def chat_history(session_id: str):
+    """
+    Get the conversation history stored on the server for a session.
+
+    Clients can render a conversation from this and send only new turns with
+    history='delta' instead of re-uploading every message.
+
+    Args:
+        session_id: Session identifier
+
+    Returns:
+        The stored messages
+    """
+    try:
+        messages = await get_session_history(session_id)
+        return HttpResponse.success(data={"session_id": session_id, "messages": messages})
+    except Exception as e:
+        logger.error(f"Error getting chat history: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/api/browser_history/{filename}")
 async def get_browser_history_file(filename: str):
     """
@@ -343,6 +798,26 @@ async def get_browser_history_file(filename: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/health")
+async def health():
+    """
+    Report that this worker is up, with its workflow and metadata write counters.
+
+    The counters cover the worker that serves the request only, named by
+    'worker' and the X-Worker-Id header.
+
+    Returns:
+        HttpResponse with 'worker', 'workflows' (running and queued) and
+        'file_metadata_writes' (rows, batches, summed batch seconds,
+        busy_seconds of wall-clock write time and rows_per_second over it)
+    """
+    return HttpResponse.success({
+        "worker": WORKER_ID,
+        "workflows": scheduler.stats(),
+        "file_metadata_writes": write_stats.to_dict(),
+    })
+
+
 @app.get("/api/team_members")
 async def get_team_members():
     """
@@ -0,0 +1,123 @@
+"""
+Helpers for serving files from the work directory.
+
+FileResponse already answers Range requests; this adds conditional GET
+(If-None-Match / If-Modified-Since), cache headers and optional offloading of
+the body to a reverse proxy.
+"""
+
+import hashlib
+import mimetypes
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Optional
+from urllib.parse import quote
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+
+from src.config import FILE_OFFLOAD_MODE, FILE_OFFLOAD_PREFIX
+from src.config.config import DEFAULT_WORK
+
+# Sent when the URL carries a version token (?v=), so the bytes behind it never change
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Otherwise the client may cache but has to revalidate with the ETag
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+
+def file_etag(stat_result: os.stat_result) -> str:
+    """Build a strong ETag from file modification time and size."""
+    etag_base = f"{stat_result.st_mtime_ns}-{stat_result.st_size}"
+    return f'"{hashlib.md5(etag_base.encode(), usedforsecurity=False).hexdigest()}"'
+
+
+def _is_not_modified(request: Request, etag: str, stat_result: os.stat_result) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(stat_result.st_mtime) <= since
+    return False
+
+
+def _offload_response(
+    file_path: Path, headers: dict, media_type: str
+) -> Optional[Response]:
+    """Hand the body over to nginx/Apache if an offload mode is configured."""
+    if FILE_OFFLOAD_MODE == "x-accel":
+        try:
+            relative_path = file_path.resolve().relative_to(DEFAULT_WORK.resolve())
+        except ValueError:
+            return None
+        headers["X-Accel-Redirect"] = (
+            FILE_OFFLOAD_PREFIX.rstrip("/") + "/" + quote(relative_path.as_posix())
+        )
+    elif FILE_OFFLOAD_MODE == "x-sendfile":
+        headers["X-Sendfile"] = str(file_path.resolve())
+    else:
+        return None
+    return Response(headers=headers, media_type=media_type)
+
+
+def file_response(
+    request: Request,
+    file_path: Path,
+    filename: Optional[str] = None,
+    media_type: Optional[str] = None,
+) -> Response:
+    """
+    Serve a file with ETag/Last-Modified validation, Range support and cache headers.
+
+    Args:
+        request: The incoming request, checked for conditional and version headers
+        file_path: Absolute path of the file to serve
+        filename: If given, sent as an attachment with this name
+        media_type: Content type, guessed from the file name if omitted
+
+    Returns:
+        Response: 304 if the client copy is current, otherwise the file (or an
+            offload response when FILE_OFFLOAD_MODE is set)
+    """
+    file_path = Path(file_path)
+    stat_result = file_path.stat()
+    etag = file_etag(stat_result)
+    media_type = (
+        media_type
+        or mimetypes.guess_type(file_path.name)[0]
+        or "application/octet-stream"
+    )
+    headers = {
+        "etag": etag,
+        "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "cache-control": (
+            IMMUTABLE_CACHE_CONTROL
+            if request.query_params.get("v")
+            else REVALIDATE_CACHE_CONTROL
+        ),
+    }
+
+    if _is_not_modified(request, etag, stat_result):
+        return Response(status_code=304, headers=headers)
+
+    if filename:
+        headers["content-disposition"] = (
+            f"attachment; filename*=utf-8''{quote(filename)}"
+        )
+    offloaded = _offload_response(file_path, dict(headers), media_type)
+    if offloaded is not None:
+        return offloaded
+
+    return FileResponse(
+        file_path,
+        headers=headers,
+        media_type=media_type,
+        stat_result=stat_result,
+    )
@@ -24,8 +24,19 @@ from .env import (
     CHROME_PROXY_SERVER,
     CHROME_PROXY_USERNAME,
     CHROME_PROXY_PASSWORD,
+    FILE_OFFLOAD_MODE,
+    FILE_OFFLOAD_PREFIX,
+    SERVER_WORKERS,
+)
+from .tools import (
+    TAVILY_MAX_RESULTS,
+    PLANNING_SEARCH_MAX_QUERIES,
+    PLANNING_SEARCH_MAX_RESULTS,
+    PLANNING_SEARCH_DEADLINE_SECONDS,
+    PLANNING_SEARCH_CACHE_TTL_SECONDS,
+    PLANNING_SEARCH_CACHE_SIZE,
+    BROWSER_HISTORY_DIR,
 )
-from .tools import TAVILY_MAX_RESULTS, BROWSER_HISTORY_DIR
 from .loader import load_yaml_config
 
 # Team configuration
@@ -103,12 +114,20 @@ __all__ = [
     "TEAM_MEMBERS",
     "TEAM_MEMBER_CONFIGRATIONS",
     "TAVILY_MAX_RESULTS",
+    "PLANNING_SEARCH_MAX_QUERIES",
+    "PLANNING_SEARCH_MAX_RESULTS",
+    "PLANNING_SEARCH_DEADLINE_SECONDS",
+    "PLANNING_SEARCH_CACHE_TTL_SECONDS",
+    "PLANNING_SEARCH_CACHE_SIZE",
     "CHROME_INSTANCE_PATH",
     "CHROME_HEADLESS",
     "CHROME_PROXY_SERVER",
     "CHROME_PROXY_USERNAME",
     "CHROME_PROXY_PASSWORD",
     "BROWSER_HISTORY_DIR",
+    "FILE_OFFLOAD_MODE",
+    "FILE_OFFLOAD_PREFIX",
+    "SERVER_WORKERS",
     # Azure configurations
     "AZURE_API_BASE",
     "AZURE_API_KEY",
@@ -13,3 +13,12 @@ AGENT_LLM_MAP: dict[str, LLMType] = {
     "browser": "vision",  # 浏览器操作使用vision llm
     "reporter": "basic",  # 编写报告使用basic llm
 }
+
+# Approximate token budget of the conversation sent to agents whose prompts
+# are built with src.prompts.context.fit_messages
+AGENT_CONTEXT_BUDGET: dict[str, int] = {
+    "supervisor": 4000,  # 只需决定下一步
+    "reporter": 48000,  # 报告需要完整的结果
+}
+# Size older agent outputs are digested to when they no longer fit in full
+CONTEXT_DIGEST_TOKENS = 300
@@ -5,4 +5,86 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent.parent.parent.parent
 DEFAULT_WORK = BASE_DIR / "work"
 
-DEFAULT_WORK.mkdir(parents=True, exist_ok=True)
\ No newline at end of file
+DEFAULT_WORK.mkdir(parents=True, exist_ok=True)
+
+# Staging area for resumable chunked uploads
+UPLOAD_TMP_DIR = DEFAULT_WORK / ".uploads"
+# Size of each read/write when streaming upload bodies to disk
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+# Uploads that received nothing for this long are deleted as abandoned, by a
+# sweep that runs at most once per interval
+UPLOAD_ABANDON_SECONDS = 24 * 3600
+UPLOAD_GC_INTERVAL_SECONDS = 3600
+
+# Derived thumbnails/previews of generated figures, keyed by source path and mtime
+THUMBNAIL_CACHE_DIR = DEFAULT_WORK / ".thumbnails"
+# Widths a ?w= request is snapped to (the next larger one, or the largest)
+THUMBNAIL_WIDTHS = (160, 480, 1024)
+# Threads that build thumbnails in the background
+THUMBNAIL_WORKERS = 2
+
+# Content-addressed store of uploaded files, linked into session workspaces
+BLOB_DIR = DEFAULT_WORK / ".blobs"
+# Blobs no session holds an unchanged copy of are deleted after this grace
+# period, by a sweep that runs at most once per interval
+BLOB_GC_GRACE_SECONDS = 3600
+BLOB_GC_INTERVAL_SECONDS = 3600
+
+# Cached AnnData previews, keyed by file path, size and mtime
+ANNDATA_PREVIEW_DIR = DEFAULT_WORK / ".previews"
+
+# Persistent LangGraph checkpoints
+CHECKPOINT_DB_PATH = DEFAULT_WORK / "checkpoints.db"
+# Threads not touched for this long are evicted
+CHECKPOINT_TTL_SECONDS = 7 * 24 * 3600
+# Most recently used threads kept; older ones are evicted first
+CHECKPOINT_MAX_THREADS = 500
+# Checkpoints kept per thread and namespace; older ones are compacted away
+CHECKPOINT_KEEP_PER_THREAD = 3
+# Upper bound on the checkpoint database size on disk
+CHECKPOINT_MAX_DB_BYTES = 1024 * 1024 * 1024
+# SQLite page cache of the checkpoint database
+CHECKPOINT_CACHE_KB = 16 * 1024
+
+# Most plan steps the supervisor dispatches at once when the plan declares
+# independent steps
+PLAN_MAX_PARALLEL_STEPS = 4
+
+# SSE streaming: consecutive token deltas of the same message are merged for up
+# to this many milliseconds (0 disables coalescing) ...
+STREAM_COALESCE_MS = 30
+# ... or until the merged delta reaches this many bytes
+STREAM_COALESCE_BYTES = 4096
+# How often a streaming chat checks whether its client is still connected
+DISCONNECT_POLL_SECONDS = 0.5
+
+# Workflow admission control: runs executing at once, runs allowed to wait
+# for a slot, and the same two limits per session (per client address for
+# requests without a session_id). The server-wide limits are split evenly
+# between SERVER_WORKERS worker processes
+WORKFLOW_MAX_RUNNING = 8
+WORKFLOW_MAX_QUEUED = 32
+WORKFLOW_SESSION_MAX_RUNNING = 1
+WORKFLOW_SESSION_MAX_PENDING = 3
+# Per-session limits are counted across workers with lock files here; a run
+# waiting on another worker's session slot re-checks at this interval
+WORKFLOW_SLOT_DIR = DEFAULT_WORK / ".slots"
+WORKFLOW_SLOT_POLL_SECONDS = 0.5
+
+# Detached workflow runs: events kept in memory per run for Last-Event-ID
+# replay, older ones are spilled to disk
+RUN_SPILL_DIR = DEFAULT_WORK / ".runs"
+RUN_BUFFER_EVENTS = 512
+# Events are written to a run's log in batches, from a thread, at most this
+# long after they happen
+RUN_LOG_FLUSH_SECONDS = 0.05
+# A run without any attached client is cancelled after this grace period
+# (0 cancels it as soon as the client disconnects)
+RUN_REATTACH_GRACE_SECONDS = 60
+# Finished runs stay replayable for this long
+RUN_RETENTION_SECONDS = 600
+# A client following a run held by another worker polls the run's event log
+# at this interval; the owner keeps the run alive while such a client has
+# polled within RUN_REMOTE_CLIENT_TIMEOUT_SECONDS
+RUN_REMOTE_POLL_SECONDS = 0.2
+RUN_REMOTE_CLIENT_TIMEOUT_SECONDS = 5
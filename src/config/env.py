@@ -34,3 +34,12 @@ CHROME_HEADLESS = os.getenv("CHROME_HEADLESS", "False") == "True"
 CHROME_PROXY_SERVER = os.getenv("CHROME_PROXY_SERVER")
 CHROME_PROXY_USERNAME = os.getenv("CHROME_PROXY_USERNAME")
 CHROME_PROXY_PASSWORD = os.getenv("CHROME_PROXY_PASSWORD")
+
+# File serving: offload file bodies to the reverse proxy ("x-accel" for nginx,
+# "x-sendfile" for Apache/lighttpd); empty serves files from the app itself
+FILE_OFFLOAD_MODE = os.getenv("FILE_OFFLOAD_MODE", "")
+# nginx internal location that maps onto the work directory, used by x-accel
+FILE_OFFLOAD_PREFIX = os.getenv("FILE_OFFLOAD_PREFIX", "/protected-work/")
+
+# Number of uvicorn worker processes; server-wide limits are split between them
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "1"))
@@ -1,4 +1,13 @@
 # Tool configuration
 TAVILY_MAX_RESULTS = 5
 
+# Search before planning: queries issued at once per request (the request
+# itself and its keywords), results kept in the prompt, and the most the
+# search may add to the time to plan. Results are cached per normalized query
+PLANNING_SEARCH_MAX_QUERIES = 2
+PLANNING_SEARCH_MAX_RESULTS = 8
+PLANNING_SEARCH_DEADLINE_SECONDS = 4.0
+PLANNING_SEARCH_CACHE_TTL_SECONDS = 3600
+PLANNING_SEARCH_CACHE_SIZE = 512
+
 BROWSER_HISTORY_DIR = "static/browser_history"
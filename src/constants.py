@@ -4,6 +4,9 @@ from enum import Enum
 # List of streaming LLM agents
 STREAMING_LLM_AGENTS = [*TEAM_MEMBERS, "planner", "coordinator"]
 
+# Custom event carrying a plan generated speculatively beside the coordinator
+SPECULATIVE_PLAN_EVENT = "speculative_plan"
+
 
 # Event type enumeration
 class EventType(Enum):
@@ -14,3 +17,4 @@ class EventType(Enum):
     CHAT_MODEL_STREAM = "on_chat_model_stream"
     TOOL_START = "on_tool_start"
     TOOL_END = "on_tool_end"
+    CUSTOM = "on_custom_event"
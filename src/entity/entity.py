@@ -1,6 +1,6 @@
 """SQLAlchemy model for file metadata storage"""
 
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Float, Index, UniqueConstraint
 from sqlalchemy.sql import func
 
 from src.database import Base
@@ -14,4 +14,27 @@ class FileMetadata(Base):
     name = Column(String)
     path = Column(String)
     size = Column(Integer)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class Artifact(Base):
+    """Catalog entry for a file in a session/task workspace (code, figure, result or upload)."""
+
+    __tablename__ = "artifacts"
+    __table_args__ = (
+        Index("ix_artifacts_session_task_kind_created", "session_id", "task_id", "kind", "created_at"),
+        UniqueConstraint("session_id", "task_id", "path", name="uq_artifacts_session_task_path"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    session_id = Column(String, nullable=False)
+    task_id = Column(String, nullable=False)
+    kind = Column(String, nullable=False)
+    name = Column(String, nullable=False)
+    # Path relative to the task directory, e.g. figures/umap.png
+    path = Column(String, nullable=False)
+    size = Column(Integer, nullable=False)
+    mtime = Column(Float, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    # Timestamp of the scan that last saw the file; older rows are swept
+    indexed_at = Column(Float, nullable=False)
@@ -1,5 +1,13 @@
 from langgraph.graph import StateGraph, START
-from langgraph.checkpoint.memory import MemorySaver
+from src.config.config import (
+    CHECKPOINT_DB_PATH,
+    CHECKPOINT_TTL_SECONDS,
+    CHECKPOINT_MAX_THREADS,
+    CHECKPOINT_KEEP_PER_THREAD,
+    CHECKPOINT_MAX_DB_BYTES,
+    CHECKPOINT_CACHE_KB,
+)
+from .checkpoint import BoundedSqliteSaver
 from .types import State
 from .nodes import (
     supervisor_node,
@@ -15,9 +23,15 @@ from .nodes import (
 
 def build_graph():
     """Build and return the agent workflow graph."""
-    # use persistent memory to save conversation history
-    # TODO: be compatible with SQLite / PostgreSQL
-    memory = MemorySaver()
+    # persist conversation history in SQLite, bounded by TTL/LRU eviction and compaction
+    memory = BoundedSqliteSaver(
+        CHECKPOINT_DB_PATH,
+        ttl_seconds=CHECKPOINT_TTL_SECONDS,
+        max_threads=CHECKPOINT_MAX_THREADS,
+        keep_per_thread=CHECKPOINT_KEEP_PER_THREAD,
+        max_db_bytes=CHECKPOINT_MAX_DB_BYTES,
+        cache_kb=CHECKPOINT_CACHE_KB,
+    )
 
     # build state graph
     builder = StateGraph(State)
@@ -0,0 +1,477 @@
+"""
+Bounded, persistent SQLite checkpointer.
+
+Checkpoints live in a SQLite file instead of process memory and the store is
+kept bounded:
+
+- compaction: only the newest `keep_per_thread` checkpoints of each thread
+  and namespace are kept (resuming a thread only needs the latest one)
+- TTL: threads not touched for `ttl_seconds` are dropped
+- LRU: beyond `max_threads`, the least recently used threads are dropped
+- disk: beyond `max_db_bytes`, LRU threads are dropped and the file vacuumed
+- memory: the SQLite page cache is capped at `cache_kb`
+
+Blocking SQLite calls run in a worker thread for the async API, so the
+saver works for both `graph.invoke` and `graph.astream_events`.
+"""
+
+import asyncio
+import logging
+import random
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+
+logger = logging.getLogger(__name__)
+
+# Run eviction at most this often; compaction of the written thread happens on every put
+MAINTENANCE_INTERVAL_SECONDS = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_threads_last_access ON threads (last_access);
+"""
+
+
+class BoundedSqliteSaver(BaseCheckpointSaver[str]):
+    """Checkpoint saver backed by a SQLite file with TTL, LRU and size limits."""
+
+    def __init__(
+        self,
+        db_path: Path,
+        *,
+        ttl_seconds: float,
+        max_threads: int,
+        keep_per_thread: int,
+        max_db_bytes: int,
+        cache_kb: int,
+        serde=None,
+    ):
+        super().__init__(serde=serde)
+        self.ttl_seconds = ttl_seconds
+        self.max_threads = max_threads
+        self.keep_per_thread = max(1, keep_per_thread)
+        self.max_db_bytes = max_db_bytes
+        self._lock = threading.Lock()
+        self._last_maintenance = 0.0
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(
+            str(db_path), check_same_thread=False, isolation_level=None
+        )
+        # auto_vacuum only takes effect on a new database, before the first table
+        self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(f"PRAGMA cache_size=-{int(cache_kb)}")
+        # Several worker processes share the file; wait for their write locks
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self.conn.executescript(_SCHEMA)
+
+    # ---------------------------------------------------------------- helpers
+
+    def _touch(self, thread_id: str) -> None:
+        self.conn.execute(
+            "INSERT INTO threads (thread_id, last_access) VALUES (?, ?) "
+            "ON CONFLICT(thread_id) DO UPDATE SET last_access = excluded.last_access",
+            (thread_id, time.time()),
+        )
+
+    def _compact(self, thread_id: str, checkpoint_ns: str) -> None:
+        keep = (
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT ?"
+        )
+        args = (
+            thread_id,
+            checkpoint_ns,
+            thread_id,
+            checkpoint_ns,
+            self.keep_per_thread,
+        )
+        self.conn.execute(
+            "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            f"AND checkpoint_id NOT IN ({keep})",
+            args,
+        )
+        self.conn.execute(
+            "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? "
+            f"AND checkpoint_id NOT IN ({keep})",
+            args,
+        )
+
+    def _delete_threads(self, thread_ids: Sequence[str]) -> None:
+        for thread_id in thread_ids:
+            self.conn.execute(
+                "DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,)
+            )
+            self.conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+            self.conn.execute("DELETE FROM threads WHERE thread_id = ?", (thread_id,))
+
+    def _db_bytes(self) -> int:
+        page_count = self.conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist = self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+        page_size = self.conn.execute("PRAGMA page_size").fetchone()[0]
+        return (page_count - freelist) * page_size
+
+    def _load_writes(
+        self, thread_id: str, checkpoint_ns: str, checkpoint_id: str
+    ) -> list:
+        rows = self.conn.execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? "
+            "ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return [
+            (task_id, channel, self.serde.loads_typed((type_, value)))
+            for task_id, channel, type_, value in rows
+        ]
+
+    def _to_tuple(self, row: tuple) -> CheckpointTuple:
+        (
+            thread_id,
+            checkpoint_ns,
+            checkpoint_id,
+            parent_id,
+            type_,
+            checkpoint,
+            m_type,
+            metadata,
+        ) = row
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=self.serde.loads_typed((type_, checkpoint)),
+            metadata=self.serde.loads_typed((m_type, metadata)),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_id,
+                    }
+                }
+                if parent_id
+                else None
+            ),
+            pending_writes=self._load_writes(thread_id, checkpoint_ns, checkpoint_id),
+        )
+
+    # ------------------------------------------------------------ maintenance
+
+    def maintain(self) -> Dict[str, int]:
+        """
+        Evict expired and least recently used threads and reclaim disk space.
+
+        Returns:
+            dict: Number of threads evicted by TTL, by LRU and by the disk limit
+        """
+        stats = {"ttl": 0, "lru": 0, "disk": 0}
+        with self._lock:
+            expired = [
+                row[0]
+                for row in self.conn.execute(
+                    "SELECT thread_id FROM threads WHERE last_access < ?",
+                    (time.time() - self.ttl_seconds,),
+                )
+            ]
+            self._delete_threads(expired)
+            stats["ttl"] = len(expired)
+
+            count = self.conn.execute("SELECT COUNT(*) FROM threads").fetchone()[0]
+            if count > self.max_threads:
+                oldest = [
+                    row[0]
+                    for row in self.conn.execute(
+                        "SELECT thread_id FROM threads ORDER BY last_access LIMIT ?",
+                        (count - self.max_threads,),
+                    )
+                ]
+                self._delete_threads(oldest)
+                stats["lru"] = len(oldest)
+
+            while self._db_bytes() > self.max_db_bytes:
+                count = self.conn.execute("SELECT COUNT(*) FROM threads").fetchone()[0]
+                # Always keep the most recently used thread
+                if count <= 1:
+                    break
+                oldest = [
+                    row[0]
+                    for row in self.conn.execute(
+                        "SELECT thread_id FROM threads ORDER BY last_access LIMIT ?",
+                        (max(1, count // 10),),
+                    )
+                ]
+                self._delete_threads(oldest)
+                stats["disk"] += len(oldest)
+
+            self.conn.execute("PRAGMA incremental_vacuum")
+            self._last_maintenance = time.time()
+
+        if any(stats.values()):
+            logger.info(f"Checkpoint maintenance evicted threads: {stats}")
+        return stats
+
+    def _maybe_maintain(self) -> None:
+        if time.time() - self._last_maintenance >= MAINTENANCE_INTERVAL_SECONDS:
+            self.maintain()
+
+    # ------------------------------------------------------------- sync API
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        columns = (
+            "thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+            "type, checkpoint, metadata_type, metadata"
+        )
+        with self._lock:
+            if checkpoint_id:
+                row = self.conn.execute(
+                    f"SELECT {columns} FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self.conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            if row is None:
+                return None
+            self._touch(thread_id)
+            return self._to_tuple(row)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        where, args = [], []
+        if config:
+            where.append("thread_id = ?")
+            args.append(config["configurable"]["thread_id"])
+            checkpoint_ns = config["configurable"].get("checkpoint_ns")
+            if checkpoint_ns is not None:
+                where.append("checkpoint_ns = ?")
+                args.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                where.append("checkpoint_id = ?")
+                args.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            where.append("checkpoint_id < ?")
+            args.append(before_id)
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+            "type, checkpoint, metadata_type, metadata FROM checkpoints"
+        )
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._lock:
+            rows = self.conn.execute(query, args).fetchall()
+            tuples = []
+            for row in rows:
+                checkpoint_tuple = self._to_tuple(row)
+                if filter and not all(
+                    checkpoint_tuple.metadata.get(key) == value
+                    for key, value in filter.items()
+                ):
+                    continue
+                tuples.append(checkpoint_tuple)
+                if limit is not None and len(tuples) >= limit:
+                    break
+        yield from tuples
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        type_, serialized_checkpoint = self.serde.dumps_typed(checkpoint)
+        m_type, serialized_metadata = self.serde.dumps_typed(dict(metadata))
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, "
+                    "parent_checkpoint_id, type, checkpoint, metadata_type, metadata) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        thread_id,
+                        checkpoint_ns,
+                        checkpoint["id"],
+                        configurable.get("checkpoint_id"),
+                        type_,
+                        serialized_checkpoint,
+                        m_type,
+                        serialized_metadata,
+                    ),
+                )
+                self._compact(thread_id, checkpoint_ns)
+                self._touch(thread_id)
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        self._maybe_maintain()
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        configurable = config["configurable"]
+        # Special channels (errors, interrupts) overwrite; regular writes are idempotent
+        verb = (
+            "INSERT OR REPLACE"
+            if all(w[0] in WRITES_IDX_MAP for w in writes)
+            else "INSERT OR IGNORE"
+        )
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, serialized_value = self.serde.dumps_typed(value)
+            rows.append(
+                (
+                    configurable["thread_id"],
+                    configurable.get("checkpoint_ns", ""),
+                    configurable["checkpoint_id"],
+                    task_id,
+                    WRITES_IDX_MAP.get(channel, idx),
+                    channel,
+                    type_,
+                    serialized_value,
+                )
+            )
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany(
+                    f"{verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, "
+                    "idx, channel, type, value) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._delete_threads([thread_id])
+
+    def get_next_version(self, current: Optional[str], channel: Any) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # ------------------------------------------------------------ async API
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        tuples = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint_tuple in tuples:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(
+            self.put, config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
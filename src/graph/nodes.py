@@ -1,20 +1,34 @@
+import asyncio
 import json
 import logging
-from copy import deepcopy
-from typing import Literal
+import time
+from dataclasses import replace
+from typing import Literal, Optional, Sequence
 
-from langchain_core.messages import BaseMessage
-from langchain_core.messages import HumanMessage
+from langchain_core.callbacks.manager import adispatch_custom_event
+from langchain_core.messages import BaseMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool
-from langgraph.types import Command
+from langgraph.types import Command, Send
 
 from src.agents import research_agent, coder_agent, browser_agent, ghostcoder_agent
 from src.config import TEAM_MEMBERS
-from src.config.agents import AGENT_LLM_MAP
+from src.constants import SPECULATIVE_PLAN_EVENT
+from src.config.agents import AGENT_CONTEXT_BUDGET, AGENT_LLM_MAP, CONTEXT_DIGEST_TOKENS
+from src.config.config import PLAN_MAX_PARALLEL_STEPS
 from src.llms.llm import get_llm_by_type
+from src.prompts.context import fit_messages
 from src.prompts.template import apply_prompt_template
-from src.tools.search import tavily_tool
+from src.service.artifact_service import index_task_artifacts
+from src.tools.search import planning_search
 from src.utils.json_utils import repair_json_output
+from src.utils.workflow_context import (
+    WorkflowContext,
+    current_task_id,
+    get_workflow_context,
+    workflow_scope,
+)
+from .plan import PlanStep, is_sequential, parse_plan, ready_steps
 from .types import State, Router
 
 logger = logging.getLogger(__name__)
@@ -22,6 +36,94 @@ logger = logging.getLogger(__name__)
 RESPONSE_FORMAT = "Response from {}:\n\n<response>\n{}\n</response>\n\n*Please execute the next step.*"
 
 
+# Prefix of the results the python, bash and browser tools return on failure
+TOOL_ERROR_PREFIX = "Error executing"
+
+
+def _member_failure(content: str, new_messages: Sequence[BaseMessage] = ()) -> Optional[str]:
+    """
+    Why an agent's plan step failed, or None if it produced a usable result.
+
+    Args:
+        content: The agent's response, after repair_json_output
+        new_messages: Messages the agent added to the conversation, whose
+            last tool result is checked
+
+    Returns:
+        The reason the step failed, or None
+    """
+    if not content or not content.strip():
+        return "returned no result"
+    try:
+        parsed = json.loads(content)
+    except ValueError:
+        parsed = None
+    if isinstance(parsed, dict) and parsed.get("error"):
+        return f"reported an error: {parsed['error']}"
+    tool_results = [message for message in new_messages if isinstance(message, ToolMessage)]
+    if tool_results:
+        # An agent that recovered from a failed call makes another one
+        last = tool_results[-1]
+        if last.status == "error" or str(last.content).startswith(TOOL_ERROR_PREFIX):
+            return f"last {last.name or 'tool'} call failed"
+    return None
+
+
+def _member_command(
+    state: State,
+    name: str,
+    content: str,
+    started: float,
+    new_messages: Sequence[BaseMessage] = (),
+) -> Command:
+    """Report an agent's response to the supervisor, marking its plan step done."""
+    update = {"messages": [HumanMessage(content=content, name=name)]}
+    if state.get("plan_step") is not None:
+        record = {
+            "step": state["plan_step"],
+            "agent": name,
+            "seconds": round(time.time() - started, 3),
+            "ok": True,
+        }
+        error = _member_failure(content, new_messages)
+        if error:
+            record.update(ok=False, error=error)
+        update["plan_steps_done"] = [record]
+    return Command(update=update, goto="supervisor")
+
+
+def _member_error(state: State, name: str, error: Exception, started: float) -> Command:
+    """
+    Report an agent that raised as a failed plan step.
+
+    Outside a plan the exception is raised again, as before plan routing.
+    """
+    if state.get("plan_step") is None:
+        raise error
+    logger.exception(f"{name} failed on plan step {state['plan_step']}")
+    return Command(
+        update={
+            "messages": [HumanMessage(content=f"Error: {error}", name=name)],
+            "plan_steps_done": [{
+                "step": state["plan_step"],
+                "agent": name,
+                "seconds": round(time.time() - started, 3),
+                "ok": False,
+                "error": f"raised {type(error).__name__}: {error}",
+            }],
+        },
+        goto="supervisor",
+    )
+
+
+async def _index_artifacts(state: State, name: str) -> None:
+    """Catalog the files an agent wrote to the task directory, for file listings."""
+    if not (state.get("session_id") and state.get("task_id")):
+        return
+    try:
+        await index_task_artifacts(state["session_id"], state["task_id"])
+    except Exception as e:
+        logger.warning(f"Failed to index {name} artifacts: {e}")
 
 
 @tool
@@ -32,156 +134,295 @@ def handoff_to_planner():
     return
 
 
-def research_node(state: State) -> Command[Literal["supervisor"]]:
+async def research_node(state: State) -> Command[Literal["supervisor"]]:
     """Node for the researcher agent that performs research tasks."""
     logger.info("Research agent starting task")
-    result = research_agent.invoke(state)
+    started = time.time()
+    try:
+        result = await research_agent.ainvoke(state)
+    except Exception as e:
+        return _member_error(state, "researcher", e, started)
     logger.info("Research agent completed task")
+    await _index_artifacts(state, "researcher")
     response_content = result["messages"][-1].content
     # 尝试修复可能的JSON输出
     response_content = repair_json_output(response_content)
     logger.debug(f"Research agent response: {response_content}")
-    return Command(
-        update={
-            "messages": [
-                HumanMessage(
-                    content=response_content,
-                    name="researcher",
-                )
-            ]
-        },
-        goto="supervisor",
-    )
+    new_messages = result["messages"][len(state["messages"]):]
+    return _member_command(state, "researcher", response_content, started, new_messages)
 
 
-def code_node(state: State) -> Command[Literal["supervisor"]]:
+async def code_node(state: State) -> Command[Literal["supervisor"]]:
     """Node for the coder agent that executes Python code."""
     logger.info("Code agent starting task")
-    result = coder_agent.invoke(state)
+    started = time.time()
+    try:
+        result = await coder_agent.ainvoke(state)
+    except Exception as e:
+        return _member_error(state, "coder", e, started)
     logger.info("Code agent completed task")
+    await _index_artifacts(state, "coder")
     response_content = result["messages"][-1].content
     # 尝试修复可能的JSON输出
     #response_content = repair_json_output(response_content)
     logger.debug(f"Code agent response: {response_content}")
-    return Command(
-        update={
-            "messages": [
-                HumanMessage(
-                    content=response_content,
-                    name="coder",
-                )
-            ]
-        },
-        goto="supervisor",
-    )
+    new_messages = result["messages"][len(state["messages"]):]
+    return _member_command(state, "coder", response_content, started, new_messages)
 
 
-async def ghostcoder_node(state: State) -> Command[Literal["supervisor"]]:
+async def ghostcoder_node(
+    state: State, config: Optional[RunnableConfig] = None
+) -> Command[Literal["supervisor"]]:
     """Node for the GhostCoder agent that generate and execute bioinformatics code in python, R and more."""
     logger.info("GhostCoder agent starting task")
-    # Parse ghostcoder inputs
+    started = time.time()
+    # GhostCoder writes to the directory of the task it is given
+    task_id = state.get("task_id") or current_task_id()
+    if not task_id:
+        raise ValueError("ghostcoder_node needs a task_id in its input state")
+    # Parse ghostcoder inputs; the task id goes in both its input and its config
     input_state = {
         **state,
+        "task_id": task_id,
         "task_description": state['messages'][-1].content,
         "previous_codeblock": ""
     }
-
-    result = await ghostcoder_agent.ainvoke(input_state)
+    config = config or {}
+    run_config = {**config, "configurable": {**config.get("configurable", {}), "task_id": task_id}}
+
+    # Code reading ghostcoder_config.TASK_ID gets it from the workflow context,
+    # so run in a context for this task even when not started by the service
+    context = get_workflow_context()
+    if context is None:
+        context = WorkflowContext(workflow_id=task_id, session_id=state.get("session_id", "default"))
+    elif context.workflow_id != task_id:
+        # Same browsers, processes and locks, only the task id differs
+        context = replace(context, workflow_id=task_id)
+    try:
+        with workflow_scope(context):
+            result = await ghostcoder_agent.ainvoke(input_state, run_config)
+    except Exception as e:
+        return _member_error(state, "ghostcoder", e, started)
     logger.info("GhostCoder agent completed task")
+    # Catalog the code, figures and results written to the task directory
+    await _index_artifacts(state, "ghostcoder")
     # Parse ghostcoder output
     response_content = result["task_result"]
     # 尝试修复可能的JSON输出
     response_content = repair_json_output(response_content)
     logger.debug(f"GhostCoder agent response: {response_content}")
-    return Command(
-        update={
-            "messages": [
-                HumanMessage(
-                    content=response_content,
-                    name="ghostcoder",
-                )
-            ]
-        },
-        goto="supervisor",
-    )
+    return _member_command(state, "ghostcoder", response_content, started)
 
 
 
-def browser_node(state: State) -> Command[Literal["supervisor"]]:
+async def browser_node(state: State) -> Command[Literal["supervisor"]]:
     """Node for the browser agent that performs web browsing tasks."""
     logger.info("Browser agent starting task")
-    result = browser_agent.invoke(state)
+    started = time.time()
+    try:
+        result = await browser_agent.ainvoke(state)
+    except Exception as e:
+        return _member_error(state, "browser", e, started)
     logger.info("Browser agent completed task")
+    await _index_artifacts(state, "browser")
     response_content = result["messages"][-1].content
     # 尝试修复可能的JSON输出
     response_content = repair_json_output(response_content)
     logger.debug(f"Browser agent response: {response_content}")
+    new_messages = result["messages"][len(state["messages"]):]
+    return _member_command(state, "browser", response_content, started, new_messages)
+
+
+def _plan_cursor(state: State, routing: dict) -> list[PlanStep] | None:
+    """
+    The current plan's steps, if the supervisor can route by them.
+
+    Returns None, recording the reason in routing["fallback"], when the plan
+    cannot be parsed or a step came back without a result; the supervisor
+    LLM then routes the rest of the plan.
+    """
+    if routing.get("fallback") or not state.get("full_plan"):
+        return None
+    try:
+        steps = parse_plan(state["full_plan"], state.get("TEAM_MEMBERS") or TEAM_MEMBERS)
+    except ValueError as e:
+        routing["fallback"] = f"unusable plan: {e}"
+    else:
+        failed = [record for record in state.get("plan_steps_done") or [] if not record.get("ok", True)]
+        if not failed:
+            return steps
+        reason = failed[0].get("error", "returned no result")
+        routing["fallback"] = f"step {failed[0]['step']} ({failed[0]['agent']}) {reason}"
+    logger.info(f"Supervisor falling back to LLM routing: {routing['fallback']}")
+    return None
+
+
+def _plan_stats(state: State, routing: dict, steps: list[PlanStep] | None = None) -> dict:
+    """Plan timing against running its steps one after another, and routing calls saved."""
+    done = state.get("plan_steps_done") or []
+    step_seconds = sum(record["seconds"] for record in done)
+    wall_seconds = time.time() - state.get("plan_started_at", time.time())
+    stats = {
+        # Time to plan, as recorded by the planner
+        **(state.get("plan_stats") or {}),
+        "steps": len(steps) if steps else len(done),
+        "parallel": bool(steps) and not is_sequential(steps),
+        "step_seconds": round(step_seconds, 3),
+        "wall_seconds": round(wall_seconds, 3),
+        "saved_seconds": round(max(0.0, step_seconds - wall_seconds), 3),
+        # Supervisor decisions taken from the plan, each one LLM round trip saved
+        "round_trips_saved": routing["plan_routed"],
+        "llm_round_trips": routing["llm_routed"],
+    }
+    if routing.get("fallback"):
+        stats["fallback"] = routing["fallback"]
+    return stats
+
+
+def _dispatch_plan_steps(state: State, steps: list[PlanStep], routing: dict) -> Command:
+    """Fan out every step whose dependencies are done; finish once all are."""
+    routing["plan_routed"] += 1
+    done = {record["step"] for record in state.get("plan_steps_done") or []}
+    if all(step.number in done for step in steps):
+        stats = _plan_stats(state, routing, steps)
+        logger.info(
+            f"Plan completed in {stats['wall_seconds']}s, {stats['step_seconds']}s of agent "
+            f"time ({stats['saved_seconds']}s saved by running steps in parallel, "
+            f"{stats['round_trips_saved']} supervisor LLM calls saved)"
+        )
+        return Command(
+            goto="__end__",
+            update={"next": "__end__", "plan_routing": routing, "plan_stats": stats},
+        )
+
+    ready = ready_steps(steps, done, PLAN_MAX_PARALLEL_STEPS)
+    logger.info(f"Supervisor dispatching plan steps {[step.number for step in ready]}")
+    update = {"next": ",".join(step.agent_name for step in ready), "plan_routing": routing}
+    # Every dispatched agent returns to the supervisor, which runs again once
+    # all of them have finished
     return Command(
-        update={
-            "messages": [
-                HumanMessage(
-                    content=response_content,
-                    name="browser",
-                )
-            ]
-        },
-        goto="supervisor",
+        goto=[
+            Send(
+                step.agent_name,
+                {
+                    **state,
+                    "messages": [
+                        *state["messages"],
+                        HumanMessage(content=step.instructions(), name="supervisor"),
+                    ],
+                    "plan_step": step.number,
+                },
+            )
+            for step in ready
+        ],
+        update=update,
     )
 
 
-def supervisor_node(state: State) -> Command[Literal[*TEAM_MEMBERS, "__end__"]]:
+async def supervisor_node(state: State) -> Command[Literal[*TEAM_MEMBERS, "__end__"]]:
     """Supervisor node that decides which agent should act next."""
     logger.info("Supervisor evaluating next action")
-    messages = apply_prompt_template("supervisor", state)
-    # preprocess messages to make supervisor execute better.
-    messages = deepcopy(messages)
-    for message in messages:
-        if isinstance(message, BaseMessage) and message.name in TEAM_MEMBERS:
-            message.content = RESPONSE_FORMAT.format(message.name, message.content)
-    response = (
+    routing = {"plan_routed": 0, "llm_routed": 0, **(state.get("plan_routing") or {})}
+    steps = _plan_cursor(state, routing)
+    if steps:
+        return _dispatch_plan_steps(state, steps, routing)
+
+    # Recent agent responses wrapped in RESPONSE_FORMAT, older ones digested
+    messages = fit_messages(
+        apply_prompt_template("supervisor", state),
+        AGENT_CONTEXT_BUDGET["supervisor"],
+        TEAM_MEMBERS,
+        CONTEXT_DIGEST_TOKENS,
+        wrap=RESPONSE_FORMAT.format,
+    )
+    response = await (
         get_llm_by_type(AGENT_LLM_MAP["supervisor"])
         .with_structured_output(schema=Router, method="json_mode")
-        .invoke(messages)
+        .ainvoke(messages)
     )
+    routing["llm_routed"] += 1
     goto = response["next"]
     logger.debug(f"Current state messages: {state['messages']}")
     logger.debug(f"Supervisor response: {response}")
 
+    update = {"next": goto, "plan_routing": routing}
     if goto == "FINISH":
         goto = "__end__"
+        update["next"] = goto
+        update["plan_stats"] = _plan_stats(state, routing)
         logger.info("Workflow completed")
     else:
         logger.info(f"Supervisor delegating to: {goto}")
 
-    return Command(goto=goto, update={"next": goto})
+    return Command(goto=goto, update=update)
 
 
-def planner_node(state: State) -> Command[Literal["supervisor", "__end__"]]:
-    """Planner node that generate the full plan."""
-    logger.info("Planner generating full plan")
+async def _plan_messages(state: State) -> list:
+    """Planner prompt, with search results appended if search_before_planning is set."""
     messages = apply_prompt_template("planner", state)
+    if state.get("search_before_planning"):
+        searched_content = await planning_search(state["messages"][-1].content)
+        if searched_content:
+            results = f"\n\n# Relative Search Results\n\n{json.dumps([{'title': elem['title'], 'content': elem['content']} for elem in searched_content], ensure_ascii=False)}"
+            content = messages[-1].content
+            if isinstance(content, list):
+                # Multimodal request: add the results as one more text part
+                content = [*content, {"type": "text", "text": results}]
+            else:
+                content = content + results
+            # Extend a copy of the last message only; the state's message is shared
+            messages[-1] = messages[-1].model_copy(update={"content": content})
+    return messages
+
+
+async def _generate_plan(state: State, config: Optional[RunnableConfig] = None) -> str:
+    """Run the planner LLM and return its raw response."""
+    messages = await _plan_messages(state)
     # whether to enable deep thinking mode
     llm = get_llm_by_type("basic")
     if state.get("deep_thinking_mode"):
         llm = get_llm_by_type("reasoning")
-    if state.get("search_before_planning"):
-        searched_content = tavily_tool.invoke({"query": state["messages"][-1].content})
-        if isinstance(searched_content, list):
-            messages = deepcopy(messages)
-            messages[
-                -1
-            ].content += f"\n\n# Relative Search Results\n\n{json.dumps([{'title': elem['title'], 'content': elem['content']} for elem in searched_content], ensure_ascii=False)}"
-        else:
-            logger.error(
-                f"Tavily search returned malformed response: {searched_content}"
-            )
-    stream = llm.stream(messages)
     full_response = ""
-    for chunk in stream:
+    async for chunk in llm.astream(messages, config=config):
         full_response += chunk.content
+    return full_response
+
+
+async def _speculative_plan(context: Optional[WorkflowContext]) -> Optional[str]:
+    """Take the plan started by the coordinator, if any and if it succeeded."""
+    task = context.speculative_plan if context else None
+    if task is None:
+        return None
+    context.speculative_plan = None
+    try:
+        return await task
+    except Exception as e:
+        logger.warning(f"Speculative planning failed, planning again: {e}")
+        return None
+
+
+async def planner_node(state: State) -> Command[Literal["supervisor", "__end__"]]:
+    """Planner node that generate the full plan."""
+    logger.info("Planner generating full plan")
+    context = get_workflow_context()
+    full_response = await _speculative_plan(context)
+    speculative = full_response is not None
+    if speculative:
+        # Generated silently beside the coordinator; stream it to the client now
+        await adispatch_custom_event(SPECULATIVE_PLAN_EVENT, {"content": full_response})
+    else:
+        full_response = await _generate_plan(state)
     logger.debug(f"Current state messages: {state['messages']}")
     logger.debug(f"Planner response: {full_response}")
 
+    plan_stats = {"speculative": speculative}
+    if context:
+        plan_stats["time_to_plan_seconds"] = round(time.time() - context.started_at, 3)
+        logger.info(
+            f"Plan ready {plan_stats['time_to_plan_seconds']}s after the workflow started"
+            f"{' (speculative)' if speculative else ''}"
+        )
+
     goto = "supervisor"
     try:
         full_response = repair_json_output(full_response)
@@ -193,50 +434,89 @@ def planner_node(state: State) -> Command[Literal["supervisor", "__end__"]]:
         update={
             "messages": [HumanMessage(content=full_response, name="planner")],
             "full_plan": full_response,
+            # A new plan starts now, with no steps done
+            "plan_started_at": time.time(),
+            "plan_steps_done": [],
+            "plan_routing": {},
+            "plan_stats": plan_stats,
         },
         goto=goto,
     )
 
 
-def coordinator_node(state: State) -> Command[Literal["planner", "__end__"]]:
+def _background_callbacks(config: Optional[RunnableConfig]) -> list:
+    """
+    The callback handlers of config, minus those streaming events to the client.
+
+    Streaming handlers (astream_events, stream_mode="messages") implement
+    tap_output_aiter; the others, such as the workflow's PromptCacheStats,
+    keep seeing an LLM call run in the background.
+    """
+    callbacks = (config or {}).get("callbacks")
+    handlers = getattr(callbacks, "handlers", callbacks) or []
+    return [handler for handler in handlers if not hasattr(handler, "tap_output_aiter")]
+
+
+async def coordinator_node(
+    state: State, config: Optional[RunnableConfig] = None
+) -> Command[Literal["planner", "__end__"]]:
     """Coordinator node that communicate with customers."""
     logger.info("Coordinator talking.")
+    context = get_workflow_context()
+    speculation = None
+    if state.get("speculative_planning") and context is not None:
+        # Plan while the coordinator decides whether a plan is needed at all.
+        # Without the streaming handlers nothing is streamed as the
+        # coordinator's output, while prompt cache stats are still collected
+        speculation = asyncio.create_task(
+            _generate_plan(state, {"callbacks": _background_callbacks(config)})
+        )
+        context.speculative_plan = speculation
     messages = apply_prompt_template("coordinator", state)
-    response = (
-        get_llm_by_type(AGENT_LLM_MAP["coordinator"])
-        .bind_tools([handoff_to_planner])
-        .invoke(messages)
-    )
+    try:
+        response = await (
+            get_llm_by_type(AGENT_LLM_MAP["coordinator"])
+            .bind_tools([handoff_to_planner])
+            .ainvoke(messages)
+        )
+    except BaseException:
+        if speculation:
+            speculation.cancel()
+            context.speculative_plan = None
+        raise
     logger.debug(f"Current state messages: {state['messages']}")
 
     goto = "__end__"
     if len(response.tool_calls) > 0:
         goto = "planner"
+    elif speculation:
+        logger.info("Coordinator answered directly, cancelling speculative plan")
+        speculation.cancel()
+        context.speculative_plan = None
 
     return Command(
         goto=goto,
     )
 
 
-def reporter_node(state: State) -> Command[Literal["supervisor"]]:
+async def reporter_node(state: State) -> Command[Literal["supervisor"]]:
     """Reporter node that write a final report."""
     logger.info("Reporter write final report")
-    messages = apply_prompt_template("reporter", state)
-    response = get_llm_by_type(AGENT_LLM_MAP["reporter"]).invoke(messages)
+    started = time.time()
+    messages = fit_messages(
+        apply_prompt_template("reporter", state),
+        AGENT_CONTEXT_BUDGET["reporter"],
+        TEAM_MEMBERS,
+        CONTEXT_DIGEST_TOKENS,
+    )
+    try:
+        response = await get_llm_by_type(AGENT_LLM_MAP["reporter"]).ainvoke(messages)
+    except Exception as e:
+        return _member_error(state, "reporter", e, started)
     logger.debug(f"Current state messages: {state['messages']}")
     response_content = response.content
     # 尝试修复可能的JSON输出
     response_content = repair_json_output(response_content)
     logger.debug(f"reporter response: {response_content}")
 
-    return Command(
-        update={
-            "messages": [
-                HumanMessage(
-                    content=response_content,
-                    name="reporter",
-                )
-            ]
-        },
-        goto="supervisor",
-    )
+    return _member_command(state, "reporter", response_content, started)
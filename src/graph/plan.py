@@ -0,0 +1,122 @@
+"""
+Plan steps and their dependencies.
+
+The planner may declare, per step, the (1-based) numbers of the earlier
+steps it depends on. Steps that do not declare `depends_on` follow the
+previous step, so a plan without any declarations runs strictly in order.
+The supervisor executes a parsed plan in waves without asking its LLM:
+every step whose dependencies are done is dispatched at once, and the next
+wave starts when all of them have reported back.
+"""
+
+import json
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+
+@dataclass(frozen=True)
+class PlanStep:
+    """One step of the planner's `Plan`."""
+
+    number: int
+    agent_name: str
+    title: str
+    description: str
+    note: str = ""
+    depends_on: Tuple[int, ...] = field(default_factory=tuple)
+
+    def instructions(self) -> str:
+        """Task message handed to the agent executing this step."""
+        text = f"Execute step {self.number} of the plan: {self.title}\n\n{self.description}"
+        if self.note:
+            text += f"\n\nNote: {self.note}"
+        return text
+
+
+def parse_plan(full_plan: str, team_members: Sequence[str]) -> List[PlanStep]:
+    """
+    Parse the planner's JSON output into steps.
+
+    Args:
+        full_plan: The `Plan` JSON written by the planner
+        team_members: Agents steps may be assigned to
+
+    Returns:
+        The steps, numbered from 1
+
+    Raises:
+        ValueError: If the plan is not valid JSON, assigns an unknown agent or
+            depends on a step that is not an earlier one
+    """
+    try:
+        plan = json.loads(full_plan)
+    except (TypeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Plan is not valid JSON: {e}")
+    raw_steps = plan.get("steps") if isinstance(plan, dict) else None
+    if not isinstance(raw_steps, list) or not raw_steps:
+        raise ValueError("Plan has no steps")
+
+    steps = []
+    for number, raw in enumerate(raw_steps, start=1):
+        if not isinstance(raw, dict):
+            raise ValueError(f"Step {number} is not an object")
+        agent_name = raw.get("agent_name")
+        if agent_name not in team_members:
+            raise ValueError(f"Step {number} is assigned to unknown agent {agent_name}")
+        if "depends_on" in raw:
+            try:
+                depends_on = tuple(
+                    sorted({int(dep) for dep in raw["depends_on"] or ()})
+                )
+            except (TypeError, ValueError):
+                raise ValueError(f"Step {number} has invalid depends_on")
+            if any(dep < 1 or dep >= number for dep in depends_on):
+                raise ValueError(f"Step {number} may only depend on earlier steps")
+        else:
+            depends_on = (number - 1,) if number > 1 else ()
+        steps.append(
+            PlanStep(
+                number=number,
+                agent_name=agent_name,
+                title=str(raw.get("title", "")),
+                description=str(raw.get("description", "")),
+                note=str(raw.get("note") or ""),
+                depends_on=depends_on,
+            )
+        )
+    return steps
+
+
+def is_sequential(steps: Sequence[PlanStep]) -> bool:
+    """Whether every step only follows the previous one."""
+    return all(
+        step.depends_on == ((step.number - 1,) if step.number > 1 else ())
+        for step in steps
+    )
+
+
+def ready_steps(
+    steps: Sequence[PlanStep], done: Iterable[int], limit: Optional[int] = None
+) -> List[PlanStep]:
+    """
+    Steps not yet done whose dependencies all are, in plan order.
+
+    Args:
+        steps: The plan's steps
+        done: Numbers of the finished steps
+        limit: Most steps to return, if any
+    """
+    done = set(done)
+    ready = [
+        step
+        for step in steps
+        if step.number not in done and all(dep in done for dep in step.depends_on)
+    ]
+    return ready[:limit] if limit else ready
+
+
+def merge_steps_done(current: list, update: list) -> list:
+    """State reducer for finished plan steps; an empty update starts a new plan."""
+    if not update:
+        return []
+    return [*(current or []), *update]
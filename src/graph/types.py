@@ -1,8 +1,9 @@
-from typing import Literal
+from typing import Annotated, Literal
 from typing_extensions import TypedDict
 from langgraph.graph import MessagesState
 
 from src.config import TEAM_MEMBERS
+from .plan import merge_steps_done
 
 # Define routing options
 OPTIONS = TEAM_MEMBERS + ["FINISH"]
@@ -26,4 +27,17 @@ class State(MessagesState):
     full_plan: str
     deep_thinking_mode: bool
     search_before_planning: bool
+    speculative_planning: bool
     session_id: str
+    task_id: str
+
+    # Plan execution: finished steps ({"step", "agent", "seconds", "ok"}, plus
+    # "error" when a step failed), appended by agents running in parallel; when
+    # the plan started; how the supervisor routed it (plan cursor or LLM); its
+    # timing and routing report
+    plan_steps_done: Annotated[list[dict], merge_steps_done]
+    plan_started_at: float
+    plan_routing: dict
+    plan_stats: dict
+    # Set on the input of an agent dispatched for a plan step
+    plan_step: int
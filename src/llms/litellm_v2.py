@@ -1,7 +1,8 @@
 import langchain_community.chat_models.litellm as litellm
-from typing import Any, Dict, Literal, Optional, Type, TypeVar, Union, Mapping
+from typing import Any, Dict, List, Literal, Optional, Tuple, Type, TypeVar, Union, Mapping
 from langchain_core.messages import (
     AIMessageChunk,
+    BaseMessage,
     BaseMessageChunk,
     ChatMessageChunk,
     FunctionMessageChunk,
@@ -63,6 +64,7 @@ litellm._convert_delta_to_message_chunk = _convert_delta_to_message_chunk
 
 from langchain_community.chat_models import ChatLiteLLM
 
+from functools import lru_cache
 from operator import itemgetter
 
 from langchain_core.language_models import LanguageModelInput
@@ -85,6 +87,8 @@ from langchain_core.utils.pydantic import (
 )
 from pydantic import BaseModel
 
+from src.prompts.template import split_system_prompt
+
 _BM = TypeVar("_BM", bound=BaseModel)
 _DictOrPydanticClass = Union[Dict[str, Any], Type[_BM], Type]
 _DictOrPydantic = Union[Dict, _BM]
@@ -94,7 +98,45 @@ def _is_pydantic_class(obj: Any) -> bool:
     return isinstance(obj, type) and is_basemodel_subclass(obj)
 
 
+# Providers that only cache prompt prefixes marked with cache_control; OpenAI,
+# DeepSeek and others cache common prefixes automatically
+CACHE_CONTROL_PROVIDERS = frozenset({"anthropic", "bedrock", "vertex_ai"})
+
+
+@lru_cache(maxsize=None)
+def _supports_cache_control(model: str) -> bool:
+    """Whether the model needs (and litellm accepts) cache_control breakpoints."""
+    try:
+        from litellm import get_llm_provider
+        from litellm.utils import supports_prompt_caching
+
+        provider = get_llm_provider(model)[1]
+        return provider in CACHE_CONTROL_PROVIDERS and bool(supports_prompt_caching(model=model))
+    except Exception:
+        return False
+
+
+def _mark_prefix_cacheable(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Split a system prompt into a cached stable prefix block and a volatile suffix block."""
+    if message.get("role") != "system" or not isinstance(message.get("content"), str):
+        return message
+    prefix, suffix = split_system_prompt(message["content"])
+    blocks = [{"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}}]
+    if suffix:
+        blocks.append({"type": "text", "text": suffix})
+    return {**message, "content": blocks}
+
+
 class ChatLiteLLMV2(ChatLiteLLM):
+    def _create_message_dicts(
+        self, messages: List[BaseMessage], stop: Optional[List[str]]
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        message_dicts, params = super()._create_message_dicts(messages, stop)
+        # Flag the system prompt's stable prefix for providers that need it
+        if message_dicts and self.model and _supports_cache_control(self.model):
+            message_dicts = [_mark_prefix_cacheable(message_dicts[0]), *message_dicts[1:]]
+        return message_dicts, params
+
     def with_structured_output(
         self,
         schema: Optional[_DictOrPydanticClass] = None,
@@ -39,7 +39,8 @@ def create_openai_llm(
     Create a ChatOpenAI instance with the specified configuration
     """
     # Only include base_url in the arguments if it's not None or empty
-    llm_kwargs = {"model": model, "temperature": temperature, **kwargs}
+    # stream_usage reports token usage (incl. cached prompt tokens) when streaming
+    llm_kwargs = {"model": model, "temperature": temperature, "stream_usage": True, **kwargs}
 
     if base_url:  # This will handle None or empty string
         llm_kwargs["base_url"] = base_url
@@ -61,7 +62,7 @@ def create_deepseek_llm(
     Create a ChatDeepSeek instance with the specified configuration
     """
     # Only include base_url in the arguments if it's not None or empty
-    llm_kwargs = {"model": model, "temperature": temperature, **kwargs}
+    llm_kwargs = {"model": model, "temperature": temperature, "stream_usage": True, **kwargs}
 
     if base_url:  # This will handle None or empty string
         llm_kwargs["api_base"] = base_url
@@ -88,6 +89,7 @@ def create_azure_llm(
         api_version=api_version,
         api_key=api_key,
         temperature=temperature,
+        stream_usage=True,
     )
 
 
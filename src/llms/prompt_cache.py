@@ -0,0 +1,76 @@
+"""
+Prompt cache hit reporting.
+
+Providers report how many prompt tokens were served from their prompt cache
+in different usage fields; PromptCacheStats collects them over the LLM calls
+of one workflow, together with the process-wide hit rate of the memoised
+system prompt prefixes.
+"""
+
+import threading
+from typing import Any, Dict, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from src.prompts.template import prefix_cache_info
+
+
+def _usage(message: Any, llm_output: Dict[str, Any]) -> Tuple[int, int]:
+    """(prompt tokens, cached prompt tokens) of one LLM response."""
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        details = usage.get("input_token_details") or {}
+        return usage.get("input_tokens", 0), details.get("cache_read", 0) or 0
+
+    metadata = getattr(message, "response_metadata", None) or {}
+    token_usage = metadata.get("token_usage") or llm_output.get("token_usage") or {}
+    if not token_usage:
+        return 0, 0
+    # OpenAI / litellm, DeepSeek and Anthropic spell the cached count differently
+    details = token_usage.get("prompt_tokens_details") or {}
+    cached = (
+        details.get("cached_tokens")
+        or token_usage.get("prompt_cache_hit_tokens")
+        or token_usage.get("cache_read_input_tokens")
+        or 0
+    )
+    return token_usage.get("prompt_tokens", 0), cached
+
+
+class PromptCacheStats(BaseCallbackHandler):
+    """Callback handler summing prompt and cached prompt tokens over LLM calls."""
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self._lock = threading.Lock()
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        llm_output = response.llm_output or {}
+        for generations in response.generations:
+            for generation in generations:
+                prompt_tokens, cached_tokens = _usage(
+                    getattr(generation, "message", None), llm_output
+                )
+                with self._lock:
+                    self.calls += 1
+                    self.prompt_tokens += prompt_tokens
+                    self.cached_tokens += cached_tokens
+
+    def summary(self) -> Dict[str, Any]:
+        """Provider cache hit rate of this handler's calls and the prefix memo hit rate."""
+        prefixes = prefix_cache_info()
+        lookups = prefixes.hits + prefixes.misses
+        return {
+            "llm_calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "hit_rate": (
+                round(self.cached_tokens / self.prompt_tokens, 3)
+                if self.prompt_tokens
+                else 0.0
+            ),
+            "prefix_hit_rate": round(prefixes.hits / lookups, 3) if lookups else 0.0,
+        }
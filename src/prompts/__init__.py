@@ -1,6 +1,8 @@
+from .context import fit_messages
 from .template import apply_prompt_template, get_prompt_template
 
 __all__ = [
     "apply_prompt_template",
+    "fit_messages",
     "get_prompt_template",
 ]
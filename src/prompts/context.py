@@ -0,0 +1,149 @@
+"""
+Token-budgeted message context for agent prompts.
+
+Routing and reporting prompts used to carry the entire conversation. Here
+the newest messages are kept in full while they fit an agent's token
+budget, older agent outputs are replaced by short digests, and what still
+does not fit is dropped. The system prompt, the user's latest request and
+the current plan are always kept.
+
+Messages are never copied or modified: unchanged messages are passed
+through as they are and rewritten ones are new message objects. Token
+estimates and digests are cached by content, so each agent output is
+measured and digested once rather than on every turn.
+"""
+
+from functools import lru_cache
+from typing import Any, Callable, List, Optional, Sequence
+
+from langchain_core.messages import BaseMessage, HumanMessage
+
+# Author of the plan message, which is always kept
+PLAN_AUTHOR = "planner"
+
+
+@lru_cache(maxsize=4096)
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the token count of text without a tokenizer.
+
+    Roughly four ASCII characters per token; other characters (CJK in
+    particular) count as one token each.
+    """
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+@lru_cache(maxsize=4096)
+def digest(text: str, max_tokens: int) -> str:
+    """
+    Shorten an agent output to about max_tokens, cut at a line boundary.
+
+    Returns:
+        The text itself if it already fits, else its head and a note of how
+        much was omitted
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    head = text[: max_tokens * 4]
+    if "\n" in head:
+        head = head[: head.rindex("\n")]
+    omitted = estimate_tokens(text) - estimate_tokens(head)
+    return f"{head.rstrip()}\n\n[... about {omitted} more tokens omitted from this earlier response]"
+
+
+def _name(message: Any) -> Optional[str]:
+    if isinstance(message, BaseMessage):
+        return message.name
+    return message.get("name") if isinstance(message, dict) else None
+
+
+def _content(message: Any) -> str:
+    content = (
+        message.content
+        if isinstance(message, BaseMessage)
+        else message.get("content", "")
+    )
+    if isinstance(content, list):
+        return "\n".join(
+            part.get("text", "") if isinstance(part, dict) else str(part)
+            for part in content
+        )
+    return content or ""
+
+
+def _is_user(message: Any) -> bool:
+    if isinstance(message, BaseMessage):
+        return message.type == "human" and not message.name
+    return message.get("role") == "user" and not message.get("name")
+
+
+def fit_messages(
+    messages: Sequence[Any],
+    budget: int,
+    team_members: Sequence[str],
+    digest_tokens: int,
+    wrap: Optional[Callable[[str, str], str]] = None,
+) -> List[Any]:
+    """
+    Fit prompt messages into a token budget.
+
+    Args:
+        messages: The system prompt followed by the conversation, as returned
+            by apply_prompt_template
+        budget: Tokens the messages may take, approximately
+        team_members: Agents whose outputs may be digested or dropped
+        digest_tokens: Size of the digest an older agent output is reduced to
+        wrap: Optional formatter (agent name, content) -> content applied to
+            agent outputs
+
+    Returns:
+        The messages to send, in their original order
+    """
+    if not messages:
+        return []
+    system, history = messages[0], list(messages[1:])
+
+    pinned = set()
+    for index in range(len(history) - 1, -1, -1):
+        if _is_user(history[index]):
+            pinned.add(index)
+            break
+    for index in range(len(history) - 1, -1, -1):
+        if _name(history[index]) == PLAN_AUTHOR:
+            pinned.add(index)
+            break
+
+    def view(message: Any, content: Optional[str] = None) -> Any:
+        name = _name(message)
+        if name not in team_members:
+            return message
+        if content is None:
+            if wrap is None:
+                return message
+            content = _content(message)
+        return HumanMessage(content=wrap(name, content) if wrap else content, name=name)
+
+    used = estimate_tokens(_content(system)) + sum(
+        estimate_tokens(_content(history[i])) for i in pinned
+    )
+    kept = {index: history[index] for index in pinned}
+    for index in range(len(history) - 1, -1, -1):
+        if index in pinned:
+            continue
+        message = history[index]
+        cost = estimate_tokens(_content(message))
+        if used + cost <= budget:
+            kept[index] = view(message)
+            used += cost
+            continue
+        if _name(message) not in team_members:
+            break
+        short = digest(_content(message), digest_tokens)
+        cost = estimate_tokens(short)
+        if used + cost > budget:
+            break
+        kept[index] = view(message, short)
+        used += cost
+
+    return [system, *(kept[index] for index in sorted(kept))]
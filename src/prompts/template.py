@@ -1,6 +1,10 @@
+import json
 import os
 from datetime import datetime
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from functools import lru_cache
+from typing import Tuple
+
+from jinja2 import Environment, FileSystemLoader, meta, select_autoescape
 from langgraph.prebuilt.chat_agent_executor import AgentState
 
 # Initialize Jinja2 environment
@@ -11,6 +15,13 @@ env = Environment(
     lstrip_blocks=True,
 )
 
+# State variables that stay fixed for a team, so templates using only these
+# render to the same system prompt prefix on every call
+STABLE_VARIABLES = frozenset({"TEAM_MEMBERS", "TEAM_MEMBER_CONFIGRATIONS"})
+# Start of the per-call suffix appended after the stable prefix. Providers
+# cache prompts by prefix, so nothing that changes per call may precede it
+VOLATILE_MARKER = "\n\n---\nCURRENT_TIME: "
+
 
 def get_prompt_template(prompt_name: str) -> str:
     """
@@ -29,10 +40,66 @@ def get_prompt_template(prompt_name: str) -> str:
         raise ValueError(f"Error loading template {prompt_name}: {e}")
 
 
+@lru_cache(maxsize=None)
+def _template_variables(prompt_name: str) -> frozenset:
+    source = env.loader.get_source(env, f"{prompt_name}.md")[0]
+    return frozenset(meta.find_undeclared_variables(env.parse(source)))
+
+
+@lru_cache(maxsize=256)
+def _render_prefix(prompt_name: str, team_members: Tuple[str, ...], team_configs: str) -> str:
+    return env.get_template(f"{prompt_name}.md").render(
+        TEAM_MEMBERS=list(team_members),
+        TEAM_MEMBER_CONFIGRATIONS=json.loads(team_configs),
+    )
+
+
+def render_prompt_prefix(prompt_name: str, state: AgentState) -> str:
+    """
+    Render the stable part of a system prompt, memoised per (template, team).
+
+    Templates that use state beyond STABLE_VARIABLES are rendered on every
+    call instead.
+    """
+    variables = _template_variables(prompt_name)
+    if not variables <= STABLE_VARIABLES:
+        return env.get_template(f"{prompt_name}.md").render(
+            CURRENT_TIME=_current_time(), **state
+        )
+    team_members = tuple(state.get("TEAM_MEMBERS") or ()) if "TEAM_MEMBERS" in variables else ()
+    team_configs = {}
+    if "TEAM_MEMBER_CONFIGRATIONS" in variables:
+        configs = state.get("TEAM_MEMBER_CONFIGRATIONS") or {}
+        team_configs = {name: configs[name] for name in team_members if name in configs}
+    return _render_prefix(
+        prompt_name, team_members, json.dumps(team_configs, sort_keys=True, default=str)
+    )
+
+
+def prefix_cache_info():
+    """Hits and misses of the memoised prompt prefixes in this process."""
+    return _render_prefix.cache_info()
+
+
+def split_system_prompt(content: str) -> Tuple[str, str]:
+    """Split a system prompt from apply_prompt_template into its stable prefix and volatile suffix."""
+    prefix, marker, suffix = content.rpartition(VOLATILE_MARKER)
+    if not marker:
+        return content, ""
+    return prefix, marker + suffix
+
+
+def _current_time() -> str:
+    return datetime.now().strftime("%a %b %d %Y %H:%M:%S %z")
+
+
 def apply_prompt_template(prompt_name: str, state: AgentState) -> list:
     """
     Apply template variables to a prompt template and return formatted messages.
 
+    The system prompt is the template's stable prefix followed by a volatile
+    suffix with the current time, so the prefix can be cached by providers.
+
     Args:
         prompt_name: Name of the prompt template to use
         state: Current agent state containing variables to substitute
@@ -40,15 +107,11 @@ def apply_prompt_template(prompt_name: str, state: AgentState) -> list:
     Returns:
         List of messages with the system prompt as the first message
     """
-    # Convert state to dict for template rendering
-    state_vars = {
-        "CURRENT_TIME": datetime.now().strftime("%a %b %d %Y %H:%M:%S %z"),
-        **state,
-    }
-
     try:
-        template = env.get_template(f"{prompt_name}.md")
-        system_prompt = template.render(**state_vars)
+        system_prompt = (
+            render_prompt_prefix(prompt_name, state)
+            + f"{VOLATILE_MARKER}{_current_time()}\n---"
+        )
         return [{"role": "system", "content": system_prompt}] + state["messages"]
     except Exception as e:
         raise ValueError(f"Error applying template {prompt_name}: {e}")
@@ -5,7 +5,7 @@ from typing import List
 from typing import TypeVar, Dict, Any, Generic
 
 from pydantic import BaseModel
-from typing import Optional, Union
+from typing import Literal, Optional, Union
 from pydantic import BaseModel, Field
 
 
@@ -28,7 +28,18 @@ class ChatMessage(BaseModel):
 
 
 class ChatRequest(BaseModel):
-    messages: List[ChatMessage] = Field(..., description="The user input")
+    messages: List[ChatMessage] = Field(
+        ...,
+        description="The user input; with history='delta' only the new turn",
+    )
+    history: Literal["full", "delta"] = Field(
+        "full",
+        description=(
+            "'full': messages is the whole conversation (only the last one is used "
+            "once the session has server-side history); 'delta': messages are only "
+            "the new turn, appended to the history stored for the session"
+        ),
+    )
     debug: Optional[bool] = Field(False, description="Whether to enable debug logging")
     deep_thinking_mode: Optional[bool] = Field(
         False, description="Whether to enable deep thinking mode"
@@ -36,10 +47,21 @@ class ChatRequest(BaseModel):
     search_before_planning: Optional[bool] = Field(
         False, description="Whether to search before planning"
     )
+    speculative_planning: Optional[bool] = Field(
+        False,
+        description=(
+            "Whether to start planning while the coordinator is still deciding; "
+            "saves a round trip for tasks at the cost of a wasted plan for small talk"
+        ),
+    )
     team_members: Optional[list] = Field(None, description="enabled team members")
     session_id: Optional[str] = Field(
         "default", description="Distinguish between different conversations"
     )
+    priority: Literal["interactive", "batch"] = Field(
+        "interactive",
+        description="Scheduling class; interactive runs are admitted before batch runs",
+    )
 
 
 class FileMetadataBase(BaseModel):
@@ -71,6 +93,30 @@ class FileUploadResponse(BaseModel):
 class FileContentResponse(BaseModel):
     content: str
 
+class UploadInitRequest(BaseModel):
+    session_id: str = Field(..., description="ID of the session the file belongs to")
+    filename: str = Field(..., description="Name of the file being uploaded")
+    total_size: Optional[int] = Field(
+        None, ge=0, description="Expected size in bytes, verified on completion"
+    )
+
+class UploadLinkRequest(BaseModel):
+    session_id: str = Field(..., description="ID of the session the file belongs to")
+    filename: str = Field(..., description="Name of the file in the session")
+    sha256: str = Field(
+        ..., pattern="^[0-9a-fA-F]{64}$", description="sha256 hex digest of the content"
+    )
+    source_session_id: Optional[str] = Field(
+        None,
+        description="Another session of the caller that holds this content; without it "
+        "only content this session uploaded can be linked",
+    )
+
+class UploadCompleteRequest(BaseModel):
+    sha256: Optional[str] = Field(
+        None, description="Expected sha256 hex digest, verified on completion"
+    )
+
 
 
 T = TypeVar("T")
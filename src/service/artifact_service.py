@@ -0,0 +1,314 @@
+"""
+Artifact catalog: indexed lookup of the files in each session/task workspace.
+
+Agent nodes index their task directory when they finish. Files written
+outside a node (or while one is still running) are picked up on listing:
+the first page of a listing re-indexes the task if one of its files or
+directories was modified after the task was last indexed.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, func, select, tuple_
+from sqlalchemy.dialects.sqlite import insert
+
+from src.config.config import DEFAULT_WORK
+from src.database import AsyncSessionLocal
+from src.entity.entity import Artifact
+from src.utils.file_utils import (
+    TASK_FILE_KINDS,
+    is_path_name,
+    scan_task_dir,
+    get_language_from_extension,
+    human_readable_size,
+)
+
+logger = logging.getLogger(__name__)
+
+# Kind used for files uploaded into {session}/data
+DATA_KIND = "data"
+DATA_TASK_ID = "data"
+
+# Keep each INSERT well below SQLite's bound-parameter limit
+_UPSERT_BATCH_SIZE = 500
+
+
+def _to_datetime(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).replace(tzinfo=None)
+
+
+def _encode_cursor(row: Artifact) -> str:
+    return base64.urlsafe_b64encode(
+        json.dumps([row.kind, row.created_at.isoformat(), row.id]).encode()
+    ).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple:
+    try:
+        kind, created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(kind), datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def _scan_rows(
+    session_id: str, task_id: str, storage_path: Path, indexed_at: float
+) -> List[Dict]:
+    rows = []
+    for kind_index, name, entry in scan_task_dir(storage_path / session_id / task_id):
+        stat = entry.stat()
+        kind, subdir = TASK_FILE_KINDS[kind_index]
+        if task_id == DATA_TASK_ID:
+            kind = DATA_KIND
+        rows.append(
+            {
+                "session_id": session_id,
+                "task_id": task_id,
+                "kind": kind,
+                "name": name,
+                "path": f"{subdir}/{name}" if subdir else name,
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "created_at": _to_datetime(stat.st_mtime),
+                "indexed_at": indexed_at,
+            }
+        )
+    return rows
+
+
+def _latest_mtime(task_dir: Path) -> float:
+    """
+    Latest modification time of the task's files and kind sub-directories.
+
+    Directory times change when files are added or removed; a file rewritten
+    in place only changes its own.
+    """
+    mtime = 0.0
+    for _, subdir in TASK_FILE_KINDS:
+        try:
+            mtime = max(mtime, (task_dir / subdir).stat().st_mtime)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+    for _, _, entry in scan_task_dir(task_dir):
+        try:
+            mtime = max(mtime, entry.stat().st_mtime)
+        except FileNotFoundError:
+            continue
+    return mtime
+
+
+def _check_ids(session_id: str, task_id: str) -> None:
+    if not (is_path_name(session_id) and is_path_name(task_id)):
+        raise ValueError(f"Invalid session or task id: {session_id}/{task_id}")
+
+
+async def _last_indexed(session_id: str, task_id: str) -> float:
+    async with AsyncSessionLocal() as db:
+        last = await db.scalar(
+            select(func.max(Artifact.indexed_at)).where(
+                Artifact.session_id == session_id, Artifact.task_id == task_id
+            )
+        )
+    return last or 0.0
+
+
+async def upsert_artifacts(rows: List[Dict[str, Any]]) -> None:
+    """
+    Insert or update catalog rows, keyed by (session_id, task_id, path).
+
+    Args:
+        rows: Dicts with the Artifact columns except id; created_at is kept
+            from the first insert
+    """
+    if not rows:
+        return
+    async with AsyncSessionLocal() as db:
+        async with db.begin():
+            for i in range(0, len(rows), _UPSERT_BATCH_SIZE):
+                stmt = insert(Artifact).values(rows[i : i + _UPSERT_BATCH_SIZE])
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["session_id", "task_id", "path"],
+                    set_={
+                        "size": stmt.excluded.size,
+                        "mtime": stmt.excluded.mtime,
+                        "indexed_at": stmt.excluded.indexed_at,
+                    },
+                )
+                await db.execute(stmt)
+
+
+async def record_uploads(session_id: str, files: List[Dict[str, Any]]) -> None:
+    """
+    Add uploaded files to the catalog under the session's data directory.
+
+    Args:
+        session_id: Session the files were uploaded to
+        files: Dicts with 'name' and 'size' of each stored file
+    """
+    now = time.time()
+    await upsert_artifacts(
+        [
+            {
+                "session_id": session_id,
+                "task_id": DATA_TASK_ID,
+                "kind": DATA_KIND,
+                "name": file["name"],
+                "path": file["name"],
+                "size": file["size"],
+                "mtime": now,
+                "created_at": _to_datetime(now),
+                "indexed_at": now,
+            }
+            for file in files
+        ]
+    )
+
+
+async def delete_artifact(session_id: str, task_id: str, path: str) -> None:
+    """
+    Remove a file from the catalog.
+
+    Args:
+        session_id: Session identifier
+        task_id: Task identifier
+        path: Path of the file relative to the task directory
+    """
+    async with AsyncSessionLocal() as db:
+        async with db.begin():
+            await db.execute(
+                delete(Artifact).where(
+                    Artifact.session_id == session_id,
+                    Artifact.task_id == task_id,
+                    Artifact.path == path,
+                )
+            )
+
+
+async def index_task_artifacts(
+    session_id: str, task_id: str, storage_path: Path = DEFAULT_WORK
+) -> int:
+    """
+    Scan a task directory once and sync the catalog with it.
+
+    Called after an agent node has run, so that listing requests can be
+    answered from the catalog instead of the filesystem.
+
+    Args:
+        session_id: Session identifier
+        task_id: Task identifier
+        storage_path: Base storage directory
+
+    Returns:
+        int: Number of artifacts in the task
+
+    Raises:
+        ValueError: If session_id or task_id is not a plain name
+    """
+    _check_ids(session_id, task_id)
+    indexed_at = time.time()
+    rows = await run_in_threadpool(
+        _scan_rows, session_id, task_id, storage_path, indexed_at
+    )
+    await upsert_artifacts(rows)
+    async with AsyncSessionLocal() as db:
+        async with db.begin():
+            await db.execute(
+                delete(Artifact).where(
+                    Artifact.session_id == session_id,
+                    Artifact.task_id == task_id,
+                    Artifact.indexed_at < indexed_at,
+                )
+            )
+    logger.debug(f"Indexed {len(rows)} artifacts for {session_id}/{task_id}")
+    return len(rows)
+
+
+async def list_task_artifacts(
+    session_id: str,
+    task_id: str,
+    kind: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 200,
+    storage_path: Path = DEFAULT_WORK,
+) -> Dict[str, Any]:
+    """
+    List catalog entries of a task, one page at a time.
+
+    The first page re-indexes the task if its files changed since it was
+    last indexed, which includes tasks that were never indexed.
+
+    Args:
+        session_id: Session identifier
+        task_id: Task identifier
+        kind: Optional kind filter (codes, figures, results or data)
+        cursor: Opaque cursor returned as 'next_cursor' by the previous page
+        limit: Maximum number of files in this page
+        storage_path: Base storage directory
+
+    Returns:
+        dict: Contains 'codes', 'figures', 'results' and 'data' lists with
+            name, path, language, size, size_human and mtime of each file,
+            'next_cursor' (None on the last page) and an 'etag' for the page
+
+    Raises:
+        ValueError: If session_id or task_id is not a plain name, or the
+            cursor is malformed
+    """
+    _check_ids(session_id, task_id)
+    if not cursor:
+        task_dir = storage_path / session_id / task_id
+        if await run_in_threadpool(_latest_mtime, task_dir) > await _last_indexed(
+            session_id, task_id
+        ):
+            await index_task_artifacts(session_id, task_id, storage_path)
+
+    stmt = select(Artifact).where(
+        Artifact.session_id == session_id, Artifact.task_id == task_id
+    )
+    if kind:
+        stmt = stmt.where(Artifact.kind == kind)
+    if cursor:
+        stmt = stmt.where(
+            tuple_(Artifact.kind, Artifact.created_at, Artifact.id)
+            > tuple_(*_decode_cursor(cursor))
+        )
+    stmt = stmt.order_by(Artifact.kind, Artifact.created_at, Artifact.id).limit(
+        limit + 1
+    )
+
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(stmt)).scalars().all()
+
+    result = {
+        "session_id": session_id,
+        "task_id": task_id,
+        **{category: [] for category, _ in TASK_FILE_KINDS},
+        "next_cursor": None,
+    }
+    etag = hashlib.sha1(f"{session_id}/{task_id}/{kind}".encode())
+    for row in rows[:limit]:
+        result.setdefault(row.kind, []).append(
+            {
+                "name": row.name,
+                "path": row.path,
+                "language": get_language_from_extension(row.name),
+                "size": row.size,
+                "size_human": human_readable_size(row.size),
+                "mtime": row.mtime,
+            }
+        )
+        etag.update(f"{row.id}:{row.size}:{row.mtime};".encode())
+
+    if len(rows) > limit:
+        result["next_cursor"] = _encode_cursor(rows[limit - 1])
+    etag.update(str(result["next_cursor"]).encode())
+    result["etag"] = f'W/"{etag.hexdigest()}"'
+    return result
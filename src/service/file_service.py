@@ -0,0 +1,118 @@
+"""File metadata persistence on the async database engine."""
+
+import logging
+import time
+from typing import Dict, Any, List
+
+from sqlalchemy import delete
+
+from src.database import AsyncSessionLocal
+from src.entity.entity import FileMetadata
+
+logger = logging.getLogger(__name__)
+
+
+class WriteStats:
+    """
+    Running totals used to report metadata write throughput.
+
+    `seconds` sums the latency of each batch, so it counts overlapping batches
+    twice; throughput is measured against `busy_seconds`, the wall-clock time
+    during which at least one batch was being written.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.batches = 0
+        self.seconds = 0.0
+        self.busy_seconds = 0.0
+        self._in_flight = 0
+        self._busy_since = 0.0
+
+    def start(self) -> float:
+        """Note that a batch write begins; returns its start time for stop()."""
+        now = time.perf_counter()
+        if not self._in_flight:
+            self._busy_since = now
+        self._in_flight += 1
+        return now
+
+    def stop(self, started: float) -> float:
+        """Note that the batch started at `started` ended; returns its latency."""
+        now = time.perf_counter()
+        self._in_flight -= 1
+        if not self._in_flight:
+            self.busy_seconds += now - self._busy_since
+        return now - started
+
+    def record(self, rows: int, seconds: float) -> None:
+        self.rows += rows
+        self.batches += 1
+        self.seconds += seconds
+
+    @property
+    def rows_per_second(self) -> float:
+        busy_seconds = self.busy_seconds
+        if self._in_flight:
+            busy_seconds += time.perf_counter() - self._busy_since
+        return self.rows / busy_seconds if busy_seconds else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "batches": self.batches,
+            "seconds": round(self.seconds, 6),
+            "busy_seconds": round(self.busy_seconds, 6),
+            "rows_per_second": round(self.rows_per_second, 1),
+        }
+
+
+write_stats = WriteStats()
+
+
+async def add_file_metadata(records: List[Dict[str, Any]]) -> List[FileMetadata]:
+    """
+    Insert metadata for a batch of files in a single transaction.
+
+    Args:
+        records: List of dicts with 'session_id', 'name', 'path' and 'size'
+
+    Returns:
+        List of the persisted FileMetadata rows
+    """
+    if not records:
+        return []
+
+    started = write_stats.start()
+    try:
+        rows = [FileMetadata(**record) for record in records]
+        async with AsyncSessionLocal() as db:
+            async with db.begin():
+                db.add_all(rows)
+    finally:
+        elapsed = write_stats.stop(started)
+
+    write_stats.record(len(rows), elapsed)
+    logger.debug(
+        f"Wrote {len(rows)} file metadata rows in {elapsed * 1000:.1f} ms "
+        f"({write_stats.rows_per_second:.1f} rows/s overall)"
+    )
+    return rows
+
+
+async def delete_file_metadata(file_id: int) -> bool:
+    """
+    Delete the metadata row with the given id.
+
+    Args:
+        file_id: Database ID of the file metadata
+
+    Returns:
+        bool: True if a row was deleted, False if it did not exist
+    """
+    async with AsyncSessionLocal() as db:
+        async with db.begin():
+            result = await db.execute(
+                delete(FileMetadata).where(FileMetadata.id == file_id)
+            )
+    return result.rowcount > 0
@@ -0,0 +1,421 @@
+"""
+Detached workflow runs with replayable event streams.
+
+A run executes independently of the HTTP request that started it and
+records every (coalesced) event it produces under a sequence number. Events
+are appended to the run's log under RUN_SPILL_DIR in batches, written from a
+thread within RUN_LOG_FLUSH_SECONDS so the event loop never waits on the
+disk. The newest RUN_BUFFER_EVENTS events also stay in memory, so a client
+that reconnects with Last-Event-ID "<run_id>:<seq>" receives everything it
+missed without re-running anything.
+
+When the last client detaches, the run keeps going for
+RUN_REATTACH_GRACE_SECONDS and is cancelled (stopping its tools) only if
+nobody reattaches. Finished runs stay replayable for RUN_RETENTION_SECONDS.
+
+A run executes in the worker process that started it, but a reattach may
+reach any worker. A worker that does not hold the run follows its log
+instead (RemoteRun), polling for new events until the owner marks the run
+done or exits, and keeps a heartbeat file fresh so that the owner does not
+cancel the run as detached meanwhile.
+"""
+
+import asyncio
+import json
+import logging
+import re
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from src.config.config import (
+    RUN_BUFFER_EVENTS,
+    RUN_LOG_FLUSH_SECONDS,
+    RUN_REATTACH_GRACE_SECONDS,
+    RUN_REMOTE_CLIENT_TIMEOUT_SECONDS,
+    RUN_REMOTE_POLL_SECONDS,
+    RUN_RETENTION_SECONDS,
+    RUN_SPILL_DIR,
+)
+from src.service.scheduler import Ticket, scheduler
+from src.service.stream_service import coalesce_deltas
+from src.utils.worker_utils import WORKER_ID, is_worker_alive
+
+logger = logging.getLogger(__name__)
+
+# (sequence number, event name, JSON-encoded data)
+RunEvent = Tuple[int, str, str]
+
+_RUN_ID = re.compile(r"[0-9a-f]{32}")
+
+_runs: Dict[str, "WorkflowRun"] = {}
+
+
+class Subscription:
+    """One client's cursor into a run's event stream."""
+
+    def __init__(self, run: "WorkflowRun", after_seq: int):
+        self.run = run
+        self.seq = after_seq
+        self.closed = False
+
+    def close(self) -> None:
+        """Stop iterating at the next wake-up, e.g. because the client went away."""
+        self.closed = True
+        self.run._notify()
+
+    async def __aiter__(self) -> AsyncIterator[RunEvent]:
+        run = self.run
+        run._attach()
+        try:
+            while not self.closed:
+                changed = run._changed
+                first_in_memory = run._memory[0][0] if run._memory else run.last_seq + 1
+                if self.seq + 1 < first_in_memory:
+                    await run._flush()
+                    spilled = await asyncio.to_thread(
+                        run._read_spilled, self.seq, first_in_memory - 1
+                    )
+                    for item in spilled:
+                        self.seq = item[0]
+                        yield item
+                    continue
+
+                for item in [item for item in run._memory if item[0] > self.seq]:
+                    self.seq = item[0]
+                    yield item
+                    if self.closed:
+                        return
+
+                if self.seq >= run.last_seq:
+                    if run.done:
+                        return
+                    await changed.wait()
+        finally:
+            run._detach()
+
+
+class WorkflowRun:
+    """A workflow executing in the background with a bounded replay buffer."""
+
+    def __init__(
+        self, session_id: str, ticket: Ticket, events: AsyncIterator[Dict[str, Any]]
+    ):
+        self.run_id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.last_seq = 0
+        self.done = False
+        self._memory: Deque[RunEvent] = deque()
+        # Byte offset in the log of each event, indexed by seq - 1
+        self._offsets: List[int] = []
+        self._log_size = 0
+        # Encoded events not yet written, and the task writing them
+        self._pending: List[bytes] = []
+        self._writer: Optional[asyncio.Task] = None
+        self._spill_path: Path = _log_path(self.run_id)
+        self._spill_path.parent.mkdir(parents=True, exist_ok=True)
+        self._spill_file = open(self._spill_path, "ab")
+        self._changed = asyncio.Event()
+        self._subscribers = 0
+        self._cancel_handle: Optional[asyncio.TimerHandle] = None
+        _owner_path(self.run_id).parent.mkdir(parents=True, exist_ok=True)
+        _owner_path(self.run_id).write_text(WORKER_ID)
+        self.task = asyncio.create_task(self._run(ticket, events))
+
+    def subscribe(self, after_seq: int = 0) -> Subscription:
+        """Follow the run's events after sequence number after_seq."""
+        return Subscription(self, after_seq)
+
+    def cancel(self) -> None:
+        """Cancel the run, stopping its workflow and tools."""
+        self.task.cancel()
+
+    async def _run(self, ticket: Ticket, events: AsyncIterator[Dict[str, Any]]) -> None:
+        try:
+            self._append(
+                "start_of_run", {"run_id": self.run_id, "session_id": self.session_id}
+            )
+            async for position in scheduler.wait(ticket):
+                self._append("queued", {"position": position, **scheduler.stats()})
+            async for event in coalesce_deltas(events):
+                self._append(event["event"], event["data"])
+        except asyncio.CancelledError:
+            logger.info(f"Run {self.run_id} cancelled")
+            raise
+        except Exception as e:
+            logger.error(f"Error in workflow run {self.run_id}: {e}")
+            self._append("error", {"message": str(e)})
+        finally:
+            scheduler.release(ticket)
+            try:
+                await self._flush()
+            finally:
+                self.done = True
+                self._spill_file.close()
+                # Followers on other workers stop once they have read up to here
+                _done_path(self.run_id).touch()
+                self._notify()
+                asyncio.get_running_loop().call_later(
+                    RUN_RETENTION_SECONDS, _evict, self.run_id
+                )
+
+    def _append(self, event: str, data: Any) -> None:
+        self.last_seq += 1
+        item = (self.last_seq, event, json.dumps(data, ensure_ascii=False))
+        self._log(item)
+        self._memory.append(item)
+        if len(self._memory) > RUN_BUFFER_EVENTS:
+            self._memory.popleft()
+        self._notify()
+
+    def _log(self, item: RunEvent) -> None:
+        line = json.dumps(item, ensure_ascii=False).encode("utf-8") + b"\n"
+        self._offsets.append(self._log_size)
+        self._log_size += len(line)
+        self._pending.append(line)
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write_pending())
+
+    async def _write_pending(self) -> None:
+        # Let events accumulate, then write whatever is pending in one go
+        try:
+            await asyncio.sleep(RUN_LOG_FLUSH_SECONDS)
+            while self._pending:
+                batch, self._pending = b"".join(self._pending), []
+                await asyncio.to_thread(self._write, batch)
+        finally:
+            self._writer = None
+
+    def _write(self, data: bytes) -> None:
+        self._spill_file.write(data)
+        self._spill_file.flush()
+
+    async def _flush(self) -> None:
+        """Wait until every event appended so far is in the log."""
+        while self._writer is not None:
+            # Shielded: a subscriber going away must not stop the writer
+            await asyncio.shield(self._writer)
+
+    def _read_spilled(self, after_seq: int, upto_seq: int) -> List[RunEvent]:
+        items = []
+        with open(self._spill_path, "rb") as f:
+            f.seek(self._offsets[after_seq])
+            for _ in range(upto_seq - after_seq):
+                seq, event, data = json.loads(f.readline())
+                items.append((seq, event, data))
+        return items
+
+    def _notify(self) -> None:
+        # Wake every waiting subscriber; later waiters get a fresh event
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def _attach(self) -> None:
+        self._subscribers += 1
+        if self._cancel_handle:
+            self._cancel_handle.cancel()
+            self._cancel_handle = None
+
+    def _detach(self) -> None:
+        self._subscribers -= 1
+        if self._subscribers or self.done:
+            return
+        if RUN_REATTACH_GRACE_SECONDS <= 0:
+            self.cancel()
+        else:
+            logger.info(
+                f"Run {self.run_id} detached, cancelling in {RUN_REATTACH_GRACE_SECONDS}s "
+                "unless a client reattaches"
+            )
+            self._cancel_handle = asyncio.get_running_loop().call_later(
+                RUN_REATTACH_GRACE_SECONDS, self._expire
+            )
+
+    def _expire(self) -> None:
+        self._cancel_handle = None
+        if self._subscribers or self.done:
+            return
+        if _has_remote_clients(self.run_id):
+            # A client follows the run through another worker
+            self._cancel_handle = asyncio.get_running_loop().call_later(
+                RUN_REMOTE_CLIENT_TIMEOUT_SECONDS, self._expire
+            )
+            return
+        self.cancel()
+
+
+class RemoteSubscription:
+    """One client's cursor into the log of a run held by another worker."""
+
+    def __init__(self, run: "RemoteRun", after_seq: int):
+        self.run = run
+        self.seq = after_seq
+        self.closed = False
+
+    def close(self) -> None:
+        """Stop iterating at the next poll."""
+        self.closed = True
+
+    async def __aiter__(self) -> AsyncIterator[RunEvent]:
+        run = self.run
+        offset = 0
+        while not self.closed:
+            # Checked before reading: once done, the log is complete
+            finished = run.finished()
+            items, offset = await asyncio.to_thread(run._read_log, offset)
+            for item in items:
+                if item[0] > self.seq:
+                    self.seq = item[0]
+                    yield item
+                    if self.closed:
+                        return
+            if finished:
+                return
+            _heartbeat_path(run.run_id).touch()
+            await asyncio.sleep(RUN_REMOTE_POLL_SECONDS)
+
+
+class RemoteRun:
+    """A run held by another worker process, followed through its event log."""
+
+    def __init__(self, run_id: str, owner: str):
+        self.run_id = run_id
+        self.owner = owner
+
+    def subscribe(self, after_seq: int = 0) -> RemoteSubscription:
+        """Follow the run's events after sequence number after_seq."""
+        return RemoteSubscription(self, after_seq)
+
+    def finished(self) -> bool:
+        """Whether the run is done, or its owner exited before finishing it."""
+        return _done_path(self.run_id).exists() or not is_worker_alive(self.owner)
+
+    def _read_log(self, offset: int) -> Tuple[List[RunEvent], int]:
+        try:
+            with open(_log_path(self.run_id), "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return [], offset
+        # A line still being written is picked up on the next poll
+        complete = data[: data.rfind(b"\n") + 1]
+        items = [tuple(json.loads(line)) for line in complete.splitlines()]
+        return items, offset + len(complete)
+
+
+def start_run(
+    session_id: str, ticket: Ticket, events: AsyncIterator[Dict[str, Any]]
+) -> WorkflowRun:
+    """
+    Start a detached run of a workflow event stream.
+
+    Args:
+        session_id: Session the run belongs to
+        ticket: Scheduler ticket; the run waits for admission and releases it
+        events: Events as yielded by run_agent_workflow
+
+    Returns:
+        The run, registered for reattachment by run_id
+    """
+    run = WorkflowRun(session_id, ticket, events)
+    _runs[run.run_id] = run
+    return run
+
+
+def get_run(run_id: str) -> Optional[WorkflowRun]:
+    """Get a running or recently finished run."""
+    return _runs.get(run_id)
+
+
+def follow_run(run_id: str) -> Optional[RemoteRun]:
+    """Follow a run held by another worker, if it is still known."""
+    if not _RUN_ID.fullmatch(run_id):
+        return None
+    owner = get_run_owner(run_id)
+    if owner is None or not _log_path(run_id).exists():
+        return None
+    return RemoteRun(run_id, owner)
+
+
+def get_run_owner(run_id: str) -> Optional[str]:
+    """Worker id of the process holding a run, if the run is known on this host."""
+    try:
+        return _owner_path(run_id).read_text().strip()
+    except (FileNotFoundError, OSError):
+        return None
+
+
+def parse_event_id(event_id: str) -> Tuple[str, int]:
+    """
+    Split an SSE event id "<run_id>:<seq>" as sent back in Last-Event-ID.
+
+    Raises:
+        ValueError: If the id is malformed
+    """
+    run_id, _, seq = event_id.strip().partition(":")
+    if not run_id or not seq.isdigit():
+        raise ValueError(f"Invalid event id: {event_id}")
+    return run_id, int(seq)
+
+
+def _owner_path(run_id: str) -> Path:
+    return RUN_SPILL_DIR / f"{run_id}.owner"
+
+
+def _log_path(run_id: str) -> Path:
+    return RUN_SPILL_DIR / f"{run_id}.jsonl"
+
+
+def _done_path(run_id: str) -> Path:
+    return RUN_SPILL_DIR / f"{run_id}.done"
+
+
+def _heartbeat_path(run_id: str) -> Path:
+    return RUN_SPILL_DIR / f"{run_id}.clients"
+
+
+def _run_files(run_id: str) -> List[Path]:
+    return [
+        _log_path(run_id),
+        _owner_path(run_id),
+        _done_path(run_id),
+        _heartbeat_path(run_id),
+    ]
+
+
+def _has_remote_clients(run_id: str) -> bool:
+    try:
+        age = time.time() - _heartbeat_path(run_id).stat().st_mtime
+    except FileNotFoundError:
+        return False
+    return age < RUN_REMOTE_CLIENT_TIMEOUT_SECONDS
+
+
+def _evict(run_id: str) -> None:
+    if _runs.pop(run_id, None):
+        for path in _run_files(run_id):
+            path.unlink(missing_ok=True)
+
+
+def _remove_stale_spills() -> None:
+    # Logs of runs whose worker has exited can never be followed again
+    if not RUN_SPILL_DIR.exists():
+        return
+    cutoff = time.time() - RUN_RETENTION_SECONDS
+    for log_path in RUN_SPILL_DIR.glob("*.jsonl"):
+        run_id = log_path.stem
+        owner = get_run_owner(run_id)
+        if owner and is_worker_alive(owner):
+            continue
+        try:
+            if log_path.stat().st_mtime >= cutoff:
+                continue
+        except FileNotFoundError:
+            continue
+        for path in _run_files(run_id):
+            path.unlink(missing_ok=True)
+
+
+_remove_stale_spills()
@@ -0,0 +1,213 @@
+"""
+Admission control and priority scheduling of workflow runs.
+
+Every chat run takes a ticket from the scheduler before its workflow starts.
+At most WORKFLOW_MAX_RUNNING workflows run at once, and at most
+WORKFLOW_SESSION_MAX_RUNNING per session. Further tickets wait in a bounded
+queue ordered by priority class, then arrival. Requests that cannot even be
+queued are rejected up front, so a burst never reaches the LLM providers.
+
+With several worker processes each runs its own scheduler with its share of
+the global limits. Requests of one session may reach any worker, so the
+per-session limits are counted across workers with slot lock files in
+WORKFLOW_SLOT_DIR; a ticket held back by another worker's run of its session
+re-checks every WORKFLOW_SLOT_POLL_SECONDS.
+"""
+
+import asyncio
+import itertools
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+
+from src.config.config import (
+    WORKFLOW_MAX_QUEUED,
+    WORKFLOW_MAX_RUNNING,
+    WORKFLOW_SESSION_MAX_PENDING,
+    WORKFLOW_SESSION_MAX_RUNNING,
+    WORKFLOW_SLOT_DIR,
+    WORKFLOW_SLOT_POLL_SECONDS,
+)
+from src.utils.worker_utils import acquire_slot, release_slot, worker_share
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first
+PRIORITY_CLASSES = {"interactive": 0, "batch": 1}
+# Suggested client back-off when a run is rejected
+RETRY_AFTER_SECONDS = 5
+
+
+class SchedulerFull(Exception):
+    """The queue is full; the server is overloaded (503)."""
+
+
+class SessionLimitExceeded(Exception):
+    """The session already has too many runs running or queued (429)."""
+
+
+@dataclass
+class Ticket:
+    """A workflow run's place in the scheduler."""
+
+    session_id: str
+    priority: int
+    seq: int
+    admitted: bool = False
+    released: bool = False
+    # Cross-worker session slots held by the ticket (see acquire_slot)
+    pending_slot: Optional[int] = None
+    running_slot: Optional[int] = None
+    # Set whenever the ticket is admitted or its queue position may have changed
+    changed: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class WorkflowScheduler:
+    """Global and per-session concurrency caps with a bounded priority queue."""
+
+    def __init__(
+        self,
+        max_running: int = WORKFLOW_MAX_RUNNING,
+        max_queued: int = WORKFLOW_MAX_QUEUED,
+        session_max_running: int = WORKFLOW_SESSION_MAX_RUNNING,
+        session_max_pending: int = WORKFLOW_SESSION_MAX_PENDING,
+        slot_dir: Optional[Path] = None,
+    ):
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self.session_max_running = session_max_running
+        self.session_max_pending = session_max_pending
+        # Shared with other workers if set; otherwise the session caps are per process
+        self.slot_dir = slot_dir
+        self._seq = itertools.count()
+        self._waiting: List[Ticket] = []
+        self._running: Dict[str, int] = {}
+        self._pending: Dict[str, int] = {}
+        self._running_total = 0
+
+    def submit(self, session_id: str, priority: str = "interactive") -> Ticket:
+        """
+        Take a ticket for a new run, admitting it at once if there is capacity.
+
+        Raises:
+            SessionLimitExceeded: If the session has too many runs running or queued
+            SchedulerFull: If the run would have to queue and the queue is full
+            ValueError: If the priority class is unknown
+        """
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority class: {priority}")
+        if self._pending.get(session_id, 0) >= self.session_max_pending:
+            raise SessionLimitExceeded(
+                f"Session {session_id} already has {self.session_max_pending} runs pending"
+            )
+
+        ticket = Ticket(session_id, PRIORITY_CLASSES[priority], next(self._seq))
+        if not self._can_run(ticket) and len(self._waiting) >= self.max_queued:
+            raise SchedulerFull("Too many workflows queued")
+        if self.slot_dir is not None:
+            ticket.pending_slot = acquire_slot(
+                self.slot_dir, f"pending:{session_id}", self.session_max_pending
+            )
+            if ticket.pending_slot is None:
+                raise SessionLimitExceeded(
+                    f"Session {session_id} already has {self.session_max_pending} runs pending"
+                )
+
+        self._pending[session_id] = self._pending.get(session_id, 0) + 1
+        self._waiting.append(ticket)
+        self._waiting.sort(key=lambda t: (t.priority, t.seq))
+        self._dispatch()
+        return ticket
+
+    async def wait(self, ticket: Ticket) -> AsyncIterator[int]:
+        """
+        Wait until the ticket is admitted.
+
+        Yields:
+            The ticket's 1-based queue position, each time it changes
+        """
+        last_position = None
+        while not ticket.admitted:
+            position = self.position(ticket)
+            if position != last_position:
+                last_position = position
+                yield position
+            ticket.changed.clear()
+            if self.slot_dir is None:
+                await ticket.changed.wait()
+                continue
+            # A slot freed by another worker sends no notification
+            try:
+                await asyncio.wait_for(
+                    ticket.changed.wait(), WORKFLOW_SLOT_POLL_SECONDS
+                )
+            except asyncio.TimeoutError:
+                self._dispatch()
+
+    def position(self, ticket: Ticket) -> int:
+        """1-based position of a waiting ticket, 0 once admitted."""
+        if ticket.admitted:
+            return 0
+        return self._waiting.index(ticket) + 1
+
+    def release(self, ticket: Ticket) -> None:
+        """Give back a ticket's slot or queue place; safe to call more than once."""
+        if ticket.released:
+            return
+        ticket.released = True
+        release_slot(ticket.running_slot)
+        release_slot(ticket.pending_slot)
+        session_id = ticket.session_id
+        self._pending[session_id] -= 1
+        if not self._pending[session_id]:
+            del self._pending[session_id]
+        if ticket.admitted:
+            self._running_total -= 1
+            self._running[session_id] -= 1
+            if not self._running[session_id]:
+                del self._running[session_id]
+        else:
+            self._waiting.remove(ticket)
+        self._dispatch()
+
+    def stats(self) -> Dict[str, int]:
+        """Running and queued counts, for monitoring."""
+        return {"running": self._running_total, "queued": len(self._waiting)}
+
+    def _can_run(self, ticket: Ticket) -> bool:
+        return (
+            self._running_total < self.max_running
+            and self._running.get(ticket.session_id, 0) < self.session_max_running
+        )
+
+    def _take_running_slot(self, ticket: Ticket) -> bool:
+        if self.slot_dir is None:
+            return True
+        ticket.running_slot = acquire_slot(
+            self.slot_dir, f"running:{ticket.session_id}", self.session_max_running
+        )
+        return ticket.running_slot is not None
+
+    def _dispatch(self) -> None:
+        # Admit in priority order, skipping tickets held back by their session's cap
+        for ticket in list(self._waiting):
+            if self._running_total >= self.max_running:
+                break
+            if self._can_run(ticket) and self._take_running_slot(ticket):
+                self._waiting.remove(ticket)
+                ticket.admitted = True
+                ticket.changed.set()
+                self._running_total += 1
+                running = self._running.get(ticket.session_id, 0)
+                self._running[ticket.session_id] = running + 1
+        # Positions may have shifted for everyone still waiting
+        for ticket in self._waiting:
+            ticket.changed.set()
+
+
+scheduler = WorkflowScheduler(
+    max_running=worker_share(WORKFLOW_MAX_RUNNING),
+    max_queued=worker_share(WORKFLOW_MAX_QUEUED),
+    slot_dir=WORKFLOW_SLOT_DIR,
+)
@@ -0,0 +1,230 @@
+"""
+Delivery of workflow event streams to SSE clients.
+
+WorkflowStream runs a workflow's event stream in its own task, so the
+workflow can be cancelled independently of the client and waiting on the
+client side never cancels a workflow step. on_disconnect notices a client
+going away without waiting for the next event.
+
+Models stream one `message` event per chunk, often a single token, and each
+one costs an SSE frame and a json.dumps. coalesce_deltas merges consecutive
+deltas of the same message and field for a short window, so clients receive
+the same text in the same order with far fewer events. Every other event is
+passed through unchanged, after flushing any pending delta.
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Union
+
+from starlette.requests import Request
+
+from src.config.config import (
+    DISCONNECT_POLL_SECONDS,
+    STREAM_COALESCE_BYTES,
+    STREAM_COALESCE_MS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Events read ahead of the client before the workflow is paused
+STREAM_QUEUE_SIZE = 256
+
+_END = object()
+
+
+class WorkflowStream:
+    """An event stream iterated by its own task and read through a bounded queue."""
+
+    def __init__(self, events: AsyncIterator[Dict[str, Any]]):
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        self.task = asyncio.create_task(self._pump(events))
+
+    async def _pump(self, events: AsyncIterator[Dict[str, Any]]) -> None:
+        try:
+            async for event in events:
+                await self._queue.put(event)
+            await self._queue.put(_END)
+        except asyncio.CancelledError:
+            # With a full queue the reader drains it and then sees the task is done
+            try:
+                self._queue.put_nowait(_END)
+            except asyncio.QueueFull:
+                pass
+            raise
+        except Exception as e:
+            await self._queue.put(e)
+
+    async def get(self, timeout: Optional[float] = None):
+        """
+        Get the next event, or the end-of-stream marker.
+
+        Raises:
+            asyncio.TimeoutError: If no event arrives within timeout
+            Exception: Whatever the event stream raised
+        """
+        if self._queue.empty() and self.task.done():
+            return _END
+        if timeout is None:
+            item = await self._queue.get()
+        else:
+            item = await asyncio.wait_for(self._queue.get(), timeout)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def cancel(self) -> None:
+        """Cancel the workflow; the reader receives the events queued so far."""
+        self.task.cancel()
+
+    async def aclose(self) -> None:
+        """Cancel the workflow and wait for it to finish cleaning up."""
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            if not self.task.done():
+                # The caller itself was cancelled; the workflow finishes cleaning up alone
+                raise
+
+    async def __aiter__(self):
+        while (item := await self.get()) is not _END:
+            yield item
+
+
+@asynccontextmanager
+async def on_disconnect(
+    request: Request,
+    callback: Callable[[], None],
+    poll_interval: float = DISCONNECT_POLL_SECONDS,
+):
+    """
+    Call callback as soon as the client disconnects.
+
+    The watcher runs next to the response for the duration of the block, so
+    a disconnect is noticed even while no events are being produced, e.g.
+    during a long bash or GhostCoder step.
+    """
+
+    async def watch():
+        while not await request.is_disconnected():
+            await asyncio.sleep(poll_interval)
+        logger.info("Client disconnected")
+        callback()
+
+    watcher = asyncio.create_task(watch())
+    try:
+        yield
+    finally:
+        watcher.cancel()
+
+
+def _delta_field(event: Dict[str, Any]) -> Optional[str]:
+    """Name of the single text field of a mergeable message delta, else None."""
+    if event.get("event") != "message":
+        return None
+    delta = event["data"].get("delta") or {}
+    if len(delta) != 1:
+        return None
+    field, value = next(iter(delta.items()))
+    return field if isinstance(value, str) else None
+
+
+async def coalesce_deltas(
+    events: Union[WorkflowStream, AsyncIterator[Dict[str, Any]]],
+    window_ms: int = STREAM_COALESCE_MS,
+    max_bytes: int = STREAM_COALESCE_BYTES,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Merge consecutive message deltas of a workflow event stream.
+
+    A delta is held for at most window_ms after its first chunk, or until it
+    reaches max_bytes, and is flushed early by any event it cannot be merged
+    with (another event type, message_id or delta field).
+
+    Args:
+        events: Events as yielded by run_agent_workflow, or a WorkflowStream of
+            them; the stream is closed when iteration ends
+        window_ms: Coalescing window in milliseconds; 0 passes events through
+        max_bytes: Size at which a merged delta is flushed
+
+    Yields:
+        The events, with runs of deltas merged
+    """
+    stream = events if isinstance(events, WorkflowStream) else WorkflowStream(events)
+    if window_ms <= 0:
+        try:
+            async for event in stream:
+                yield event
+        finally:
+            await stream.aclose()
+        return
+
+    loop = asyncio.get_running_loop()
+    window = window_ms / 1000
+    pending: Optional[Dict[str, Any]] = None
+    pending_field = ""
+    pending_parts: list = []
+    pending_bytes = 0
+    deadline = 0.0
+
+    def flush() -> Dict[str, Any]:
+        nonlocal pending
+        event = {
+            **pending,
+            "data": {
+                **pending["data"],
+                "delta": {pending_field: "".join(pending_parts)},
+            },
+        }
+        pending = None
+        pending_parts.clear()
+        return event
+
+    try:
+        while True:
+            if pending is None:
+                item = await stream.get()
+            else:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    yield flush()
+                    continue
+                try:
+                    item = await stream.get(timeout)
+                except asyncio.TimeoutError:
+                    yield flush()
+                    continue
+
+            if item is _END:
+                break
+
+            field = _delta_field(item)
+            if (
+                pending is not None
+                and field == pending_field
+                and item["data"].get("message_id") == pending["data"].get("message_id")
+            ):
+                text = item["data"]["delta"][field]
+                pending_parts.append(text)
+                pending_bytes += len(text.encode("utf-8"))
+            else:
+                if pending is not None:
+                    yield flush()
+                if field is None:
+                    yield item
+                    continue
+                text = item["data"]["delta"][field]
+                pending, pending_field = item, field
+                pending_parts.append(text)
+                pending_bytes = len(text.encode("utf-8"))
+                deadline = loop.time() + window
+
+            if pending_bytes >= max_bytes:
+                yield flush()
+
+        if pending is not None:
+            yield flush()
+    finally:
+        await stream.aclose()
@@ -1,17 +1,20 @@
 import asyncio
 import logging
-from typing import Dict, List, Any, Generator, Optional
+from typing import Callable, Dict, Iterable, List, Any, Generator, Optional
 
 from src.config import TEAM_MEMBERS, TEAM_MEMBER_CONFIGRATIONS
 from src.graph import build_graph
 from langchain_community.adapters.openai import convert_message_to_dict
-from src.constants import STREAMING_LLM_AGENTS, EventType
+from src.constants import SPECULATIVE_PLAN_EVENT, STREAMING_LLM_AGENTS, EventType
 import uuid
 
-from src.tools import browser_tool
-
-# Use Ghostcoder
-from ghostcoder.config import ghostcoder_config
+from src.llms.prompt_cache import PromptCacheStats
+from src.tools.browser import terminate_workflow_browsers
+from src.utils.process_utils import (
+    interrupt_workflow_threads,
+    terminate_workflow_processes,
+)
+from src.utils.workflow_context import WorkflowContext, workflow_scope
 
 # Configure logging
 logging.basicConfig(
@@ -30,8 +33,12 @@ logger = logging.getLogger(__name__)
 # Create the graph
 graph = build_graph()
 
-# Global variable to track current browser tool instance
-current_browser_tool: Optional[browser_tool] = None
+STREAMING_AGENTS = frozenset(STREAMING_LLM_AGENTS)
+# Filters pushed into astream_events: model and tool runs, plus the chains of
+# the agent nodes and the graph itself. Prompt, parser, retriever and nested
+# chain events are dropped before they reach run_agent_workflow.
+STREAM_INCLUDE_TYPES = ["chat_model", "tool"]
+STREAM_INCLUDE_NAMES = [*STREAMING_LLM_AGENTS, graph.get_name(), SPECULATIVE_PLAN_EVENT]
 
 
 async def run_agent_workflow(
@@ -41,6 +48,8 @@ async def run_agent_workflow(
     search_before_planning: Optional[bool] = False,
     team_members: Optional[list] = None,
     session_id: Optional[str] = "default",
+    history: Optional[str] = "full",
+    speculative_planning: Optional[bool] = False,
 ):
     """Run the agent workflow to process and respond to user input messages.
 
@@ -59,6 +68,12 @@ async def run_agent_workflow(
             If None, uses default TEAM_MEMBERS configuration
         session_id: Optional string identifier for maintaining conversation context.
             If not provided, defaults to "default"
+        history: "full" if user_input_messages is the whole conversation, "delta" if it
+            only holds the new turn. The conversation itself is kept in the session's
+            checkpoint, so in "full" mode only the last message is appended unless the
+            session has no stored history yet
+        speculative_planning: If True, the planner (and its search) starts together
+            with the coordinator and is cancelled if the coordinator answers directly
 
     Returns:
         Yields various event dictionaries containing workflow state and progress information,
@@ -77,131 +92,176 @@ async def run_agent_workflow(
     logger.info(f"Starting workflow with user input: {user_input_messages}")
 
     workflow_id = str(uuid.uuid4())
-    ghostcoder_config.TASK_ID = workflow_id
+    workflow_context = WorkflowContext(workflow_id=workflow_id, session_id=session_id)
 
     team_members = team_members if team_members else TEAM_MEMBERS
 
+    config = {"configurable": {"thread_id": session_id}}
+    if history == "delta" or not await _has_history(config):
+        new_messages = user_input_messages
+    else:
+        new_messages = [user_input_messages[-1]]
+
+    dispatch = _build_dispatch_table(workflow_id, user_input_messages, team_members)
+    cache_stats = PromptCacheStats()
+
     # Reset flag at the start of each workflow
     is_workflow_triggered = False
     last_event_data = None
 
     try:
-        async for event in graph.astream_events(
-            {
-                # Constants
-                "TEAM_MEMBERS": team_members,
-                "TEAM_MEMBER_CONFIGRATIONS": TEAM_MEMBER_CONFIGRATIONS,
-                # Runtime Variables
-                # TODO: history should be stored in backend, frontend only needs to send the use inputs.
-                "messages": [user_input_messages[-1]],
-                "deep_thinking_mode": deep_thinking_mode,
-                "search_before_planning": search_before_planning,
-                "session_id": session_id,
-            },
-            # client could send this param to talk with a specific thread.
-            config={"configurable": {"thread_id": session_id}},
-            version="v2",
-        ):
-            kind, data, name, node, langgraph_step, run_id = _extract_event_data(event)
-            last_event_data = data
-
-            # Process events and generate output data
-            for ydata in _process_event(
-                kind,
-                data,
-                name,
-                node,
-                workflow_id,
-                langgraph_step,
-                run_id,
-                user_input_messages,
-                team_members,
+        with workflow_scope(workflow_context):
+            async for event in graph.astream_events(
+                {
+                    # Constants
+                    "TEAM_MEMBERS": team_members,
+                    "TEAM_MEMBER_CONFIGRATIONS": TEAM_MEMBER_CONFIGRATIONS,
+                    # Runtime Variables
+                    "messages": new_messages,
+                    "deep_thinking_mode": deep_thinking_mode,
+                    "search_before_planning": search_before_planning,
+                    "speculative_planning": speculative_planning,
+                    "session_id": session_id,
+                    "task_id": workflow_id,
+                },
+                # client could send this param to talk with a specific thread.
+                config={**config, "callbacks": [cache_stats]},
+                version="v2",
+                include_types=STREAM_INCLUDE_TYPES,
+                include_names=STREAM_INCLUDE_NAMES,
             ):
-                if ydata:
+                last_event_data = event.get("data")
+                handler = dispatch.get(event.get("event"))
+                if handler is None:
+                    continue
+
+                # Process events and generate output data
+                for ydata in handler(event):
                     if ydata.get("event") == "start_of_workflow":
                         is_workflow_triggered = True
                     yield ydata
     except asyncio.CancelledError:
-        logger.info("Workflow cancelled, terminating browser agent if exists")
-        global current_browser_tool
-        if current_browser_tool:
-            await current_browser_tool.terminate()
+        logger.info("Workflow cancelled, stopping its commands, executions and browsers")
+        if workflow_context.speculative_plan:
+            workflow_context.speculative_plan.cancel()
+        interrupt_workflow_threads(workflow_context)
+        await asyncio.gather(
+            terminate_workflow_processes(workflow_context),
+            terminate_workflow_browsers(workflow_context),
+        )
         raise
 
     # Handle workflow completion - Fix for using yield from in async functions
+    prompt_cache = cache_stats.summary()
+    logger.info(f"Prompt cache for workflow {workflow_id}: {prompt_cache}")
     for final_event in _generate_final_events(
-        workflow_id, last_event_data, is_workflow_triggered
+        workflow_id, last_event_data, is_workflow_triggered, prompt_cache
     ):
         yield final_event
 
 
-def _extract_event_data(
-    event: Dict[str, Any],
-) -> tuple[str, Dict[str, Any], str, str, str, str]:
-    """Extract key data from events"""
-    kind = event.get("event")
-    data = event.get("data")
-    name = event.get("name")
-    metadata = event.get("metadata", {})
+async def _has_history(config: Dict[str, Any]) -> bool:
+    """Whether the session's checkpoint already holds conversation messages"""
+    snapshot = await graph.aget_state(config)
+    return bool(snapshot.values.get("messages"))
 
-    node = ""
-    if metadata.get("checkpoint_ns") is not None:
-        node = metadata.get("checkpoint_ns").split(":")[0]
 
-    langgraph_step = ""
-    if metadata.get("langgraph_step") is not None:
-        langgraph_step = str(metadata["langgraph_step"])
+async def get_session_history(session_id: str) -> List[Dict[str, Any]]:
+    """Get the conversation history stored for a session.
 
-    run_id = ""
-    if event.get("run_id") is not None:
-        run_id = str(event["run_id"])
-
-    return kind, data, name, node, langgraph_step, run_id
+    Args:
+        session_id: Session (thread) identifier
 
+    Returns:
+        List of OpenAI-style message dicts, empty if the session is unknown or expired
+    """
+    snapshot = await graph.aget_state({"configurable": {"thread_id": session_id}})
+    return [
+        convert_message_to_dict(msg) for msg in snapshot.values.get("messages", [])
+    ]
 
-def _process_event(
-    kind: str,
-    data: Dict[str, Any],
-    name: str,
-    node: str,
-    workflow_id: str,
-    langgraph_step: str,
-    run_id: str,
-    user_input_messages: List[Dict[str, Any]],
-    team_members: Optional[List[str]],
-) -> Generator[Dict[str, Any], None, None]:
-    """Process events and return corresponding output data"""
-    # Handle chain start events
-    if kind == EventType.CHAIN_START.value and name in STREAMING_LLM_AGENTS:
-        yield from _handle_chain_start(
-            name, workflow_id, langgraph_step, user_input_messages
-        )
 
-    # Handle chain end events
-    elif kind == EventType.CHAIN_END.value and name in STREAMING_LLM_AGENTS:
-        yield from _handle_chain_end(name, workflow_id, langgraph_step)
+def _event_node(event: Dict[str, Any]) -> str:
+    """Graph node an event was emitted from"""
+    checkpoint_ns = event.get("metadata", {}).get("checkpoint_ns")
+    return checkpoint_ns.split(":")[0] if checkpoint_ns is not None else ""
 
-    # Handle chat model start events
-    elif kind == EventType.CHAT_MODEL_START.value and node in STREAMING_LLM_AGENTS:
-        yield from _handle_chat_model_start(node)
 
-    # Handle chat model end events
-    elif kind == EventType.CHAT_MODEL_END.value and node in STREAMING_LLM_AGENTS:
-        yield from _handle_chat_model_end(node)
+def _event_step(event: Dict[str, Any]) -> str:
+    """LangGraph step of an event"""
+    langgraph_step = event.get("metadata", {}).get("langgraph_step")
+    return str(langgraph_step) if langgraph_step is not None else ""
 
-    # Handle chat model stream events
-    elif kind == EventType.CHAT_MODEL_STREAM.value and node in STREAMING_LLM_AGENTS:
-        yield from _handle_chat_model_stream(data, node)
 
-    # Handle tool start events
-    elif kind == EventType.TOOL_START.value and node in team_members:
-        yield from _handle_tool_start(node, name, data, workflow_id, run_id)
+def _event_run_id(event: Dict[str, Any]) -> str:
+    """Run id of an event"""
+    run_id = event.get("run_id")
+    return str(run_id) if run_id is not None else ""
 
-    # Handle tool end events
-    elif kind == EventType.TOOL_END.value and node in team_members:
-        yield from _handle_tool_end(node, name, data, workflow_id, run_id)
 
-    return None
+def _build_dispatch_table(
+    workflow_id: str,
+    user_input_messages: List[Dict[str, Any]],
+    team_members: List[str],
+) -> Dict[str, Callable[[Dict[str, Any]], Iterable[Dict[str, Any]]]]:
+    """Map each LangGraph event kind to the handler producing its output events"""
+    tool_nodes = frozenset(team_members)
+
+    def chain_start(event):
+        name = event.get("name")
+        if name in STREAMING_AGENTS:
+            yield from _handle_chain_start(
+                name, workflow_id, _event_step(event), user_input_messages
+            )
+
+    def chain_end(event):
+        name = event.get("name")
+        if name in STREAMING_AGENTS:
+            yield from _handle_chain_end(name, workflow_id, _event_step(event))
+
+    def chat_model_start(event):
+        node = _event_node(event)
+        if node in STREAMING_AGENTS:
+            yield from _handle_chat_model_start(node)
+
+    def chat_model_end(event):
+        node = _event_node(event)
+        if node in STREAMING_AGENTS:
+            yield from _handle_chat_model_end(node)
+
+    def chat_model_stream(event):
+        node = _event_node(event)
+        if node in STREAMING_AGENTS:
+            yield from _handle_chat_model_stream(event["data"], node)
+
+    def tool_start(event):
+        node = _event_node(event)
+        if node in tool_nodes:
+            yield from _handle_tool_start(
+                node, event.get("name"), event["data"], workflow_id, _event_run_id(event)
+            )
+
+    def tool_end(event):
+        node = _event_node(event)
+        if node in tool_nodes:
+            yield from _handle_tool_end(
+                node, event.get("name"), event["data"], workflow_id, _event_run_id(event)
+            )
+
+    def custom(event):
+        if event.get("name") == SPECULATIVE_PLAN_EVENT:
+            yield from _handle_speculative_plan(event["data"], workflow_id)
+
+    return {
+        EventType.CHAIN_START.value: chain_start,
+        EventType.CHAIN_END.value: chain_end,
+        EventType.CHAT_MODEL_START.value: chat_model_start,
+        EventType.CHAT_MODEL_END.value: chat_model_end,
+        EventType.CHAT_MODEL_STREAM.value: chat_model_stream,
+        EventType.TOOL_START.value: tool_start,
+        EventType.TOOL_END.value: tool_end,
+        EventType.CUSTOM.value: custom,
+    }
 
 
 def _handle_chain_start(
@@ -291,6 +351,21 @@ def _handle_chat_model_stream(
     }
 
 
+def _handle_speculative_plan(
+    data: Dict[str, Any], workflow_id: str
+) -> Generator[Dict[str, Any], None, None]:
+    """Emit a plan generated beside the coordinator as the planner's LLM output"""
+    yield from _handle_chat_model_start("planner")
+    yield {
+        "event": "message",
+        "data": {
+            "message_id": f"{workflow_id}_planner_speculative",
+            "delta": {"content": data["content"]},
+        },
+    }
+    yield from _handle_chat_model_end("planner")
+
+
 def _handle_tool_start(node, name, data, workflow_id, run_id):
     """Handle tool start events"""
     yield {
@@ -316,13 +391,22 @@ def _handle_tool_end(node, name, data, workflow_id, run_id):
 
 
 def _generate_final_events(
-    workflow_id: str, data: Dict[str, Any], is_workflow_triggered: bool
+    workflow_id: str,
+    data: Dict[str, Any],
+    is_workflow_triggered: bool,
+    prompt_cache: Optional[Dict[str, Any]] = None,
 ) -> Generator[Dict[str, Any], None, None]:
     """Generate workflow end events"""
     if is_workflow_triggered:
+        end_data = {"workflow_id": workflow_id}
+        if prompt_cache:
+            end_data["prompt_cache"] = prompt_cache
+        # Plan timing and supervisor LLM calls saved by routing from the plan
+        if data["output"].get("plan_stats"):
+            end_data["plan_stats"] = data["output"]["plan_stats"]
         yield {
             "event": "end_of_workflow",
-            "data": {"workflow_id": workflow_id},
+            "data": end_data,
         }
 
     yield {
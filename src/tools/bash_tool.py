@@ -2,6 +2,7 @@ import logging
 import subprocess
 from typing import Annotated
 from langchain_core.tools import tool
+from src.utils.process_utils import run_command
 from .decorators import log_io
 
 # Initialize logger
@@ -19,10 +20,8 @@ def bash_tool(
     """Use this to execute bash command and do necessary operations."""
     logger.info(f"Executing Bash Command: {cmd} with timeout {timeout}s")
     try:
-        # Execute the command and capture output
-        result = subprocess.run(
-            cmd, shell=True, check=True, text=True, capture_output=True, timeout=timeout
-        )
+        # Execute the command and capture output; a cancelled workflow kills it
+        result = run_command(cmd, timeout=timeout)
         # Return stdout as the result
         return result.stdout
     except subprocess.CalledProcessError as e:
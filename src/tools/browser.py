@@ -2,12 +2,13 @@ import asyncio
 import logging
 import json
 from pydantic import BaseModel, Field
-from typing import Optional, ClassVar, Type
+from typing import ClassVar, Type
 from langchain.tools import BaseTool
 from browser_use import AgentHistoryList, Browser, BrowserConfig
 from browser_use import Agent as BrowserAgent
 from src.llms.llm import vl_llm
 from src.tools.decorators import create_logged_tool
+from src.utils.workflow_context import WorkflowContext, get_workflow_context
 from src.config import (
     CHROME_INSTANCE_PATH,
     CHROME_HEADLESS,
@@ -35,8 +36,6 @@ if CHROME_PROXY_SERVER:
         proxy_config["password"] = CHROME_PROXY_PASSWORD
     browser_config.proxy = proxy_config
 
-expected_browser = Browser(config=browser_config)
-
 
 class BrowserUseInput(BaseModel):
     """Input for WriteFileTool."""
@@ -51,8 +50,6 @@ class BrowserTool(BaseTool):
         "Use this tool to interact with web browsers. Input should be a natural language description of what you want to do with the browser, such as 'Go to google.com and search for browser-use', or 'Navigate to Reddit and find the top post about AI'."
     )
 
-    _agent: Optional[BrowserAgent] = None
-
     def _generate_browser_result(
         self, result_content: str, generated_gif_path: str
     ) -> dict:
@@ -61,21 +58,30 @@ class BrowserTool(BaseTool):
             "generated_gif_path": generated_gif_path,
         }
 
-    def _run(self, instruction: str) -> str:
-        generated_gif_path = f"{BROWSER_HISTORY_DIR}/{uuid.uuid4()}.gif"
-        """Run the browser task synchronously."""
-        self._agent = BrowserAgent(
-            task=instruction,  # Will be set per request
+    def _create_agent(self, instruction: str, generated_gif_path: str) -> BrowserAgent:
+        """Create an agent with its own browser, tracked by the current workflow."""
+        agent = BrowserAgent(
+            task=instruction,
             llm=vl_llm,
-            browser=expected_browser,
+            # One browser per run, so concurrent workflows never share or close each other's
+            browser=Browser(config=browser_config),
             generate_gif=generated_gif_path,
         )
+        context = get_workflow_context()
+        if context:
+            context.browser_agents.add(agent)
+        return agent
+
+    def _run(self, instruction: str) -> str:
+        """Run the browser task synchronously."""
+        generated_gif_path = f"{BROWSER_HISTORY_DIR}/{uuid.uuid4()}.gif"
+        agent = self._create_agent(instruction, generated_gif_path)
 
         try:
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
             try:
-                result = loop.run_until_complete(self._agent.run())
+                result = loop.run_until_complete(agent.run())
 
                 if isinstance(result, AgentHistoryList):
                     return json.dumps(
@@ -88,30 +94,17 @@ class BrowserTool(BaseTool):
                         self._generate_browser_result(result, generated_gif_path)
                     )
             finally:
+                loop.run_until_complete(terminate_agent(agent))
                 loop.close()
         except Exception as e:
             return f"Error executing browser task: {str(e)}"
 
-    async def terminate(self):
-        """Terminate the browser agent if it exists."""
-        if self._agent and self._agent.browser:
-            try:
-                await self._agent.browser.close()
-            except Exception as e:
-                logger.error(f"Error terminating browser agent: {str(e)}")
-        self._agent = None
-
     async def _arun(self, instruction: str) -> str:
         """Run the browser task asynchronously."""
         generated_gif_path = f"{BROWSER_HISTORY_DIR}/{uuid.uuid4()}.gif"
-        self._agent = BrowserAgent(
-            task=instruction,
-            llm=vl_llm,
-            browser=expected_browser,
-            generate_gif=generated_gif_path,  # Will be set per request
-        )
+        agent = self._create_agent(instruction, generated_gif_path)
         try:
-            result = await self._agent.run()
+            result = await agent.run()
             if isinstance(result, AgentHistoryList):
                 return json.dumps(
                     self._generate_browser_result(
@@ -125,7 +118,31 @@ class BrowserTool(BaseTool):
         except Exception as e:
             return f"Error executing browser task: {str(e)}"
         finally:
-            await self.terminate()
+            await terminate_agent(agent)
+
+
+async def terminate_agent(agent: BrowserAgent) -> None:
+    """Close the browser of an agent and stop tracking it."""
+    context = get_workflow_context()
+    if context:
+        context.browser_agents.discard(agent)
+    if agent.browser:
+        try:
+            await agent.browser.close()
+        except Exception as e:
+            logger.error(f"Error terminating browser agent: {str(e)}")
+
+
+async def terminate_workflow_browsers(context: WorkflowContext) -> None:
+    """Close the browsers of every agent still running in a workflow."""
+    agents = list(context.browser_agents)
+    context.browser_agents.clear()
+    for agent in agents:
+        if agent.browser:
+            try:
+                await agent.browser.close()
+            except Exception as e:
+                logger.error(f"Error terminating browser agent: {str(e)}")
 
 
 BrowserTool = create_logged_tool(BrowserTool)
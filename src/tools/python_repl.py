@@ -2,6 +2,7 @@ import logging
 from typing import Annotated
 from langchain_core.tools import tool
 from langchain_experimental.utilities import PythonREPL
+from src.utils.process_utils import run_interruptible
 from .decorators import log_io
 
 # Initialize REPL and logger
@@ -25,7 +26,8 @@ def python_repl_tool(
 
     logger.info("Executing Python code")
     try:
-        result = repl.run(code)
+        # Interrupted with ExecutionCancelledError if the workflow is cancelled
+        result = run_interruptible(repl.run, code)
         # Check if the result is an error message by looking for typical error patterns
         if isinstance(result, str) and ("Error" in result or "Exception" in result):
             logger.error(result)
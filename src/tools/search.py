@@ -1,6 +1,20 @@
+import asyncio
 import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
 from langchain_community.tools.tavily_search import TavilySearchResults
-from src.config import TAVILY_MAX_RESULTS
+from src.config import (
+    TAVILY_MAX_RESULTS,
+    PLANNING_SEARCH_MAX_QUERIES,
+    PLANNING_SEARCH_MAX_RESULTS,
+    PLANNING_SEARCH_DEADLINE_SECONDS,
+    PLANNING_SEARCH_CACHE_TTL_SECONDS,
+    PLANNING_SEARCH_CACHE_SIZE,
+)
 from .decorators import create_logged_tool
 
 logger = logging.getLogger(__name__)
@@ -8,3 +22,185 @@ logger = logging.getLogger(__name__)
 # Initialize Tavily search tool with logging
 LoggedTavilySearch = create_logged_tool(TavilySearchResults)
 tavily_tool = LoggedTavilySearch(name="tavily_search", max_results=TAVILY_MAX_RESULTS)
+
+
+# Tavily rejects queries longer than this
+MAX_QUERY_CHARS = 400
+
+_WORD = re.compile(r"\w+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can could do does for from how i in into is it me my of on or "
+    "please should so that the their this to using was what when which why will with would "
+    "you your".split()
+)
+
+
+def normalize_query(query: str) -> str:
+    """Cache key of a query: its words, case-folded, without punctuation or extra spaces."""
+    return " ".join(_WORD.findall(query.casefold()))
+
+
+def request_text(content: Union[str, List[Any]]) -> str:
+    """The text of a message's content, joining the text parts of multimodal content."""
+    if isinstance(content, list):
+        content = " ".join(
+            part.get("text", "") if isinstance(part, dict) else str(part) for part in content
+        )
+    return " ".join((content or "").split())
+
+
+def reformulate_query(content: Union[str, List[Any]], max_queries: int) -> List[str]:
+    """
+    Derive up to max_queries distinct search queries from a user request.
+
+    The request itself comes first, followed by its keywords without stop
+    words. A query contained word for word in one already taken (keywords
+    equal to the request) is skipped, since it would mostly return the same
+    pages.
+    """
+    text = request_text(content)
+    keywords = " ".join(
+        word for word in _WORD.findall(text) if word.casefold() not in _STOPWORDS
+    )
+    queries, keys = [], []
+    for query in (text, keywords):
+        query = query[:MAX_QUERY_CHARS].strip()
+        key = normalize_query(query)
+        if key and not any(f" {key} " in f" {taken} " for taken in keys):
+            keys.append(key)
+            queries.append(query)
+    return queries[:max_queries]
+
+
+def dedupe_results(result_lists: Sequence[List[dict]], max_results: int) -> List[dict]:
+    """
+    Merge the results of several queries, best first and without duplicates.
+
+    Results are taken round-robin so every query contributes its top hits;
+    the same page (by URL, else by content) is kept once.
+    """
+    merged, seen = [], set()
+    for rank in range(max((len(results) for results in result_lists), default=0)):
+        for results in result_lists:
+            if rank >= len(results) or len(merged) >= max_results:
+                continue
+            result = results[rank]
+            key = result.get("url") or normalize_query(result.get("content", ""))
+            if key not in seen:
+                seen.add(key)
+                merged.append(result)
+    return merged
+
+
+class SearchCache:
+    """LRU cache of search results by normalized query; entries expire after ttl_seconds."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, List[dict]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[List[dict]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, results: List[dict]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+planning_search_cache = SearchCache(PLANNING_SEARCH_CACHE_TTL_SECONDS, PLANNING_SEARCH_CACHE_SIZE)
+# Searches in progress by normalized query, shared by concurrent requests
+_inflight: Dict[str, asyncio.Task] = {}
+
+
+async def _search(query: str, key: str) -> List[dict]:
+    try:
+        # Shared by every request waiting on this query, so not streamed to any of them
+        results = await tavily_tool.ainvoke({"query": query}, config={"callbacks": []})
+    except Exception as e:
+        logger.error(f"Tavily search for {query!r} failed: {e}")
+        return []
+    finally:
+        if _inflight.get(key) is asyncio.current_task():
+            del _inflight[key]
+    if not isinstance(results, list):
+        logger.error(f"Tavily search returned malformed response: {results}")
+        return []
+    planning_search_cache.put(key, results)
+    return results
+
+
+async def planning_search(
+    content: Union[str, List[Any]],
+    max_queries: int = PLANNING_SEARCH_MAX_QUERIES,
+    max_results: int = PLANNING_SEARCH_MAX_RESULTS,
+    deadline_seconds: float = PLANNING_SEARCH_DEADLINE_SECONDS,
+) -> List[dict]:
+    """
+    Search the web for a user request before planning.
+
+    Reformulations of the request are searched concurrently, each answered
+    from planning_search_cache when possible. Whatever has arrived after
+    deadline_seconds is used; searches still running are left to finish and
+    fill the cache for later requests.
+
+    Args:
+        content: The user's request, as text or multimodal content parts
+        max_queries: Most queries issued for the request
+        max_results: Most results returned
+        deadline_seconds: Longest time to wait for searches
+
+    Returns:
+        Deduplicated search results, best first
+    """
+    started = time.monotonic()
+    loop = asyncio.get_running_loop()
+    queries = reformulate_query(content, max_queries)
+    found: Dict[str, List[dict]] = {}
+    pending: Dict[str, asyncio.Task] = {}
+    for query in queries:
+        key = normalize_query(query)
+        cached = planning_search_cache.get(key)
+        if cached is not None:
+            found[key] = cached
+            continue
+        task = _inflight.get(key)
+        if task is None or task.get_loop() is not loop:
+            task = _inflight[key] = loop.create_task(_search(query, key))
+        pending[key] = task
+
+    late = 0
+    if pending:
+        _, not_done = await asyncio.wait(pending.values(), timeout=deadline_seconds)
+        late = len(not_done)
+        for key, task in pending.items():
+            if task not in not_done and not task.cancelled():
+                found[key] = task.result()
+
+    logger.info(
+        f"Planning search: {len(queries)} queries, {len(queries) - len(pending)} cached, "
+        f"{late} past the deadline, {time.monotonic() - started:.2f}s"
+    )
+    return dedupe_results(
+        [found[normalize_query(query)] for query in queries if normalize_query(query) in found],
+        max_results,
+    )
@@ -0,0 +1,127 @@
+"""
+Lightweight previews of AnnData (.h5ad) files.
+
+Files are opened in backed read-only mode, so X and layers stay on disk and
+only the obs/var tables are read. Previews are cached on disk by the file's
+path, size and mtime, so a file is summarised once until it changes, without
+reading it whole to hash it.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict
+
+from fastapi.concurrency import run_in_threadpool
+
+from src.config.config import ANNDATA_PREVIEW_DIR
+
+logger = logging.getLogger(__name__)
+
+# Rows of obs/var kept in a cached preview; requests may ask for fewer
+MAX_PREVIEW_ROWS = 50
+
+
+def _stat_key(file_path: Path) -> str:
+    stat = file_path.stat()
+    return hashlib.sha1(
+        f"{file_path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}".encode()
+    ).hexdigest()
+
+
+def _frame_head(frame, n_rows: int) -> Dict[str, Any]:
+    return json.loads(frame.head(n_rows).to_json(orient="split", default_handler=str))
+
+
+def _axis_summary(frame) -> Dict[str, Any]:
+    return {
+        "columns": [
+            {"name": str(name), "dtype": str(dtype)}
+            for name, dtype in frame.dtypes.items()
+        ],
+        "head": _frame_head(frame, MAX_PREVIEW_ROWS),
+    }
+
+
+def build_h5ad_preview(file_path: Path) -> Dict[str, Any]:
+    """
+    Summarise an .h5ad file without loading X into memory.
+
+    Args:
+        file_path: Path to the .h5ad file
+
+    Returns:
+        dict: shape, X storage info, obs/var columns with dtypes and head rows,
+            and the keys of layers, obsm, varm, obsp, varp and uns
+    """
+    import anndata
+
+    adata = anndata.read_h5ad(file_path, backed="r")
+    try:
+        x = adata.X
+        return {
+            "shape": list(adata.shape),
+            "X": {
+                "type": type(x).__name__ if x is not None else None,
+                "dtype": str(getattr(x, "dtype", "")) or None,
+                "format": getattr(x, "format", None) or getattr(x, "format_str", None),
+            },
+            "obs": _axis_summary(adata.obs),
+            "var": _axis_summary(adata.var),
+            # Backed files list X as a layer keyed None
+            "layers": [key for key in adata.layers.keys() if key is not None],
+            "obsm": list(adata.obsm.keys()),
+            "varm": list(adata.varm.keys()),
+            "obsp": list(adata.obsp.keys()),
+            "varp": list(adata.varp.keys()),
+            "uns": list(adata.uns.keys()),
+        }
+    finally:
+        if adata.isbacked:
+            adata.file.close()
+
+
+def _cached_preview(file_path: Path) -> Dict[str, Any]:
+    cache_path = ANNDATA_PREVIEW_DIR / f"{_stat_key(file_path)}.json"
+    if cache_path.exists():
+        with cache_path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+
+    preview = build_h5ad_preview(file_path)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    # A temporary file of its own, so concurrent misses for the same file
+    # never write into each other; the last rename wins with the same content
+    with tempfile.NamedTemporaryFile(
+        "w", encoding="utf-8", dir=cache_path.parent, suffix=".tmp", delete=False
+    ) as f:
+        json.dump(preview, f)
+    os.replace(f.name, cache_path)
+    return preview
+
+
+async def get_h5ad_preview(file_path: Path, n_rows: int = 10) -> Dict[str, Any]:
+    """
+    Get the (cached) preview of an .h5ad file.
+
+    Args:
+        file_path: Path to the .h5ad file
+        n_rows: Number of obs/var rows to include, at most MAX_PREVIEW_ROWS
+
+    Returns:
+        dict: See build_h5ad_preview
+    """
+    preview = await run_in_threadpool(_cached_preview, file_path)
+    n_rows = max(0, min(n_rows, MAX_PREVIEW_ROWS))
+    for axis in ("obs", "var"):
+        head = preview[axis]["head"]
+        preview[axis]["head"] = {
+            **head,
+            "index": head["index"][:n_rows],
+            "data": head["data"][:n_rows],
+        }
+    return preview
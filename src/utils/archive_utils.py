@@ -0,0 +1,255 @@
+"""
+Streaming archive export of session/task workspaces.
+
+The archive is written by a worker thread into a bounded queue and the
+response body is read from the other end, so nothing is staged on disk and
+at most a few chunks are held in memory. If the client goes away the reader
+closes the queue and the writer stops at its next write.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import tarfile
+import threading
+import time
+import uuid
+import zipfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.config.config import DEFAULT_WORK
+from src.utils.file_utils import is_path_name, resolve_within
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_CHUNK_SIZE = 1024 * 1024
+# Number of chunks buffered between the writer thread and the response
+ARCHIVE_QUEUE_SIZE = 8
+# Finished exports whose progress is still kept for polling
+MAX_TRACKED_EXPORTS = 100
+
+# (media type, file extension) per supported format
+ARCHIVE_FORMATS = {
+    "zip": ("application/zip", ".zip"),
+    "tar.zst": ("application/zstd", ".tar.zst"),
+    "tar": ("application/x-tar", ".tar"),
+}
+
+# Files that gain nothing from another compression pass
+ALREADY_COMPRESSED_EXTENSIONS = {
+    ".gz",
+    ".bgz",
+    ".bz2",
+    ".xz",
+    ".zst",
+    ".zip",
+    ".7z",
+    ".bam",
+    ".cram",
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".gif",
+    ".webp",
+    ".mp4",
+    ".pdf",
+    ".h5ad",
+    ".h5",
+    ".loom",
+}
+
+_exports: "OrderedDict[str, Dict]" = OrderedDict()
+
+
+class _QueueWriter:
+    """Minimal writable file object that hands data to the response through a queue."""
+
+    def __init__(self, chunks: queue.Queue):
+        self._chunks = chunks
+        self._buffer = bytearray()
+        self._position = 0
+        self.closed_by_reader = threading.Event()
+
+    def write(self, data) -> int:
+        self._buffer += data
+        self._position += len(data)
+        if len(self._buffer) >= ARCHIVE_CHUNK_SIZE:
+            self.flush()
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        if self._buffer:
+            self._put(bytes(self._buffer))
+            self._buffer.clear()
+
+    def _put(self, item) -> None:
+        while True:
+            if self.closed_by_reader.is_set():
+                raise BrokenPipeError("Archive reader went away")
+            try:
+                self._chunks.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+
+def export_root(
+    session_id: str, task_id: Optional[str] = None, storage_path: Path = DEFAULT_WORK
+) -> Optional[Path]:
+    """
+    Resolve the directory to export for a session, or one of its tasks.
+
+    Returns:
+        Path: The resolved directory, or None if the ids are not plain names or
+            the directory lies outside storage_path (e.g. through a symlink)
+    """
+    ids = (session_id, task_id) if task_id else (session_id,)
+    if not all(is_path_name(name) for name in ids):
+        return None
+    return resolve_within(storage_path, *ids)
+
+
+def collect_files(root: Path) -> List[Tuple[Path, str]]:
+    """
+    List (path, archive name) of every regular file under root, skipping hidden
+    entries and symlinks that point outside root.
+    """
+    files = []
+    resolved_root = root.resolve()
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        for filename in sorted(filenames):
+            if filename.startswith("."):
+                continue
+            path = Path(dirpath) / filename
+            if path.is_file() and path.resolve().is_relative_to(resolved_root):
+                files.append((path, path.relative_to(root.parent).as_posix()))
+    return files
+
+
+def _write_zip(writer: _QueueWriter, files, store: bool, progress: Dict) -> None:
+    with zipfile.ZipFile(writer, mode="w", allowZip64=True) as archive:
+        for path, arcname in files:
+            info = zipfile.ZipInfo.from_file(path, arcname)
+            if store or path.suffix.lower() in ALREADY_COMPRESSED_EXTENSIONS:
+                info.compress_type = zipfile.ZIP_STORED
+            else:
+                info.compress_type = zipfile.ZIP_DEFLATED
+            with open(path, "rb") as src, archive.open(info, mode="w") as dest:
+                while chunk := src.read(ARCHIVE_CHUNK_SIZE):
+                    dest.write(chunk)
+                    progress["bytes_done"] += len(chunk)
+            progress["files_done"] += 1
+
+
+def _write_tar(fileobj, files, progress: Dict) -> None:
+    with tarfile.open(fileobj=fileobj, mode="w|") as archive:
+        for path, arcname in files:
+            with open(path, "rb") as src:
+                archive.addfile(archive.gettarinfo(path, arcname), src)
+            progress["bytes_done"] += path.stat().st_size
+            progress["files_done"] += 1
+
+
+def _write_archive(
+    writer: _QueueWriter, files, fmt: str, store: bool, progress: Dict
+) -> None:
+    try:
+        if fmt == "zip":
+            _write_zip(writer, files, store, progress)
+        elif fmt == "tar.zst":
+            import zstandard
+
+            compressor = zstandard.ZstdCompressor(level=3, threads=-1)
+            with compressor.stream_writer(writer, closefd=False) as zst_writer:
+                _write_tar(zst_writer, files, progress)
+        else:
+            _write_tar(writer, files, progress)
+        writer.flush()
+        progress["status"] = "completed"
+    except BrokenPipeError:
+        progress["status"] = "cancelled"
+    except Exception as e:
+        logger.error(f"Error writing archive {progress['export_id']}: {e}")
+        progress["status"] = "failed"
+    finally:
+        progress["finished_at"] = time.time()
+        try:
+            writer._put(None)
+        except BrokenPipeError:
+            pass
+
+
+def start_export(
+    root: Path, fmt: str = "zip", store: bool = False
+) -> Tuple[Dict, Iterator[bytes]]:
+    """
+    Start streaming an archive of a workspace directory.
+
+    Args:
+        root: Directory to archive (a task or a whole session)
+        fmt: One of ARCHIVE_FORMATS; with 'tar.zst' the zstandard package is required
+        store: Store files without compression ('zip' only; use 'tar' for an
+            uncompressed tarball). Already-compressed files are always stored.
+
+    Returns:
+        Tuple of the progress dict (also available from get_export_progress)
+        and an iterator over the archive bytes
+
+    Raises:
+        ValueError: If the format is unknown or its compressor is unavailable
+    """
+    if fmt not in ARCHIVE_FORMATS:
+        raise ValueError(f"Unsupported archive format: {fmt}")
+    if fmt == "tar.zst":
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            raise ValueError("tar.zst export requires the zstandard package")
+
+    files = collect_files(root)
+    export_id = uuid.uuid4().hex
+    progress = {
+        "export_id": export_id,
+        "status": "running",
+        "files_total": len(files),
+        "files_done": 0,
+        "bytes_total": sum(path.stat().st_size for path, _ in files),
+        "bytes_done": 0,
+        "started_at": time.time(),
+        "finished_at": None,
+    }
+    _exports[export_id] = progress
+    while len(_exports) > MAX_TRACKED_EXPORTS:
+        _exports.popitem(last=False)
+
+    chunks: queue.Queue = queue.Queue(maxsize=ARCHIVE_QUEUE_SIZE)
+    writer = _QueueWriter(chunks)
+
+    def iterate() -> Iterator[bytes]:
+        # The writer starts with the first read, so an unread response leaks no thread
+        threading.Thread(
+            target=_write_archive,
+            args=(writer, files, fmt, store, progress),
+            name=f"export-{export_id[:8]}",
+            daemon=True,
+        ).start()
+        try:
+            while (chunk := chunks.get()) is not None:
+                yield chunk
+        finally:
+            writer.closed_by_reader.set()
+
+    return progress, iterate()
+
+
+def get_export_progress(export_id: str) -> Dict | None:
+    """Get the progress of a running or recently finished export."""
+    return _exports.get(export_id)
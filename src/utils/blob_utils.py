@@ -0,0 +1,276 @@
+"""
+Content-addressed storage for uploaded files.
+
+Each distinct file is stored once under BLOB_DIR by its sha256 and linked into
+every session workspace that uploads it, sharing its data blocks:
+
+- a reflink where the filesystem supports it (btrfs, xfs, ...): a writable,
+  copy-on-write file of the session's own, costing no disk until edited;
+- otherwise a hardlink (ext4, overlayfs, ...): the blob's own inode, which is
+  read-only so agents cannot edit the shared content. Agents write their
+  results to the task directories, not into the uploaded data; a process
+  running as root can still write through it, so do not run agents as root;
+- otherwise (e.g. the store on another filesystem) a plain copy. The blob is
+  then dropped, so the content is not kept twice; later links copy from a
+  session that holds it.
+
+Every link is recorded as a reference next to the blob, with the session,
+path, inode and modification time of the session file. A reference is live
+while that file is unchanged. Only sessions holding a live reference may link
+the content again by hash, and blobs without live references are deleted by
+collect_blobs, which store_blob runs at most every BLOB_GC_INTERVAL_SECONDS.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from src.config.config import BLOB_DIR, BLOB_GC_GRACE_SECONDS, BLOB_GC_INTERVAL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+# Linux FICLONE ioctl, supported by btrfs, xfs and others
+_FICLONE = 0x40049409
+
+_last_collection = 0.0
+
+
+def is_valid_sha256(sha256: str) -> bool:
+    """Check that a string is a lowercase hex sha256 digest."""
+    return bool(sha256) and bool(_SHA256_PATTERN.match(sha256))
+
+
+def blob_path(sha256: str) -> Path:
+    """Location of the blob with the given digest."""
+    if not is_valid_sha256(sha256):
+        raise ValueError(f"Invalid sha256: {sha256}")
+    return BLOB_DIR / sha256[:2] / sha256
+
+
+def has_blob(sha256: str) -> bool:
+    """Check whether the store already holds content with this digest."""
+    return is_valid_sha256(sha256) and blob_path(sha256).is_file()
+
+
+def _refs_dir(sha256: str) -> Path:
+    return BLOB_DIR / "refs" / sha256
+
+
+def blob_tmp_dir() -> Path:
+    """Scratch directory on the same filesystem as the blobs, for atomic moves."""
+    tmp_dir = BLOB_DIR / "tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    return tmp_dir
+
+
+def store_blob(tmp_path: Path, sha256: str) -> Path:
+    """
+    Move a fully written file into the store, or drop it if the content exists.
+
+    Args:
+        tmp_path: File whose content hashes to sha256
+        sha256: Digest of the file content
+
+    Returns:
+        Path: Location of the blob
+    """
+    _maybe_collect()
+    target = blob_path(sha256)
+    if target.exists():
+        tmp_path.unlink(missing_ok=True)
+        # Restart the grace period; the caller is about to link it
+        os.utime(target)
+        return target
+    target.parent.mkdir(parents=True, exist_ok=True)
+    # Read-only, as are the session files hardlinked to it
+    os.chmod(tmp_path, 0o444)
+    os.replace(tmp_path, target)
+    return target
+
+
+def _reflink(source: Path, target: Path) -> bool:
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(source, "rb") as src, open(target, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+        return True
+    except OSError:
+        target.unlink(missing_ok=True)
+        return False
+
+
+def _hardlink(source: Path, target: Path) -> bool:
+    try:
+        os.link(source, target)
+        return True
+    except OSError:
+        return False
+
+
+def _ref_sources(sha256: str) -> list[Path]:
+    """Session files holding the content, for blobs dropped after a copy."""
+    return [Path(ref["path"]) for ref in _live_refs(sha256)]
+
+
+def link_blob(sha256: str, target: Path, session_id: str) -> Path:
+    """
+    Put the content with this digest at target, replacing any existing file
+    there, and record the session's reference to it.
+
+    The file shares the blob's data blocks where the filesystem allows; see
+    the module docstring.
+
+    Args:
+        sha256: Digest of stored content
+        target: Path in the session workspace
+        session_id: Session the target belongs to
+
+    Returns:
+        Path: target
+
+    Raises:
+        FileNotFoundError: If no blob or session file holds the content
+    """
+    source = blob_path(sha256)
+    stored = source.is_file()
+    if not stored:
+        sources = _ref_sources(sha256)
+        if not sources:
+            raise FileNotFoundError(f"Blob not found: {sha256}")
+        if target.resolve() in sources:
+            # Already holds the content, and may be the only file that does
+            return target
+        source = sources[0]
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.unlink(missing_ok=True)
+    if _reflink(source, target):
+        hardlink = False
+    else:
+        hardlink = stored and _hardlink(source, target)
+        if not hardlink:
+            shutil.copyfile(source, target)
+            if stored:
+                # The session copy holds the content now; keep it only once
+                source.unlink(missing_ok=True)
+    _add_ref(sha256, target, session_id, hardlink)
+    return target
+
+
+def _add_ref(sha256: str, target: Path, session_id: str, hardlink: bool) -> None:
+    refs_dir = _refs_dir(sha256)
+    refs_dir.mkdir(parents=True, exist_ok=True)
+    target = target.resolve()
+    stat = target.stat()
+    ref = {
+        "session_id": session_id,
+        "path": str(target),
+        "inode": [stat.st_dev, stat.st_ino],
+        "mtime_ns": stat.st_mtime_ns,
+        "hardlink": hardlink,
+    }
+    name = hashlib.sha1(str(target).encode("utf-8")).hexdigest()
+    (refs_dir / f"{name}.json").write_text(json.dumps(ref), encoding="utf-8")
+
+
+def _is_live(ref: Dict) -> bool:
+    stat = Path(ref["path"]).stat()
+    if [stat.st_dev, stat.st_ino] != ref["inode"]:
+        # Deleted and replaced by another file
+        return False
+    # Hardlinks are read-only, and store_blob touches their shared mtime
+    return ref["hardlink"] or stat.st_mtime_ns == ref["mtime_ns"]
+
+
+def _live_refs(sha256: str) -> Iterable[Dict]:
+    """References to the content whose session file is unchanged; stale ones are removed."""
+    refs_dir = _refs_dir(sha256)
+    if not refs_dir.is_dir():
+        return
+    for ref_path in refs_dir.glob("*.json"):
+        try:
+            ref = json.loads(ref_path.read_text(encoding="utf-8"))
+            if _is_live(ref):
+                yield ref
+                continue
+        except (OSError, ValueError, KeyError):
+            pass
+        # Deleted, replaced or edited since it was linked
+        ref_path.unlink(missing_ok=True)
+
+
+def has_blob_ref(sha256: str, session_ids: Iterable[Optional[str]]) -> bool:
+    """Check whether one of the sessions holds an unchanged copy of the content."""
+    session_ids = {session_id for session_id in session_ids if session_id}
+    if not is_valid_sha256(sha256):
+        return False
+    return any(ref["session_id"] in session_ids for ref in _live_refs(sha256))
+
+
+def collect_blobs(grace_seconds: float = BLOB_GC_GRACE_SECONDS) -> Dict[str, int]:
+    """
+    Delete blobs that no session holds an unchanged copy of.
+
+    Blobs stored or re-stored within grace_seconds are kept, so content that
+    is being linked right now is never collected. Abandoned scratch files are
+    removed after the same grace period.
+
+    Returns:
+        dict: Number of blobs kept and deleted
+    """
+    global _last_collection
+    _last_collection = time.time()
+    cutoff = time.time() - grace_seconds
+    stats = {"kept": 0, "deleted": 0}
+    for path in BLOB_DIR.glob("[0-9a-f][0-9a-f]/*"):
+        sha256 = path.name
+        if not is_valid_sha256(sha256):
+            continue
+        try:
+            recent = path.stat().st_mtime >= cutoff
+        except FileNotFoundError:
+            continue
+        if recent or any(True for _ in _live_refs(sha256)):
+            stats["kept"] += 1
+            continue
+        path.unlink(missing_ok=True)
+        shutil.rmtree(_refs_dir(sha256), ignore_errors=True)
+        stats["deleted"] += 1
+
+    # References to content whose blob was dropped after a copy
+    for refs_dir in (BLOB_DIR / "refs").glob("*"):
+        if not has_blob(refs_dir.name) and not any(
+            True for _ in _live_refs(refs_dir.name)
+        ):
+            shutil.rmtree(refs_dir, ignore_errors=True)
+
+    for path in (BLOB_DIR / "tmp").glob("*"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except OSError:
+            pass
+
+    if stats["deleted"]:
+        logger.info(f"Blob collection: {stats}")
+    return stats
+
+
+def _maybe_collect() -> None:
+    if time.time() - _last_collection >= BLOB_GC_INTERVAL_SECONDS:
+        try:
+            collect_blobs()
+        except OSError as e:
+            logger.warning(f"Blob collection failed: {e}")
@@ -1,45 +1,113 @@
 from __future__ import annotations
 
+import codecs
+import hashlib
 import os
-import shutil
+import uuid
 from pathlib import Path
-from typing import Dict, List
+from typing import List, Tuple
 
 from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
 
-from src.config.config import DEFAULT_WORK
+from src.config.config import DEFAULT_WORK, UPLOAD_CHUNK_SIZE
+from src.utils.blob_utils import blob_tmp_dir, store_blob, link_blob
 
 
 async def save_file(session_id: str, file: UploadFile, storage_path: Path = DEFAULT_WORK) -> dict:
     """
     Save an uploaded file to the specified storage location.
 
+    The content is stored once in the blob store by its sha256 and linked into
+    the session data directory, so re-uploading a file costs no extra disk.
+
     Args:
         session_id: Unique identifier for the session
         file: UploadFile object from FastAPI
         storage_path: Base directory for storage (default: DEFAULT_STORAGE)
 
     Returns:
-        dict: Contains 'path' (relative to storage_path) and 'size' (file size in bytes)
+        dict: Contains 'path' (relative to storage_path), 'size' (file size in bytes)
+            and 'sha256' (hex digest of the contents)
+
+    Raises:
+        ValueError: If session_id is not a plain name or the file has no name
     """
+    if not is_path_name(session_id):
+        raise ValueError(f"Invalid session id: {session_id}")
+    filename = upload_name(file.filename)
     # Create directory structure: {storage_path}/{session_id}/{task_id}
     session_dir = storage_path / session_id / "data"
     session_dir.mkdir(parents=True, exist_ok=True)
 
-    file_path = session_dir / file.filename
-
-    # Stream file contents to disk
-    with file_path.open("wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    file_path = session_dir / filename
+    tmp_path = blob_tmp_dir() / uuid.uuid4().hex
 
-    # Get file size in bytes
-    file_size = file_path.stat().st_size
+    # Stream file contents to disk in chunks, writing off the event loop
+    hasher = hashlib.sha256()
+    file_size = 0
+    buffer = await run_in_threadpool(tmp_path.open, "wb")
+    try:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            await run_in_threadpool(buffer.write, chunk)
+            hasher.update(chunk)
+            file_size += len(chunk)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    finally:
+        await run_in_threadpool(buffer.close)
+
+    digest = hasher.hexdigest()
+    await run_in_threadpool(store_blob, tmp_path, digest)
+    await run_in_threadpool(link_blob, digest, file_path, session_id)
 
     return {
         "path": str(file_path.relative_to(storage_path)),
-        "size": file_size
+        "size": file_size,
+        "sha256": digest,
     }
 
+def resolve_within(base: Path, *parts: str) -> Path | None:
+    """
+    Join parts onto base and resolve the result, following symlinks.
+
+    Args:
+        base: Directory the result must stay in
+        parts: Path components supplied by the client
+
+    Returns:
+        Path: The resolved path, or None if it lies outside base (absolute
+            parts, `..` or a symlink pointing elsewhere)
+    """
+    root = base.resolve()
+    path = root.joinpath(*parts).resolve()
+    return path if path.is_relative_to(root) else None
+
+
+def is_path_name(name: str) -> bool:
+    """
+    Whether a session or task id is a single, plain path component.
+
+    Names starting with a dot are rejected too; they are the server's own
+    stores under the work directory (.blobs, .uploads, .runs, ...).
+    """
+    return bool(name) and not name.startswith(".") and Path(name).name == name and "\\" not in name
+
+
+def upload_name(filename: str | None) -> str:
+    """
+    The name an uploaded file is stored under: its last path component.
+
+    Raises:
+        ValueError: If that is empty, "." or ".."
+    """
+    name = Path(filename or "").name
+    if name in ("", ".", ".."):
+        raise ValueError(f"Invalid file name: {filename}")
+    return name
+
+
 def get_file_path(session_id: str, task_id: str, filename: str, storage_path: Path = DEFAULT_WORK) -> Path | None:
     """
     Get the full path to a file based on session, task, and filename.
@@ -51,13 +119,54 @@ def get_file_path(session_id: str, task_id: str, filename: str, storage_path: Pa
         storage_path: Base storage directory
 
     Returns:
-        Path: Full file path if exists, None otherwise
+        Path: Full (resolved) file path if it exists inside the task directory,
+            None otherwise
     """
-    file_path = storage_path / session_id / task_id / filename
-    if not file_path.exists():
+    if not (is_path_name(session_id) and is_path_name(task_id)):
+        return None
+    task_dir = resolve_within(storage_path, session_id, task_id)
+    if task_dir is None:
+        return None
+    # filename may include a sub-directory (e.g. figures/umap.png) but never escape the task
+    if ".." in Path(filename).parts:
+        return None
+    file_path = resolve_within(task_dir, filename)
+    if file_path is None or not file_path.is_file():
         return None
     return file_path
 
+def read_text_window(file_path: Path, offset: int = 0, length: int = 1024 * 1024) -> dict:
+    """
+    Read a window of a text file without loading the whole file.
+
+    The window is cut back to the last complete UTF-8 character, so reading
+    from 'next_offset' continues exactly where this window stopped.
+
+    Args:
+        file_path: Path to the file
+        offset: Byte offset to start reading at
+        length: Maximum number of bytes to read
+
+    Returns:
+        dict: Contains 'content', 'offset', 'next_offset', 'size' and 'eof'
+    """
+    size = file_path.stat().st_size
+    with open(file_path, "rb") as f:
+        f.seek(offset)
+        data = f.read(length)
+
+    eof = offset + len(data) >= size
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    content = decoder.decode(data, final=eof)
+    consumed = len(data) - len(decoder.getstate()[0])
+    return {
+        "content": content,
+        "offset": offset,
+        "next_offset": offset + consumed,
+        "size": size,
+        "eof": eof,
+    }
+
 async def delete_file_async(file_path: Path) -> bool:
     """
     Asynchronously delete a file.
@@ -114,70 +223,27 @@ def get_language_from_extension(filename: str) -> str:
     ext = os.path.splitext(filename)[1].lower()
     return extension_map.get(ext, 'Unknown')
 
-def list_files_in_task(session_id: str, task_id: str, storage_path: Path = DEFAULT_WORK) -> Dict[str, List[Dict]]:
-    """
-    List files in a task directory with detailed information including name, language, size, and content.
-    Files are categorized into codes, figures, and results.
-
-    Args:
-        session_id: Session identifier
-        task_id: Task identifier
-        storage_path: Base storage directory
-
-    Returns:
-        dict: Contains 'codes', 'figures', and 'results' lists with file details
-    """
-    task_dir = storage_path / session_id / task_id
-    if not task_dir.exists():
-        return {"codes": [], "figures": [], "results": [], "session_id": session_id, "task_id": task_id}
-
-    figures_dir = task_dir / "figures"
-    results_dir = task_dir / "results"
-
-    def get_file_details(file_path: Path, show_content: bool = False) -> Dict:
-        """Get file details including name, language, size, and content"""
-        if show_content:
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-            except UnicodeDecodeError:
-                # If UTF-8 fails, try reading as binary
-                with open(file_path, 'rb') as f:
-                    content = str(f.read())  # Convert bytes to string representation
-
-            return {
-                "name": file_path.name,
-                "language": get_language_from_extension(file_path.name),
-                "size": _human_readable_size(file_path.stat().st_size),
-                "content": content
-            }
-        return {
-            "name": file_path.name,
-            "language": get_language_from_extension(file_path.name),
-            "size_human": _human_readable_size(file_path.stat().st_size),
-        }
-
-
-    def _human_readable_size(size_bytes: int) -> str:
-        """Convert size in bytes to human-readable format"""
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if size_bytes < 1024.0:
-                return f"{size_bytes:.1f} {unit}"
-            size_bytes /= 1024.0
-        return f"{size_bytes:.1f} TB"
-
-    # Collect files in main task directory
-    codes = [get_file_details(f, True) for f in task_dir.iterdir() if f.is_file()]
-
-    # Collect figures (if figures directory exists)
-    figures = [f.name for f in figures_dir.iterdir() if f.is_file()] if figures_dir.exists() else []
-
-    # Collect results (if results directory exists)
-    results = [f.name for f in results_dir.iterdir() if f.is_file()] if results_dir.exists() else []
-    return {
-        "session_id": session_id,
-        "codes": codes,
-        "figures": figures,
-        "results": results,
-        "task_id": task_id,
-    }
\ No newline at end of file
+def human_readable_size(size_bytes: float) -> str:
+    """Convert size in bytes to human-readable format"""
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size_bytes < 1024.0:
+            return f"{size_bytes:.1f} {unit}"
+        size_bytes /= 1024.0
+    return f"{size_bytes:.1f} TB"
+
+# Task sub-directories in listing order: (category, directory relative to the task dir)
+TASK_FILE_KINDS = (("codes", ""), ("figures", "figures"), ("results", "results"))
+
+def scan_task_dir(task_dir: Path) -> List[Tuple[int, str, os.DirEntry]]:
+    """Collect (kind index, name, entry) for every file of the task, sorted."""
+    entries = []
+    for kind_index, (_, subdir) in enumerate(TASK_FILE_KINDS):
+        try:
+            with os.scandir(task_dir / subdir) as it:
+                for entry in it:
+                    if entry.is_file():
+                        entries.append((kind_index, entry.name, entry))
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+    entries.sort(key=lambda e: (e[0], e[1]))
+    return entries
@@ -0,0 +1,117 @@
+"""
+Thumbnail and preview cache for generated figures.
+
+Variants are WebP images at a fixed set of widths, stored under
+THUMBNAIL_CACHE_DIR and keyed by the source path, mtime and size, so a figure
+that is regenerated gets new variants automatically. They are built on first
+request in a small thread pool; concurrent requests for the same variant wait
+on the same build.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional
+
+from src.config.config import THUMBNAIL_CACHE_DIR, THUMBNAIL_WIDTHS, THUMBNAIL_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Raster formats Pillow can open; vector figures (pdf, svg) are served as-is
+THUMBNAIL_SOURCE_EXTENSIONS = {
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".gif",
+    ".bmp",
+    ".tif",
+    ".tiff",
+    ".webp",
+}
+
+_executor: Optional[ThreadPoolExecutor] = None
+_pending: Dict[str, asyncio.Future] = {}
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=THUMBNAIL_WORKERS, thread_name_prefix="thumbnail"
+        )
+    return _executor
+
+
+def snap_width(width: int) -> int:
+    """Return the smallest configured width that is at least the requested width."""
+    for candidate in sorted(THUMBNAIL_WIDTHS):
+        if candidate >= width:
+            return candidate
+    return max(THUMBNAIL_WIDTHS)
+
+
+def thumbnail_path(source: Path, width: int) -> Path:
+    """Cache location of the variant of source at the given width."""
+    stat = source.stat()
+    key = hashlib.sha1(
+        f"{source.resolve()}:{stat.st_mtime_ns}:{stat.st_size}:{width}".encode()
+    ).hexdigest()
+    return THUMBNAIL_CACHE_DIR / key[:2] / f"{key}.webp"
+
+
+def _build_thumbnail(source: Path, target: Path, width: int) -> Path:
+    from PIL import Image
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_target = target.with_suffix(f".{os.getpid()}.tmp")
+    with Image.open(source) as image:
+        image.seek(0)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        # thumbnail() keeps the aspect ratio and never upscales
+        image.thumbnail((width, width * 16), Image.Resampling.LANCZOS)
+        image.save(tmp_target, format="WEBP", quality=85, method=4)
+    os.replace(tmp_target, target)
+    return target
+
+
+async def get_thumbnail(source: Path, width: int) -> Optional[Path]:
+    """
+    Get the cached WebP variant of a figure, building it if necessary.
+
+    Args:
+        source: Path of the original image
+        width: Requested width in pixels, snapped to THUMBNAIL_WIDTHS
+
+    Returns:
+        Path of the cached variant, or None if the source format is not supported
+        or the variant could not be built (callers should serve the original)
+    """
+    if source.suffix.lower() not in THUMBNAIL_SOURCE_EXTENSIONS:
+        return None
+
+    width = snap_width(width)
+    target = thumbnail_path(source, width)
+    if target.exists():
+        return target
+
+    key = str(target)
+    future = _pending.get(key)
+    if future is None:
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            _get_executor(), _build_thumbnail, source, target, width
+        )
+        _pending[key] = future
+        future.add_done_callback(lambda _: _pending.pop(key, None))
+
+    try:
+        return await asyncio.shield(future)
+    except Exception as e:
+        logger.warning(f"Failed to build thumbnail for {source}: {e}")
+        return None
@@ -0,0 +1,137 @@
+"""
+Tool executions that a cancelled workflow can stop.
+
+Shell commands run in their own process group and are registered with the
+current workflow, so cancelling the workflow kills the whole command tree.
+In-process executions (the Python REPL) register their thread and are
+interrupted by raising ExecutionCancelledError in it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import ctypes
+import logging
+import os
+import signal
+import subprocess
+import threading
+from typing import Any, Callable, Optional
+
+from src.utils.workflow_context import WorkflowContext, get_workflow_context
+
+logger = logging.getLogger(__name__)
+
+# Seconds between SIGTERM and SIGKILL when stopping a cancelled workflow's commands
+TERMINATE_GRACE_SECONDS = 3
+
+
+class ExecutionCancelledError(Exception):
+    """Raised inside a tool execution whose workflow was cancelled."""
+
+
+def run_command(
+    cmd: str, timeout: Optional[float] = None
+) -> subprocess.CompletedProcess:
+    """
+    Run a shell command like `subprocess.run(cmd, shell=True, check=True, text=True,
+    capture_output=True, timeout=timeout)`, tracked by the current workflow.
+
+    Raises:
+        subprocess.CalledProcessError: If the command exits with a non-zero code
+        subprocess.TimeoutExpired: If the command does not finish within timeout;
+            the whole process group is killed
+    """
+    context = get_workflow_context()
+    with subprocess.Popen(
+        cmd,
+        shell=True,
+        text=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True,
+    ) as process:
+        if context:
+            with context.lock:
+                context.processes.add(process)
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            _signal_group(process, signal.SIGKILL)
+            process.communicate()
+            raise
+        finally:
+            if context:
+                with context.lock:
+                    context.processes.discard(process)
+
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, cmd, stdout, stderr)
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+
+def _signal_group(process: subprocess.Popen, sig: int) -> None:
+    try:
+        os.killpg(process.pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+async def terminate_workflow_processes(context: WorkflowContext) -> None:
+    """SIGTERM the process groups of a workflow's commands, then SIGKILL stragglers."""
+    with context.lock:
+        processes = list(context.processes)
+    if not processes:
+        return
+    for process in processes:
+        _signal_group(process, signal.SIGTERM)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + TERMINATE_GRACE_SECONDS
+    while loop.time() < deadline and any(p.poll() is None for p in processes):
+        await asyncio.sleep(0.1)
+    for process in processes:
+        if process.poll() is None:
+            _signal_group(process, signal.SIGKILL)
+    logger.info(
+        f"Terminated {len(processes)} command(s) of workflow {context.workflow_id}"
+    )
+
+
+def _set_async_exc(ident: int, exc: Optional[type]) -> None:
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(
+        ctypes.c_ulong(ident), ctypes.py_object(exc) if exc else None
+    )
+
+
+def run_interruptible(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Call func in this thread, registered so a workflow cancel can interrupt it."""
+    context = get_workflow_context()
+    if context is None:
+        return func(*args, **kwargs)
+    ident = threading.get_ident()
+    with context.lock:
+        context.threads.add(ident)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        with context.lock:
+            context.threads.discard(ident)
+            # Drop an interrupt that was requested but not yet delivered
+            _set_async_exc(ident, None)
+
+
+def interrupt_workflow_threads(context: WorkflowContext) -> None:
+    """
+    Raise ExecutionCancelledError in a workflow's running in-process executions.
+
+    The exception is delivered at the next Python bytecode, so a long call into
+    C code finishes that call first.
+    """
+    with context.lock:
+        for ident in context.threads:
+            _set_async_exc(ident, ExecutionCancelledError)
+        count = len(context.threads)
+    if count:
+        logger.info(
+            f"Interrupted {count} execution(s) of workflow {context.workflow_id}"
+        )
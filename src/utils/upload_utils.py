@@ -0,0 +1,405 @@
+"""
+Resumable chunked uploads.
+
+An upload is staged under UPLOAD_TMP_DIR as ``{upload_id}.part`` with a
+``{upload_id}.json`` manifest next to it. The size of the part file is the
+authoritative offset, so a client that lost its connection can ask for the
+current offset and continue from there. Disk writes run in the threadpool so
+large bodies never block the event loop.
+
+Chunks of one upload may reach different worker processes. Appends and
+completion hold a file lock (``{upload_id}.lock``) shared by all workers, and
+a worker's running hash is only used while it covers exactly the bytes on
+disk; otherwise the part file is re-hashed on completion.
+
+Uploads that received nothing for UPLOAD_ABANDON_SECONDS are deleted by
+collect_uploads, which init_upload runs at most every
+UPLOAD_GC_INTERVAL_SECONDS. The same sweep drops this process's hash state
+and locks of uploads that are gone, e.g. completed by another worker.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import time
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from src.config.config import (
+    DEFAULT_WORK,
+    UPLOAD_ABANDON_SECONDS,
+    UPLOAD_CHUNK_SIZE,
+    UPLOAD_GC_INTERVAL_SECONDS,
+    UPLOAD_TMP_DIR,
+)
+from src.utils.blob_utils import has_blob_ref, store_blob, link_blob
+from src.utils.file_utils import is_path_name, upload_name
+from src.utils.worker_utils import file_lock, try_file_lock
+
+logger = logging.getLogger(__name__)
+
+
+class UploadOffsetMismatch(ValueError):
+    """Raised when a chunk does not start at the current end of the upload."""
+
+    def __init__(self, expected: int, received: int):
+        super().__init__(
+            f"Chunk offset {received} does not match upload offset {expected}"
+        )
+        self.expected = expected
+        self.received = received
+
+
+# Incremental sha256 state per upload in this process: (hasher, number of
+# bytes hashed). Lost on restart, and stale once another worker appended a
+# chunk; complete_upload re-hashes the part file in those cases.
+_hash_state: Dict[str, Tuple["hashlib._Hash", int]] = {}
+_upload_locks: Dict[str, asyncio.Lock] = {}
+_last_collection = 0.0
+
+
+def _manifest_path(upload_id: str) -> Path:
+    return UPLOAD_TMP_DIR / f"{upload_id}.json"
+
+
+def _part_path(upload_id: str) -> Path:
+    return UPLOAD_TMP_DIR / f"{upload_id}.part"
+
+
+def _lock_path(upload_id: str) -> Path:
+    return UPLOAD_TMP_DIR / f"{upload_id}.lock"
+
+
+@contextlib.asynccontextmanager
+async def _locked(upload_id: str):
+    """Serialise work on an upload within this process and across workers."""
+    if upload_id not in _upload_locks:
+        _upload_locks[upload_id] = asyncio.Lock()
+    async with _upload_locks[upload_id], file_lock(_lock_path(upload_id)):
+        # Another worker may have completed the upload while we waited
+        if not _manifest_path(upload_id).exists():
+            _forget(upload_id)
+            raise FileNotFoundError(f"Unknown upload: {upload_id}")
+        yield
+
+
+def _forget(upload_id: str) -> None:
+    _hash_state.pop(upload_id, None)
+    _upload_locks.pop(upload_id, None)
+
+
+def _load_manifest(upload_id: str) -> dict:
+    # upload ids are generated by us; reject anything that could escape the staging dir
+    if not upload_id or Path(upload_id).name != upload_id:
+        raise FileNotFoundError(f"Unknown upload: {upload_id}")
+    manifest_path = _manifest_path(upload_id)
+    if not manifest_path.exists():
+        raise FileNotFoundError(f"Unknown upload: {upload_id}")
+    with manifest_path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _hash_file(file_path: Path) -> Tuple["hashlib._Hash", int]:
+    hasher = hashlib.sha256()
+    size = 0
+    with file_path.open("rb") as f:
+        while chunk := f.read(UPLOAD_CHUNK_SIZE):
+            hasher.update(chunk)
+            size += len(chunk)
+    return hasher, size
+
+
+def init_upload(
+    session_id: str,
+    filename: str,
+    total_size: Optional[int] = None,
+    storage_path: Path = DEFAULT_WORK,
+) -> dict:
+    """
+    Register a new resumable upload.
+
+    Args:
+        session_id: Session the file belongs to
+        filename: Original file name (directory components are stripped)
+        total_size: Expected size in bytes, checked on completion if given
+        storage_path: Base directory the finished file is moved into
+
+    Returns:
+        dict: Contains 'upload_id', 'offset' and 'chunk_size'
+
+    Raises:
+        ValueError: If session_id is not a plain name or filename has no name
+    """
+    if not is_path_name(session_id):
+        raise ValueError(f"Invalid session id: {session_id}")
+    filename = upload_name(filename)
+    UPLOAD_TMP_DIR.mkdir(parents=True, exist_ok=True)
+    _maybe_collect()
+    upload_id = uuid.uuid4().hex
+    manifest = {
+        "session_id": session_id,
+        "filename": filename,
+        "total_size": total_size,
+        "storage_path": str(storage_path),
+    }
+    with _manifest_path(upload_id).open("w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    _part_path(upload_id).touch()
+    _hash_state[upload_id] = (hashlib.sha256(), 0)
+
+    return {"upload_id": upload_id, "offset": 0, "chunk_size": UPLOAD_CHUNK_SIZE}
+
+
+def get_upload_status(upload_id: str) -> dict:
+    """
+    Get the current state of an upload so a client can resume it.
+
+    Args:
+        upload_id: Identifier returned by init_upload
+
+    Returns:
+        dict: Contains 'upload_id', 'filename', 'offset' and 'total_size'
+
+    Raises:
+        FileNotFoundError: If the upload does not exist
+    """
+    manifest = _load_manifest(upload_id)
+    return {
+        "upload_id": upload_id,
+        "filename": manifest["filename"],
+        "offset": _part_path(upload_id).stat().st_size,
+        "total_size": manifest["total_size"],
+    }
+
+
+async def write_chunk(upload_id: str, offset: int, stream: AsyncIterator[bytes]) -> int:
+    """
+    Append a chunk streamed from the request body at the given offset.
+
+    Args:
+        upload_id: Identifier returned by init_upload
+        offset: Byte offset the chunk starts at, must equal the current offset
+        stream: Async iterator over the request body
+
+    Returns:
+        int: The new upload offset
+
+    Raises:
+        FileNotFoundError: If the upload does not exist
+        UploadOffsetMismatch: If offset is not the current end of the upload
+        ValueError: If the chunk would exceed the declared total size
+    """
+    manifest = _load_manifest(upload_id)
+    part_path = _part_path(upload_id)
+
+    async with _locked(upload_id):
+        current = part_path.stat().st_size
+        if offset != current:
+            raise UploadOffsetMismatch(current, offset)
+
+        hasher, hashed = _hash_state.get(upload_id, (None, -1))
+        if hashed != current:
+            # Hash state was lost (e.g. restart) or another worker appended
+            # since; it is rebuilt on completion
+            hasher = None
+
+        total_size = manifest["total_size"]
+        written = 0
+        f = await run_in_threadpool(part_path.open, "ab")
+        try:
+            async for data in stream:
+                if not data:
+                    continue
+                if (
+                    total_size is not None
+                    and current + written + len(data) > total_size
+                ):
+                    raise ValueError(
+                        f"Upload exceeds declared size of {total_size} bytes"
+                    )
+                await run_in_threadpool(f.write, data)
+                if hasher is not None:
+                    hasher.update(data)
+                written += len(data)
+        finally:
+            await run_in_threadpool(f.close)
+            # Keep the hash in sync with whatever reached the disk, even on error
+            if hasher is not None:
+                _hash_state[upload_id] = (hasher, current + written)
+            else:
+                _hash_state.pop(upload_id, None)
+
+    return current + written
+
+
+async def complete_upload(upload_id: str, sha256: Optional[str] = None) -> dict:
+    """
+    Finish an upload, move it into the blob store and link it into the
+    session data directory.
+
+    Args:
+        upload_id: Identifier returned by init_upload
+        sha256: Optional expected hex digest to verify against
+
+    Returns:
+        dict: Contains 'session_id', 'name', 'path' (relative to storage_path),
+            'size' and 'sha256'
+
+    Raises:
+        FileNotFoundError: If the upload does not exist
+        ValueError: If the size or checksum does not match
+    """
+    manifest = _load_manifest(upload_id)
+    part_path = _part_path(upload_id)
+
+    async with _locked(upload_id):
+        size = part_path.stat().st_size
+        hasher, hashed = _hash_state.get(upload_id, (None, -1))
+        if hasher is None or hashed != size:
+            hasher, size = await run_in_threadpool(_hash_file, part_path)
+        digest = hasher.hexdigest()
+
+        if manifest["total_size"] is not None and size != manifest["total_size"]:
+            raise ValueError(
+                f"Upload incomplete: received {size} of {manifest['total_size']} bytes"
+            )
+        if sha256 and sha256.lower() != digest:
+            raise ValueError("Checksum mismatch")
+
+        storage_path = Path(manifest["storage_path"])
+        session_dir = storage_path / manifest["session_id"] / "data"
+        session_dir.mkdir(parents=True, exist_ok=True)
+        file_path = session_dir / manifest["filename"]
+        await run_in_threadpool(store_blob, part_path, digest)
+        await run_in_threadpool(link_blob, digest, file_path, manifest["session_id"])
+        _manifest_path(upload_id).unlink(missing_ok=True)
+        _lock_path(upload_id).unlink(missing_ok=True)
+
+    _forget(upload_id)
+
+    return {
+        "session_id": manifest["session_id"],
+        "name": manifest["filename"],
+        "path": str(file_path.relative_to(storage_path)),
+        "size": size,
+        "sha256": digest,
+    }
+
+
+async def link_existing_upload(
+    session_id: str,
+    filename: str,
+    sha256: str,
+    storage_path: Path = DEFAULT_WORK,
+    source_session_id: Optional[str] = None,
+) -> Optional[dict]:
+    """
+    Add a file the server already holds to a session without re-sending it.
+
+    Only content the caller uploaded can be linked: session_id or
+    source_session_id must hold an unchanged copy of it.
+
+    Args:
+        session_id: Session the file belongs to
+        filename: File name in the session data directory
+        sha256: Hex digest of the file content
+        storage_path: Base directory of the session workspaces
+        source_session_id: Another session of the caller holding the content
+
+    Returns:
+        dict: Same shape as complete_upload, or None if the content is unknown
+            to both sessions
+
+    Raises:
+        ValueError: If session_id is not a plain name or filename has no name
+    """
+    if not is_path_name(session_id):
+        raise ValueError(f"Invalid session id: {session_id}")
+    filename = upload_name(filename)
+    sha256 = sha256.lower()
+    if not await run_in_threadpool(
+        has_blob_ref, sha256, (session_id, source_session_id)
+    ):
+        return None
+
+    file_path = storage_path / session_id / "data" / filename
+    await run_in_threadpool(link_blob, sha256, file_path, session_id)
+    return {
+        "session_id": session_id,
+        "name": filename,
+        "path": str(file_path.relative_to(storage_path)),
+        "size": file_path.stat().st_size,
+        "sha256": sha256,
+    }
+
+
+def _last_activity(upload_id: str) -> float:
+    """When the upload was started or last received a chunk; 0 if it is gone."""
+    mtimes = []
+    for path in (_manifest_path(upload_id), _part_path(upload_id)):
+        try:
+            mtimes.append(path.stat().st_mtime)
+        except FileNotFoundError:
+            pass
+    return max(mtimes, default=0.0)
+
+
+def collect_uploads(max_age_seconds: float = UPLOAD_ABANDON_SECONDS) -> Dict[str, int]:
+    """
+    Delete uploads that received nothing for max_age_seconds.
+
+    An upload whose lock is held (a chunk or completion in progress on any
+    worker) is kept. Staging files left without a manifest are removed once
+    as old, and this process's state of uploads that no longer exist is
+    dropped.
+
+    Returns:
+        dict: Number of uploads kept and deleted
+    """
+    global _last_collection
+    _last_collection = time.time()
+    cutoff = time.time() - max_age_seconds
+    stats = {"kept": 0, "deleted": 0}
+    upload_ids = {path.stem for path in UPLOAD_TMP_DIR.glob("*.*")}
+    for upload_id in upload_ids:
+        if _last_activity(upload_id) >= cutoff:
+            if _manifest_path(upload_id).exists():
+                stats["kept"] += 1
+            continue
+        with try_file_lock(_lock_path(upload_id)) as locked:
+            known = _manifest_path(upload_id).exists()
+            # Re-check under the lock: a chunk may have arrived meanwhile
+            if not locked or _last_activity(upload_id) >= cutoff:
+                stats["kept"] += known
+                continue
+            stats["deleted"] += known
+            for path in (
+                _manifest_path(upload_id),
+                _part_path(upload_id),
+                _lock_path(upload_id),
+            ):
+                path.unlink(missing_ok=True)
+
+    for upload_id in set(_hash_state) | set(_upload_locks):
+        lock = _upload_locks.get(upload_id)
+        if not _manifest_path(upload_id).exists() and not (lock and lock.locked()):
+            _forget(upload_id)
+
+    if stats["deleted"]:
+        logger.info(f"Upload collection: {stats}")
+    return stats
+
+
+def _maybe_collect() -> None:
+    if time.time() - _last_collection >= UPLOAD_GC_INTERVAL_SECONDS:
+        try:
+            collect_uploads()
+        except OSError as e:
+            logger.warning(f"Upload collection failed: {e}")
@@ -0,0 +1,137 @@
+"""
+Identity, resource shares and cross-process locks of the worker processes.
+
+With several uvicorn workers all processes listen on one socket, so any
+request may reach any worker. Each process has its own graph, LLM clients,
+REPL and browsers; everything a later request may depend on (checkpoints,
+the file catalog, workspaces, run event logs, uploads in progress and the
+per-session admission slots) is shared through the work directory, with the
+file locks below serialising access between workers.
+
+The locks use flock(2), which the kernel releases when a process exits, so
+a crashed worker never leaves a lock held. On platforms without fcntl they
+only serialise within a process; run a single worker there.
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import math
+import os
+import socket
+from pathlib import Path
+from typing import AsyncIterator, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from src.config.env import SERVER_WORKERS
+
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}"
+
+
+def worker_share(limit: int) -> int:
+    """This worker's share of a server-wide limit (at least 1)."""
+    return max(1, math.ceil(limit / max(1, SERVER_WORKERS)))
+
+
+def is_worker_alive(worker_id: str) -> bool:
+    """
+    Whether the worker with this id is still running.
+
+    Workers on another host are assumed alive.
+    """
+    host, _, pid = worker_id.rpartition("-")
+    if host != socket.gethostname() or not pid.isdigit():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _open_lock_file(path: Path) -> int:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+
+
+@contextlib.asynccontextmanager
+async def file_lock(path: Path, poll_seconds: float = 0.05) -> AsyncIterator[None]:
+    """
+    Hold an exclusive lock on path, shared by all worker processes.
+
+    Waits by polling, so the event loop is never blocked and a cancelled
+    waiter leaves no lock behind.
+    """
+    fd = _open_lock_file(path)
+    try:
+        while fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                await asyncio.sleep(poll_seconds)
+        yield
+    finally:
+        # Closing the descriptor releases the lock
+        os.close(fd)
+
+
+@contextlib.contextmanager
+def try_file_lock(path: Path) -> Iterator[bool]:
+    """
+    Hold the lock on path if no process holds it, without waiting.
+
+    Yields whether the lock was taken; work that may skip a busy resource
+    (such as cleanup) runs only when it was.
+    """
+    fd = _open_lock_file(path)
+    try:
+        if fcntl is None:
+            yield True
+            return
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        yield True
+    finally:
+        os.close(fd)
+
+
+def acquire_slot(directory: Path, key: str, slots: int) -> Optional[int]:
+    """
+    Take one of `slots` slots for key, counted across all worker processes.
+
+    Args:
+        directory: Where the slot lock files live
+        key: What the slots limit, e.g. "running:<session_id>"
+        slots: Number of slots
+
+    Returns:
+        A descriptor holding the slot, to be passed to release_slot, or None
+        if every slot is taken
+    """
+    name = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    for index in range(slots):
+        fd = _open_lock_file(directory / f"{name}.{index}")
+        if fcntl is None:
+            return fd
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return fd
+        except BlockingIOError:
+            os.close(fd)
+    return None
+
+
+def release_slot(fd: Optional[int]) -> None:
+    """Give back a slot taken by acquire_slot; None is ignored."""
+    if fd is not None:
+        os.close(fd)
@@ -0,0 +1,95 @@
+"""
+Per-workflow context for concurrent workflows.
+
+Each run of the agent workflow gets a WorkflowContext held in a context
+variable. Graph nodes and tools run in copies of the caller's context, so
+they see the context of their own workflow rather than a process-global,
+and one worker can run many workflows at once.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WorkflowContext:
+    """State scoped to one workflow run."""
+
+    workflow_id: str
+    session_id: str = "default"
+    started_at: float = field(default_factory=time.time)
+    # Browser agents started by this workflow, torn down if it is cancelled
+    browser_agents: Set[Any] = field(default_factory=set)
+    # Subprocesses and in-process executions (thread idents) to stop on cancel
+    processes: Set[subprocess.Popen] = field(default_factory=set)
+    threads: Set[int] = field(default_factory=set)
+    # Guards processes/threads, which tools update from worker threads
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    # Plan being generated beside the coordinator, taken over by the planner
+    speculative_plan: Optional[asyncio.Task] = None
+
+
+_current_workflow: contextvars.ContextVar[Optional[WorkflowContext]] = (
+    contextvars.ContextVar("current_workflow", default=None)
+)
+
+
+def get_workflow_context() -> Optional[WorkflowContext]:
+    """Get the context of the workflow running in the current context, if any."""
+    return _current_workflow.get()
+
+
+def current_task_id() -> Optional[str]:
+    """Get the task id of the workflow running in the current context, if any."""
+    context = _current_workflow.get()
+    return context.workflow_id if context else None
+
+
+@contextmanager
+def workflow_scope(context: WorkflowContext) -> Iterator[WorkflowContext]:
+    """Make context the current workflow context within the block."""
+    token = _current_workflow.set(context)
+    try:
+        yield context
+    finally:
+        try:
+            _current_workflow.reset(token)
+        except ValueError:
+            # Closed from another context (e.g. async generator finalisation)
+            pass
+
+
+class WorkflowScopedConfig:
+    """
+    Proxy for GhostCoder's config object whose TASK_ID is the current workflow's.
+
+    GhostCoder reads its task directory from `ghostcoder_config.TASK_ID`, one
+    object shared by every workflow in the process. The proxy stands in for
+    that object without changing it: TASK_ID is the id of the workflow running
+    in the current context, or the config's own value outside a workflow, and
+    every other attribute is read from and written to the wrapped config.
+    """
+
+    def __init__(self, config: Any):
+        object.__setattr__(self, "_config", config)
+
+    @property
+    def TASK_ID(self) -> Any:
+        return current_task_id() or self._config.TASK_ID
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._config, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._config, name, value)
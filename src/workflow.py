@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from src.config import TEAM_MEMBER_CONFIGRATIONS, TEAM_MEMBERS
 from src.graph import build_graph
@@ -47,7 +48,8 @@ def run_agent_workflow(user_input: str, debug: bool = False):
         "search_before_planning": True,
     }
     config = {"configurable": {"thread_id": "default"}}
-    result = graph.invoke(input=initial_state, config=config)
+    # Graph nodes are coroutines, so the graph is driven on an event loop
+    result = asyncio.run(graph.ainvoke(input=initial_state, config=config))
     logger.debug(f"Final workflow state: {result}")
     logger.info("Workflow completed successfully")
     return result
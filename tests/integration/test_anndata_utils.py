@@ -0,0 +1,99 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.utils import anndata_utils
+
+
+@pytest.fixture
+def preview_dir(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "previews"
+    monkeypatch.setattr(anndata_utils, "ANNDATA_PREVIEW_DIR", cache_dir)
+    return cache_dir
+
+
+def _fake_build(monkeypatch, delay=0.0):
+    """Replace the AnnData reader with one that counts its calls"""
+    calls = []
+    lock = threading.Lock()
+
+    def build(file_path):
+        with lock:
+            calls.append(file_path)
+        time.sleep(delay)
+        head = {
+            "columns": ["n"],
+            "index": [f"c{i}" for i in range(20)],
+            "data": [[i] for i in range(20)],
+        }
+        return {
+            "shape": [20, 5],
+            "obs": {"columns": [], "head": head},
+            "var": {"columns": [], "head": dict(head)},
+        }
+
+    monkeypatch.setattr(anndata_utils, "build_h5ad_preview", build)
+    return calls
+
+
+def test_preview_is_cached_until_the_file_changes(tmp_path, preview_dir, monkeypatch):
+    """Test that a preview is built once per file version and trimmed to n_rows"""
+    calls = _fake_build(monkeypatch)
+    file_path = tmp_path / "counts.h5ad"
+    file_path.write_bytes(b"v1")
+
+    first = asyncio.run(anndata_utils.get_h5ad_preview(file_path, n_rows=3))
+    second = asyncio.run(anndata_utils.get_h5ad_preview(file_path, n_rows=100))
+    assert len(calls) == 1
+    assert first["obs"]["head"]["index"] == ["c0", "c1", "c2"]
+    assert len(second["var"]["head"]["data"]) == 20
+
+    file_path.write_bytes(b"v2 is longer")
+    later = time.time() + 5
+    os.utime(file_path, (later, later))
+    asyncio.run(anndata_utils.get_h5ad_preview(file_path))
+    assert len(calls) == 2
+
+
+def test_concurrent_misses_do_not_collide(tmp_path, preview_dir, monkeypatch):
+    """Test that concurrent builds of one preview each write their own temporary file"""
+    _fake_build(monkeypatch, delay=0.05)
+    file_path = tmp_path / "counts.h5ad"
+    file_path.write_bytes(b"v1")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        previews = list(
+            pool.map(lambda _: anndata_utils._cached_preview(file_path), range(8))
+        )
+
+    assert all(preview["shape"] == [20, 5] for preview in previews)
+    assert [path.suffix for path in preview_dir.iterdir()] == [".json"]
+
+
+def test_real_h5ad_preview(tmp_path, preview_dir):
+    """Test that an .h5ad file is summarised without loading X"""
+    anndata = pytest.importorskip("anndata")
+    np = pytest.importorskip("numpy")
+    pd = pytest.importorskip("pandas")
+
+    adata = anndata.AnnData(
+        X=np.ones((4, 3), dtype="float32"),
+        obs=pd.DataFrame(
+            {"cluster": ["a", "b", "a", "c"]}, index=[f"cell{i}" for i in range(4)]
+        ),
+        var=pd.DataFrame(index=["g1", "g2", "g3"]),
+    )
+    adata.layers["counts"] = adata.X.copy()
+    file_path = tmp_path / "small.h5ad"
+    adata.write_h5ad(file_path)
+
+    preview = asyncio.run(anndata_utils.get_h5ad_preview(file_path, n_rows=2))
+    assert preview["shape"] == [4, 3]
+    assert preview["X"]["dtype"] == "float32"
+    assert [column["name"] for column in preview["obs"]["columns"]] == ["cluster"]
+    assert preview["obs"]["head"]["index"] == ["cell0", "cell1"]
+    assert preview["layers"] == ["counts"]
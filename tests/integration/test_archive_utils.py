@@ -0,0 +1,77 @@
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+from src.utils.archive_utils import (
+    collect_files,
+    export_root,
+    start_export,
+    get_export_progress,
+)
+
+
+@pytest.fixture
+def task_dir(tmp_path):
+    """Create a task directory with code, a figure and a hidden file"""
+    task_dir = tmp_path / "s1" / "t1"
+    (task_dir / "figures").mkdir(parents=True)
+    (task_dir / "analysis.py").write_text("print('hi')\n" * 100)
+    (task_dir / "figures" / "umap.png").write_bytes(b"\x89PNG" + b"\x00" * 1000)
+    (task_dir / ".cache").write_text("skip me")
+    return task_dir
+
+
+def test_export_zip(task_dir):
+    """Test that the zip stream contains the task files and stores compressed ones"""
+    progress, body = start_export(task_dir, "zip")
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(body)))
+
+    infos = {info.filename: info for info in archive.infolist()}
+    assert set(infos) == {"t1/analysis.py", "t1/figures/umap.png"}
+    assert infos["t1/analysis.py"].compress_type == zipfile.ZIP_DEFLATED
+    assert infos["t1/figures/umap.png"].compress_type == zipfile.ZIP_STORED
+    assert archive.testzip() is None
+
+    assert get_export_progress(progress["export_id"])["status"] == "completed"
+    assert progress["files_done"] == progress["files_total"] == 2
+
+
+def test_export_zip_store_only(task_dir):
+    """Test that store mode disables compression for every file"""
+    _, body = start_export(task_dir, "zip", store=True)
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(body)))
+    assert all(info.compress_type == zipfile.ZIP_STORED for info in archive.infolist())
+
+
+def test_export_tar(task_dir):
+    """Test that the tar stream contains the task files"""
+    _, body = start_export(task_dir, "tar")
+    archive = tarfile.open(fileobj=io.BytesIO(b"".join(body)))
+    assert sorted(archive.getnames()) == ["t1/analysis.py", "t1/figures/umap.png"]
+
+
+def test_export_unknown_format(task_dir):
+    """Test that unsupported formats are rejected"""
+    with pytest.raises(ValueError):
+        start_export(task_dir, "rar")
+
+
+def test_export_root_stays_in_workspace(task_dir, tmp_path_factory):
+    """Test that absolute ids, internal stores and escaping symlinks are not exported"""
+    work = task_dir.parent.parent
+    outside = tmp_path_factory.mktemp("outside")
+    (outside / "secret.txt").write_text("secret")
+    (work / "s1" / "escape").symlink_to(outside, target_is_directory=True)
+    (task_dir / "secret.txt").symlink_to(outside / "secret.txt")
+
+    assert export_root("s1", "t1", work) == task_dir.resolve()
+    assert export_root("s1", storage_path=work) == (work / "s1").resolve()
+    assert export_root(str(outside), storage_path=work) is None
+    assert export_root("s1", str(outside), work) is None
+    assert export_root(".blobs", storage_path=work) is None
+    assert export_root("s1", "escape", work) is None
+
+    # A symlinked file inside the task pointing out of it is skipped
+    assert "t1/secret.txt" not in [name for _, name in collect_files(task_dir)]
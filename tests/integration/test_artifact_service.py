@@ -0,0 +1,139 @@
+import asyncio
+import os
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.database import Base
+from src.service import artifact_service
+from src.service.artifact_service import (
+    delete_artifact,
+    index_task_artifacts,
+    list_task_artifacts,
+    record_uploads,
+)
+
+
+@pytest.fixture
+def work(tmp_path, monkeypatch):
+    """A task directory and an empty catalog database"""
+    database_path = tmp_path / "catalog.db"
+    Base.metadata.create_all(bind=create_engine(f"sqlite:///{database_path}"))
+    async_engine = create_async_engine(
+        f"sqlite+aiosqlite:///{database_path}", poolclass=None
+    )
+    monkeypatch.setattr(
+        artifact_service,
+        "AsyncSessionLocal",
+        async_sessionmaker(async_engine, expire_on_commit=False),
+    )
+
+    task_dir = tmp_path / "s1" / "t1"
+    (task_dir / "figures").mkdir(parents=True)
+    (task_dir / "results").mkdir()
+    for path in ("analysis.py", "run.sh", "figures/umap.png", "results/markers.csv"):
+        (task_dir / path).write_text(path)
+    return tmp_path
+
+
+def _list(work, **kwargs):
+    return asyncio.run(list_task_artifacts("s1", "t1", storage_path=work, **kwargs))
+
+
+def _paths(page):
+    return [f["path"] for kind in ("codes", "figures", "results") for f in page[kind]]
+
+
+def test_first_listing_indexes_the_task(work):
+    """Test that a task never indexed is indexed on its first listing"""
+    page = _list(work)
+    assert _paths(page) == [
+        "analysis.py",
+        "run.sh",
+        "figures/umap.png",
+        "results/markers.csv",
+    ]
+    assert page["results"][0]["language"] == "CSV"
+    assert page["next_cursor"] is None
+
+
+def test_pagination_and_kind_filter(work):
+    """Test that cursors walk through every file once and kinds can be filtered"""
+    paths, cursor = [], None
+    while True:
+        page = _list(work, cursor=cursor, limit=3)
+        paths += _paths(page)
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert sorted(paths) == [
+        "analysis.py",
+        "figures/umap.png",
+        "results/markers.csv",
+        "run.sh",
+    ]
+
+    figures = _list(work, kind="figures")
+    assert _paths(figures) == ["figures/umap.png"]
+    with pytest.raises(ValueError):
+        _list(work, cursor="not-a-cursor")
+
+
+def test_listing_picks_up_new_files(work):
+    """Test that files written after the last index are listed and the ETag changes"""
+    first = _list(work)
+    assert _list(work)["etag"] == first["etag"]
+
+    new_file = work / "s1" / "t1" / "figures" / "pca.png"
+    new_file.write_text("pca")
+    # Make the directory change unambiguous on coarse timestamp filesystems
+    later = time.time() + 5
+    os.utime(new_file.parent, (later, later))
+
+    second = _list(work)
+    assert "figures/pca.png" in _paths(second)
+    assert second["etag"] != first["etag"]
+
+
+def test_listing_picks_up_rewritten_files(work):
+    """Test that a file rewritten in place is listed with its new size"""
+    _list(work)
+    rewritten = work / "s1" / "t1" / "results" / "markers.csv"
+    rewritten.write_text("a much longer set of markers")
+    later = time.time() + 5
+    os.utime(rewritten, (later, later))
+
+    [result] = _list(work, kind="results")["results"]
+    assert result["size"] == len("a much longer set of markers")
+
+
+@pytest.mark.parametrize(
+    "session_id, task_id", [("..", "x"), ("s1", ".."), ("/etc", "t1"), ("s1", ".blobs")]
+)
+def test_invalid_ids_are_rejected(work, session_id, task_id):
+    """Test that ids cannot make the listing scan outside the session"""
+    with pytest.raises(ValueError):
+        asyncio.run(list_task_artifacts(session_id, task_id, storage_path=work))
+    with pytest.raises(ValueError):
+        asyncio.run(index_task_artifacts(session_id, task_id, work))
+
+
+def test_index_removes_deleted_files(work):
+    """Test that re-indexing and delete_artifact drop files that are gone"""
+    assert asyncio.run(index_task_artifacts("s1", "t1", work)) == 4
+    (work / "s1" / "t1" / "run.sh").unlink()
+    assert asyncio.run(index_task_artifacts("s1", "t1", work)) == 3
+
+    asyncio.run(delete_artifact("s1", "t1", "analysis.py"))
+    assert "analysis.py" not in _paths(_list(work, cursor=None, kind="codes"))
+
+
+def test_uploads_are_listed_as_data(work):
+    """Test that uploaded files appear under the session's data task"""
+    (work / "s1" / "data").mkdir()
+    (work / "s1" / "data" / "counts.h5ad").write_text("x")
+    asyncio.run(record_uploads("s1", [{"name": "counts.h5ad", "size": 1}]))
+    page = asyncio.run(list_task_artifacts("s1", "data", storage_path=work))
+    assert [f["name"] for f in page["data"]] == ["counts.h5ad"]
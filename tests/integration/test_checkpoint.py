@@ -0,0 +1,68 @@
+from langgraph.checkpoint.base import create_checkpoint, empty_checkpoint
+
+from src.graph.checkpoint import BoundedSqliteSaver
+
+
+def _saver(tmp_path, **limits):
+    options = dict(
+        ttl_seconds=3600,
+        max_threads=10,
+        keep_per_thread=2,
+        max_db_bytes=1024 * 1024 * 1024,
+        cache_kb=1024,
+    )
+    options.update(limits)
+    return BoundedSqliteSaver(tmp_path / "checkpoints.db", **options)
+
+
+def _put(saver, thread_id, step):
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    latest = saver.get_tuple(config)
+    if latest:
+        config = latest.config
+        checkpoint = create_checkpoint(latest.checkpoint, None, step)
+    else:
+        checkpoint = empty_checkpoint()
+    return saver.put(
+        config, checkpoint, {"source": "loop", "step": step, "writes": {}}, {}
+    )
+
+
+def test_roundtrip_and_compaction(tmp_path):
+    """Test that checkpoints persist and only the newest ones are kept"""
+    saver = _saver(tmp_path)
+    for step in range(5):
+        last_config = _put(saver, "t1", step)
+
+    reopened = _saver(tmp_path)
+    latest = reopened.get_tuple({"configurable": {"thread_id": "t1"}})
+    assert (
+        latest.config["configurable"]["checkpoint_id"]
+        == last_config["configurable"]["checkpoint_id"]
+    )
+    assert latest.metadata["step"] == 4
+    assert len(list(reopened.list({"configurable": {"thread_id": "t1"}}))) == 2
+
+
+def test_pending_writes(tmp_path):
+    """Test that writes are returned with their checkpoint"""
+    saver = _saver(tmp_path)
+    config = _put(saver, "t1", 0)
+    saver.put_writes(config, [("messages", "hello")], task_id="task-1")
+
+    latest = saver.get_tuple({"configurable": {"thread_id": "t1"}})
+    assert latest.pending_writes == [("task-1", "messages", "hello")]
+
+
+def test_lru_and_ttl_eviction(tmp_path):
+    """Test that threads beyond the limit or past the TTL are evicted"""
+    saver = _saver(tmp_path, max_threads=2)
+    for thread_id in ("t1", "t2", "t3"):
+        _put(saver, thread_id, 0)
+
+    assert saver.maintain()["lru"] == 1
+    assert saver.get_tuple({"configurable": {"thread_id": "t1"}}) is None
+
+    saver.ttl_seconds = -1
+    assert saver.maintain()["ttl"] == 2
+    assert list(saver.list(None)) == []
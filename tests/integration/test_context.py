@@ -0,0 +1,79 @@
+from langchain_core.messages import HumanMessage
+
+from src.prompts.context import digest, estimate_tokens, fit_messages
+
+TEAM = ["researcher", "coder", "reporter"]
+SYSTEM = {"role": "system", "content": "You are a supervisor."}
+
+
+def _conversation(output_tokens=1000):
+    output = "line of agent output\n" * (output_tokens // 5)
+    return [
+        SYSTEM,
+        HumanMessage(content="Analyse my dataset"),
+        HumanMessage(content='{"steps": []}', name="planner"),
+        HumanMessage(content="old " + output, name="researcher"),
+        HumanMessage(content="mid " + output, name="coder"),
+        HumanMessage(content="new " + output, name="researcher"),
+    ]
+
+
+def test_estimate_tokens():
+    """Test that estimates count ASCII by four characters and CJK by character"""
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd" * 10) == 10
+    assert estimate_tokens("分析数据") == 4
+
+
+def test_digest_is_bounded_and_cached():
+    """Test that long outputs are cut at a line boundary and digested once"""
+    text = "a result line\n" * 500
+    short = digest(text, 50)
+    assert estimate_tokens(short) < 80
+    assert short.endswith("omitted from this earlier response]")
+    assert digest(text, 50) is short
+    assert digest("short", 50) == "short"
+
+
+def test_fit_messages_within_budget_is_unchanged():
+    """Test that a conversation that fits is passed through without copies"""
+    messages = _conversation(output_tokens=50)
+    fitted = fit_messages(messages, 10000, TEAM, 100)
+    assert all(a is b for a, b in zip(fitted, messages)) and len(fitted) == len(
+        messages
+    )
+
+
+def test_fit_messages_digests_older_outputs():
+    """Test that the newest output stays whole and older ones are digested"""
+    messages = _conversation(output_tokens=1000)
+    fitted = fit_messages(messages, 1500, TEAM, 100)
+
+    assert fitted[0] is SYSTEM
+    assert fitted[1] is messages[1] and fitted[2] is messages[2]
+    assert fitted[-1] is messages[-1]
+    assert [m.content[:3] for m in fitted[3:5]] == ["old", "mid"]
+    assert all("omitted" in m.content for m in fitted[3:5])
+    # The state's messages were not modified
+    assert "omitted" not in messages[3].content
+
+
+def test_fit_messages_drops_what_does_not_fit():
+    """Test that the oldest outputs are dropped but the request and plan are kept"""
+    messages = _conversation(output_tokens=1000)
+    fitted = fit_messages(messages, 1200, TEAM, 100)
+    assert fitted[:3] == messages[:3]
+    assert fitted[-1] is messages[-1]
+    assert len(fitted) < len(messages)
+
+
+def test_fit_messages_wraps_agent_outputs():
+    """Test that agent outputs are wrapped in new messages"""
+    messages = _conversation(output_tokens=50)
+    fitted = fit_messages(
+        messages, 10000, TEAM, 100, wrap=lambda name, text: f"<{name}>{text}"
+    )
+    assert fitted[-1].content.startswith("<researcher>new")
+    assert fitted[-1].name == "researcher"
+    assert messages[-1].content.startswith("new")
+    assert fitted[2] is messages[2]
@@ -0,0 +1,99 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from src.api import file_responses
+from src.api.file_responses import IMMUTABLE_CACHE_CONTROL, file_response
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """App serving one file from a temporary work directory"""
+    monkeypatch.setattr(file_responses, "DEFAULT_WORK", tmp_path)
+    file_path = tmp_path / "s1" / "t1" / "data.csv"
+    file_path.parent.mkdir(parents=True)
+    file_path.write_bytes(b"0123456789" * 10)
+
+    app = FastAPI()
+
+    @app.get("/file")
+    def serve(request: Request):
+        return file_response(request, file_path, filename="data.csv")
+
+    return TestClient(app)
+
+
+def test_conditional_get(client):
+    """Test that a current ETag or Last-Modified yields 304 without a body"""
+    first = client.get("/file")
+    assert first.status_code == 200
+    assert first.headers["cache-control"] == "no-cache"
+    assert "data.csv" in first.headers["content-disposition"]
+
+    by_etag = client.get("/file", headers={"If-None-Match": first.headers["etag"]})
+    assert by_etag.status_code == 304 and by_etag.content == b""
+    by_date = client.get(
+        "/file", headers={"If-Modified-Since": first.headers["last-modified"]}
+    )
+    assert by_date.status_code == 304
+    stale = client.get("/file", headers={"If-None-Match": '"other"'})
+    assert stale.status_code == 200
+
+
+def test_range_and_versioned_cache(client):
+    """Test that Range requests get 206 and versioned URLs are immutable"""
+    partial = client.get("/file", headers={"Range": "bytes=10-19"})
+    assert partial.status_code == 206
+    assert partial.content == b"0123456789"
+    assert client.get("/file?v=1").headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+
+
+@pytest.mark.parametrize(
+    "mode, header, value",
+    [
+        ("x-accel", "x-accel-redirect", "/protected/s1/t1/data.csv"),
+        ("x-sendfile", "x-sendfile", None),
+    ],
+)
+def test_offload(client, monkeypatch, tmp_path, mode, header, value):
+    """Test that an offload mode hands the body to the proxy"""
+    monkeypatch.setattr(file_responses, "FILE_OFFLOAD_MODE", mode)
+    monkeypatch.setattr(file_responses, "FILE_OFFLOAD_PREFIX", "/protected/")
+    response = client.get("/file")
+    assert response.status_code == 200 and response.content == b""
+    assert response.headers[header] == (
+        value or str((tmp_path / "s1" / "t1" / "data.csv").resolve())
+    )
+
+
+def test_image_stays_in_work_directory(tmp_path, monkeypatch):
+    """Test that /image/ only serves files under the work directory"""
+    from src.api import app as app_module
+
+    work = tmp_path / "work"
+    figure = work / "s1" / "t1" / "figures" / "umap.png"
+    figure.parent.mkdir(parents=True)
+    figure.write_bytes(b"png")
+    (work / ".runs").mkdir()
+    (work / ".runs" / "run.jsonl").write_text("{}")
+    outside = tmp_path / "secret.png"
+    outside.write_bytes(b"secret")
+    (figure.parent / "link.png").symlink_to(outside)
+    monkeypatch.setattr(app_module, "DEFAULT_WORK", work)
+    client = TestClient(app_module.app)
+
+    assert (
+        client.get("/image/", params={"img_path": "s1/t1/figures/umap.png"}).content
+        == b"png"
+    )
+    for img_path in (
+        str(outside),
+        "s1/../../secret.png",
+        "s1/t1/figures/link.png",
+        ".runs/run.jsonl",
+    ):
+        assert client.get("/image/", params={"img_path": img_path}).status_code == 400
+    assert (
+        client.get("/image/", params={"img_path": "s1/t1/figures/none.png"}).status_code
+        == 404
+    )
@@ -0,0 +1,84 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.database import Base
+from src.service import file_service
+from src.service.file_service import WriteStats, add_file_metadata, delete_file_metadata
+
+
+@pytest.fixture
+def stats(tmp_path, monkeypatch):
+    """An empty metadata database and fresh write counters"""
+    database_path = tmp_path / "files.db"
+    Base.metadata.create_all(bind=create_engine(f"sqlite:///{database_path}"))
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{database_path}")
+    monkeypatch.setattr(
+        file_service,
+        "AsyncSessionLocal",
+        async_sessionmaker(async_engine, expire_on_commit=False),
+    )
+    stats = WriteStats()
+    monkeypatch.setattr(file_service, "write_stats", stats)
+    return stats
+
+
+def _records(count):
+    return [
+        {
+            "session_id": "s1",
+            "name": f"f{i}.csv",
+            "path": f"s1/data/f{i}.csv",
+            "size": i,
+        }
+        for i in range(count)
+    ]
+
+
+def test_batches_are_counted(stats):
+    """Test that each batch insert is recorded and deletes are reported"""
+    rows = asyncio.run(add_file_metadata(_records(3)))
+    asyncio.run(add_file_metadata(_records(2)))
+    asyncio.run(add_file_metadata([]))
+
+    report = stats.to_dict()
+    assert report["rows"] == 5 and report["batches"] == 2
+    assert report["seconds"] > 0 and report["rows_per_second"] > 0
+    assert asyncio.run(delete_file_metadata(rows[0].id))
+    assert not asyncio.run(delete_file_metadata(rows[0].id))
+
+
+def test_overlapping_batches_are_timed_once(monkeypatch):
+    """Test that throughput is measured over wall-clock time, not summed batch latency"""
+    clock = iter([0.0, 1.0, 2.0, 3.0])
+    monkeypatch.setattr(
+        file_service, "time", SimpleNamespace(perf_counter=lambda: next(clock))
+    )
+    stats = WriteStats()
+    # Two batches of 5 rows, written from 0s to 2s and from 1s to 3s
+    first, second = stats.start(), stats.start()
+    stats.record(5, stats.stop(first))
+    stats.record(5, stats.stop(second))
+
+    report = stats.to_dict()
+    assert report["seconds"] == 4.0 and report["busy_seconds"] == 3.0
+    assert report["rows_per_second"] == round(10 / 3, 1)
+
+
+def test_health_reports_write_stats(stats, monkeypatch):
+    """Test that /health exposes this worker's counters"""
+    from src.api import app as app_module
+
+    monkeypatch.setattr(app_module, "write_stats", stats)
+    asyncio.run(add_file_metadata(_records(4)))
+
+    response = TestClient(app_module.app).get("/health")
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["worker"] == response.headers["x-worker-id"]
+    assert data["file_metadata_writes"]["rows"] == 4
+    assert data["workflows"] == {"running": 0, "queued": 0}
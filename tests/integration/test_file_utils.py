@@ -0,0 +1,50 @@
+import pytest
+
+from src.utils.file_utils import get_file_path, read_text_window
+
+
+@pytest.fixture
+def task_dir(tmp_path):
+    """Create a task directory with code, figures and results"""
+    task_dir = tmp_path / "s1" / "t1"
+    (task_dir / "figures").mkdir(parents=True)
+    (task_dir / "results").mkdir()
+    (task_dir / "analysis.py").write_text("print('hi')")
+    (task_dir / "run.sh").write_text("echo hi")
+    (task_dir / "figures" / "umap.png").write_bytes(b"\x89PNG" + b"\x00" * 100)
+    (task_dir / "results" / "markers.csv").write_text("gene,score\n")
+    return tmp_path
+
+
+def test_read_text_window_splits_on_characters(tmp_path):
+    """Test that windows never cut a multi-byte character in half"""
+    file_path = tmp_path / "notes.txt"
+    file_path.write_text("ab\u00e9cd", encoding="utf-8")  # é is two bytes
+
+    first = read_text_window(file_path, 0, 3)
+    assert first["content"] == "ab"
+    assert first["next_offset"] == 2
+    assert not first["eof"]
+
+    second = read_text_window(file_path, first["next_offset"], 10)
+    assert second["content"] == "\u00e9cd"
+    assert second["eof"]
+
+
+def test_get_file_path_rejects_traversal(task_dir):
+    """Test that file lookups cannot leave the task directory"""
+    assert get_file_path("s1", "t1", "figures/umap.png", task_dir) is not None
+    assert get_file_path("s1", "t1", "../t1/analysis.py", task_dir) is None
+
+
+def test_get_file_path_rejects_absolute_and_symlinks(task_dir, tmp_path_factory):
+    """Test that absolute names and escaping symlinks are rejected"""
+    secret = tmp_path_factory.mktemp("outside") / "secret.txt"
+    secret.write_text("secret")
+    (task_dir / "s1" / "t1" / "link.txt").symlink_to(secret)
+
+    assert get_file_path("s1", "t1", str(secret), task_dir) is None
+    assert get_file_path("s1", "t1", "link.txt", task_dir) is None
+    assert get_file_path(str(secret.parent), "t1", "secret.txt", task_dir) is None
+    assert get_file_path("s1", "/t1", "analysis.py", task_dir) is None
+    assert get_file_path(".", "s1", "t1/analysis.py", task_dir) is None
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.utils import image_utils
+from src.utils.image_utils import get_thumbnail, snap_width
+
+
+@pytest.fixture
+def figure(tmp_path, monkeypatch):
+    """A 2000x1000 PNG figure and an empty thumbnail cache"""
+    Image = pytest.importorskip("PIL.Image")
+    monkeypatch.setattr(image_utils, "THUMBNAIL_CACHE_DIR", tmp_path / "thumbnails")
+    path = tmp_path / "s1" / "t1" / "figures" / "umap.png"
+    path.parent.mkdir(parents=True)
+    Image.new("RGB", (2000, 1000), "white").save(path)
+    return path
+
+
+def test_thumbnail_is_built_once(figure, monkeypatch):
+    """Test that concurrent and repeated requests for a variant share one build"""
+    from PIL import Image
+
+    builds = []
+    build = image_utils._build_thumbnail
+
+    def counting_build(source, target, width):
+        builds.append(width)
+        return build(source, target, width)
+
+    monkeypatch.setattr(image_utils, "_build_thumbnail", counting_build)
+
+    async def main():
+        first = await asyncio.gather(*(get_thumbnail(figure, 300) for _ in range(4)))
+        return first, await get_thumbnail(figure, 480)
+
+    first, cached = asyncio.run(main())
+    assert builds == [480]
+    assert len(set(first)) == 1 and cached == first[0]
+    with Image.open(cached) as image:
+        assert image.format == "WEBP" and image.size == (480, 240)
+
+
+def test_width_is_snapped_and_bounded(figure, monkeypatch):
+    """Test that widths snap to the configured set and out-of-range widths are rejected"""
+    assert snap_width(1) == 160
+    assert snap_width(161) == 480
+    assert snap_width(4096) == 1024
+
+    from src.api import app as app_module
+
+    monkeypatch.setattr(app_module, "DEFAULT_WORK", figure.parents[3])
+    client = TestClient(app_module.app)
+    img_path = "s1/t1/figures/umap.png"
+    assert (
+        client.get("/image/", params={"img_path": img_path, "w": 0}).status_code == 422
+    )
+    assert (
+        client.get("/image/", params={"img_path": img_path, "w": 5000}).status_code
+        == 422
+    )
+    response = client.get("/image/", params={"img_path": img_path, "w": 200})
+    assert (
+        response.status_code == 200 and response.headers["content-type"] == "image/webp"
+    )
+
+
+def test_non_images_are_served_as_is(figure):
+    """Test that unsupported or unreadable files get no thumbnail"""
+    pdf = figure.with_suffix(".pdf")
+    pdf.write_bytes(b"%PDF-1.4")
+    assert asyncio.run(get_thumbnail(pdf, 160)) is None
+
+    broken = figure.with_name("broken.png")
+    broken.write_bytes(b"not a png")
+    assert asyncio.run(get_thumbnail(broken, 160)) is None
+    assert not list(image_utils.THUMBNAIL_CACHE_DIR.rglob("*.webp"))
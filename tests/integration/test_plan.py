@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+from src.graph.plan import is_sequential, merge_steps_done, parse_plan, ready_steps
+
+TEAM = ["researcher", "coder", "browser", "reporter"]
+
+
+def _plan(*steps):
+    return json.dumps({"thought": "", "title": "t", "steps": list(steps)})
+
+
+def _step(agent, **kwargs):
+    return {
+        "agent_name": agent,
+        "title": agent,
+        "description": f"{agent} work",
+        **kwargs,
+    }
+
+
+def test_steps_without_dependencies_run_in_order():
+    """Test that a plan without depends_on is a plain sequence"""
+    steps = parse_plan(
+        _plan(_step("researcher"), _step("coder"), _step("reporter")), TEAM
+    )
+    assert [step.depends_on for step in steps] == [(), (1,), (2,)]
+    assert is_sequential(steps)
+    assert [step.number for step in ready_steps(steps, [])] == [1]
+
+
+def test_independent_steps_are_ready_together():
+    """Test that steps are released in waves as their dependencies finish"""
+    steps = parse_plan(
+        _plan(
+            _step("researcher", depends_on=[]),
+            _step("browser", depends_on=[]),
+            _step("coder", depends_on=[1]),
+            _step("reporter", depends_on=[1, 2, 3]),
+        ),
+        TEAM,
+    )
+    assert not is_sequential(steps)
+    assert [step.number for step in ready_steps(steps, [])] == [1, 2]
+    assert [step.number for step in ready_steps(steps, [], limit=1)] == [1]
+    assert [step.number for step in ready_steps(steps, [1])] == [2, 3]
+    assert [step.number for step in ready_steps(steps, [1, 2, 3])] == [4]
+    assert ready_steps(steps, [1, 2, 3, 4]) == []
+
+
+@pytest.mark.parametrize(
+    "full_plan",
+    [
+        "not json",
+        _plan(),
+        _plan(_step("painter")),
+        _plan(_step("researcher", depends_on=[1])),
+        _plan(_step("researcher"), _step("coder", depends_on=[3])),
+        _plan(_step("researcher"), _step("coder", depends_on="first")),
+    ],
+)
+def test_invalid_plans(full_plan):
+    """Test that unusable plans are rejected"""
+    with pytest.raises(ValueError):
+        parse_plan(full_plan, TEAM)
+
+
+def test_merge_steps_done():
+    """Test that parallel updates accumulate and an empty update resets"""
+    done = merge_steps_done([], [{"step": 1}])
+    done = merge_steps_done(done, [{"step": 2}])
+    assert [record["step"] for record in done] == [1, 2]
+    assert merge_steps_done(done, []) == []
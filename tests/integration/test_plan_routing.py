@@ -0,0 +1,146 @@
+import asyncio
+import json
+import time
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from src.graph import nodes
+from src.graph.nodes import (
+    _dispatch_plan_steps,
+    _member_command,
+    _member_error,
+    _plan_cursor,
+)
+
+TEAM = ["researcher", "coder", "reporter"]
+
+
+def _state(steps_done=(), **kwargs):
+    plan = {
+        "thought": "",
+        "title": "t",
+        "steps": [
+            {
+                "agent_name": "researcher",
+                "title": "search",
+                "description": "find papers",
+            },
+            {
+                "agent_name": "coder",
+                "title": "analyse",
+                "description": "run the analysis",
+            },
+            {"agent_name": "reporter", "title": "report", "description": "write it up"},
+        ],
+    }
+    return {
+        "TEAM_MEMBERS": TEAM,
+        "messages": [HumanMessage(content="question", name="user")],
+        "full_plan": json.dumps(plan),
+        "plan_steps_done": list(steps_done),
+        **kwargs,
+    }
+
+
+def _routing():
+    return {"plan_routed": 0, "llm_routed": 0}
+
+
+def _done(step, agent, ok=True):
+    return {"step": step, "agent": agent, "seconds": 1.0, "ok": ok}
+
+
+def test_cursor_routes_to_next_planned_agent():
+    """Test that the supervisor follows the plan without an LLM call"""
+    routing = _routing()
+    state = _state([_done(1, "researcher")])
+    command = _dispatch_plan_steps(state, _plan_cursor(state, routing), routing)
+
+    [send] = command.goto
+    assert send.node == "coder"
+    assert send.arg["plan_step"] == 2
+    assert "run the analysis" in send.arg["messages"][-1].content
+    assert command.update["plan_routing"]["plan_routed"] == 1
+
+
+def test_cursor_finishes_with_stats():
+    """Test that a completed plan ends the workflow and reports saved round trips"""
+    routing = {"plan_routed": 3, "llm_routed": 0}
+    state = _state([_done(1, "researcher"), _done(2, "coder"), _done(3, "reporter")])
+    command = _dispatch_plan_steps(state, _plan_cursor(state, routing), routing)
+
+    assert command.goto == "__end__"
+    assert command.update["plan_stats"]["round_trips_saved"] == 4
+    assert command.update["plan_stats"]["step_seconds"] == 3.0
+
+
+def test_cursor_falls_back_to_llm():
+    """Test that failed steps and unusable plans hand routing back to the LLM"""
+    routing = _routing()
+    assert _plan_cursor(_state([_done(1, "researcher", ok=False)]), routing) is None
+    assert "step 1" in routing["fallback"]
+    # Once fallen back, the plan stays with the LLM
+    assert _plan_cursor(_state(), routing) is None
+
+    routing = _routing()
+    assert _plan_cursor(_state(full_plan="not a plan"), routing) is None
+    assert routing["fallback"].startswith("unusable plan")
+
+
+def _tool_result(content, status="success"):
+    return ToolMessage(
+        content=content, name="python_repl_tool", tool_call_id="1", status=status
+    )
+
+
+def test_failed_steps_are_detected():
+    """Test that errors reported by the agent or its last tool call fail the step"""
+    state = _state(plan_step=2)
+
+    def record(content, new_messages=()):
+        [done] = _member_command(
+            state, "coder", content, time.time(), new_messages
+        ).update["plan_steps_done"]
+        return done
+
+    assert record("all done")["ok"]
+    assert record("  ")["error"] == "returned no result"
+    assert "boom" in record(json.dumps({"error": "boom"}))["error"]
+
+    failed_call = _tool_result("Error executing code:\nError: NameError")
+    assert not record(
+        "I could not finish", [failed_call, AIMessage(content="I could not finish")]
+    )["ok"]
+    assert not record("done", [_tool_result("Traceback", status="error")])["ok"]
+    # A failed call followed by a successful one is a recovery
+    assert record("done", [failed_call, _tool_result("3 clusters")])["ok"]
+
+
+def test_raising_agent_fails_its_step():
+    """Test that an exception fails the plan step and is raised outside a plan"""
+    command = _member_error(
+        _state(plan_step=2), "coder", RuntimeError("provider down"), time.time()
+    )
+    [done] = command.update["plan_steps_done"]
+    assert not done["ok"] and "provider down" in done["error"]
+
+    routing = _routing()
+    assert _plan_cursor(_state([_done(1, "researcher"), done]), routing) is None
+    assert "provider down" in routing["fallback"]
+
+    with pytest.raises(RuntimeError):
+        _member_error(_state(), "coder", RuntimeError("provider down"), time.time())
+
+
+def test_new_plan_restarts_the_clock(monkeypatch):
+    """Test that the planner resets the plan start time left by an earlier plan"""
+
+    async def generate_plan(state, config=None):
+        return json.dumps({"thought": "", "title": "t", "steps": []})
+
+    monkeypatch.setattr(nodes, "_generate_plan", generate_plan)
+    before = time.time()
+    command = asyncio.run(nodes.planner_node(_state(plan_started_at=before - 3600)))
+    assert command.update["plan_started_at"] >= before
+    assert command.update["plan_steps_done"] == []
@@ -0,0 +1,147 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from src.graph import nodes
+from src.tools import search
+from src.tools.search import (
+    SearchCache,
+    dedupe_results,
+    normalize_query,
+    planning_search,
+    reformulate_query,
+)
+
+
+class _Tavily:
+    def __init__(self, delays=None):
+        self.delays = delays or {}
+        self.queries = []
+
+    async def ainvoke(self, tool_input, config=None):
+        query = tool_input["query"]
+        self.queries.append(query)
+        await asyncio.sleep(self.delays.get(query, 0.01))
+        return [
+            {"url": "https://shared.example", "title": "shared", "content": "shared"},
+            {
+                "url": f"https://example/{normalize_query(query)}",
+                "title": query,
+                "content": query,
+            },
+        ]
+
+
+@pytest.fixture
+def tavily(monkeypatch):
+    """Fake Tavily and an empty cache"""
+    fake = _Tavily()
+    monkeypatch.setattr(search, "tavily_tool", fake)
+    monkeypatch.setattr(
+        search, "planning_search_cache", SearchCache(ttl_seconds=60, max_entries=8)
+    )
+    return fake
+
+
+def test_normalize_and_reformulate():
+    """Test that near-identical queries share a key and reformulations are distinct"""
+    assert normalize_query("  Single-cell   RNA-seq? ") == normalize_query(
+        "single cell rna seq"
+    )
+    queries = reformulate_query("How do I cluster my scRNA data? Use scanpy please.", 3)
+    assert queries == [
+        "How do I cluster my scRNA data? Use scanpy please.",
+        "cluster scRNA data Use scanpy",
+    ]
+    assert reformulate_query("scanpy", 3) == ["scanpy"]
+    # Keywords that are all of the request are not searched twice
+    assert reformulate_query("Scanpy clustering tutorial.", 3) == [
+        "Scanpy clustering tutorial."
+    ]
+    assert len(reformulate_query("How do I cluster my data?", 1)) == 1
+
+
+def test_reformulate_multimodal_request():
+    """Test that the text parts of multimodal content make up the request"""
+    content = [
+        {"type": "text", "text": "What cell types are in this"},
+        {"type": "image_url", "image_url": {"url": "data:image/png;base64,AAAA"}},
+        {"type": "text", "text": "UMAP plot?"},
+    ]
+    assert reformulate_query(content, 2) == [
+        "What cell types are in this UMAP plot?",
+        "cell types UMAP plot",
+    ]
+    assert (
+        reformulate_query([{"type": "image_url", "image_url": {"url": "x"}}], 2) == []
+    )
+
+
+def test_dedupe_results_round_robin():
+    """Test that results are interleaved across queries and duplicates dropped"""
+    a = [{"url": "1"}, {"url": "2"}]
+    b = [{"url": "1"}, {"url": "3"}, {"url": "4"}]
+    assert [r["url"] for r in dedupe_results([a, b], 10)] == ["1", "2", "3", "4"]
+    assert len(dedupe_results([a, b], 2)) == 2
+
+
+def test_cache_expires_and_evicts():
+    """Test that entries expire after the TTL and the least recently used is evicted"""
+    cache = SearchCache(ttl_seconds=0, max_entries=2)
+    cache.put("a", [])
+    assert cache.get("a") is None
+
+    cache = SearchCache(ttl_seconds=60, max_entries=2)
+    cache.put("a", [1])
+    cache.put("b", [2])
+    cache.get("a")
+    cache.put("c", [3])
+    assert cache.get("b") is None and cache.get("a") == [1]
+
+
+def test_planning_search_caches_by_normalized_query(tavily):
+    """Test that queries run concurrently once and repeats are served from the cache"""
+    first = asyncio.run(planning_search("Cluster my data. Then plot it", max_queries=2))
+    assert len(tavily.queries) == 2
+    # One shared page plus one page per query
+    assert len(first) == 3
+
+    again = asyncio.run(
+        planning_search("cluster my  data!  Then plot it.", max_queries=2)
+    )
+    assert len(tavily.queries) == 2
+    assert again == first
+
+
+def test_planning_search_meets_deadline(tavily):
+    """Test that slow queries are left out but still fill the cache"""
+    tavily.delays = {"slow query": 0.5}
+
+    async def main():
+        results = await planning_search("slow query", deadline_seconds=0.05)
+        await asyncio.sleep(0.6)
+        return results
+
+    assert asyncio.run(main()) == []
+    assert search.planning_search_cache.get("slow query")
+
+
+def test_plan_messages_with_multimodal_request(tavily):
+    """Test that search results are added to a multimodal request as a text part"""
+    image = {"type": "image_url", "image_url": {"url": "data:image/png;base64,AAAA"}}
+    request = HumanMessage(
+        content=[{"type": "text", "text": "Annotate this UMAP"}, image]
+    )
+    state = {"messages": [request], "TEAM_MEMBERS": [], "search_before_planning": True}
+
+    messages = asyncio.run(nodes._plan_messages(state))
+    content = messages[-1].content
+    assert content[:2] == request.content
+    assert (
+        content[2]["type"] == "text"
+        and "# Relative Search Results" in content[2]["text"]
+    )
+    assert tavily.queries == ["Annotate this UMAP", "Annotate UMAP"]
+    # The state's message is left as it was
+    assert len(request.content) == 2
@@ -0,0 +1,80 @@
+import asyncio
+import subprocess
+import threading
+import time
+
+import pytest
+
+from src.utils.process_utils import (
+    ExecutionCancelledError,
+    interrupt_workflow_threads,
+    run_command,
+    run_interruptible,
+    terminate_workflow_processes,
+)
+from src.utils.workflow_context import WorkflowContext, workflow_scope
+
+
+def test_run_command_matches_subprocess_run():
+    """Test that output, exit codes and timeouts behave like subprocess.run"""
+    assert run_command("echo hello").stdout == "hello\n"
+
+    with pytest.raises(subprocess.CalledProcessError) as exc_info:
+        run_command("echo oops >&2; exit 3")
+    assert exc_info.value.returncode == 3
+    assert exc_info.value.stderr == "oops\n"
+
+    with pytest.raises(subprocess.TimeoutExpired):
+        run_command("sleep 5", timeout=0.2)
+
+
+def test_cancel_kills_workflow_commands():
+    """Test that terminating a workflow kills the process group of its commands"""
+    context = WorkflowContext(workflow_id="wf")
+    result = {}
+
+    def target():
+        with workflow_scope(context):
+            try:
+                run_command("sleep 30 & sleep 30; wait")
+            except subprocess.CalledProcessError as e:
+                result["returncode"] = e.returncode
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    while not context.processes:
+        time.sleep(0.01)
+
+    start = time.monotonic()
+    asyncio.run(terminate_workflow_processes(context))
+    thread.join(timeout=10)
+    assert time.monotonic() - start < 10
+    assert result["returncode"] < 0
+    assert not context.processes
+
+
+def test_interrupt_workflow_threads():
+    """Test that a running in-process execution is interrupted"""
+    context = WorkflowContext(workflow_id="wf")
+    result = {}
+
+    def busy():
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            pass
+
+    def target():
+        with workflow_scope(context):
+            try:
+                run_interruptible(busy)
+            except ExecutionCancelledError:
+                result["cancelled"] = True
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    while not context.threads:
+        time.sleep(0.01)
+
+    interrupt_workflow_threads(context)
+    thread.join(timeout=10)
+    assert result == {"cancelled": True}
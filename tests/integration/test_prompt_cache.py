@@ -0,0 +1,56 @@
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from src.llms.prompt_cache import PromptCacheStats
+
+
+def _result(message, llm_output=None):
+    return LLMResult(
+        generations=[[ChatGeneration(message=message)]], llm_output=llm_output
+    )
+
+
+def test_prompt_cache_stats_from_usage_metadata():
+    """Test that cached tokens are read from langchain usage metadata"""
+    stats = PromptCacheStats()
+    message = AIMessage(
+        content="ok",
+        usage_metadata={
+            "input_tokens": 1000,
+            "output_tokens": 10,
+            "total_tokens": 1010,
+            "input_token_details": {"cache_read": 800},
+        },
+    )
+    stats.on_llm_end(_result(message))
+    stats.on_llm_end(_result(message))
+
+    summary = stats.summary()
+    assert summary["llm_calls"] == 2
+    assert summary["prompt_tokens"] == 2000
+    assert summary["cached_tokens"] == 1600
+    assert summary["hit_rate"] == 0.8
+
+
+def test_prompt_cache_stats_from_provider_usage():
+    """Test that provider-specific cached token fields are understood"""
+    stats = PromptCacheStats()
+    stats.on_llm_end(
+        _result(
+            AIMessage(content="ok"),
+            {"token_usage": {"prompt_tokens": 500, "prompt_cache_hit_tokens": 100}},
+        )
+    )
+    stats.on_llm_end(
+        _result(
+            AIMessage(content="ok"),
+            {
+                "token_usage": {
+                    "prompt_tokens": 500,
+                    "prompt_tokens_details": {"cached_tokens": 300},
+                }
+            },
+        )
+    )
+    assert stats.summary()["cached_tokens"] == 400
+    assert PromptCacheStats().summary()["hit_rate"] == 0.0
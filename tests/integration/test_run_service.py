@@ -0,0 +1,178 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from src.service import run_service
+from src.service.run_service import follow_run, get_run_owner, parse_event_id, start_run
+from src.service.scheduler import WorkflowScheduler
+from src.utils.worker_utils import WORKER_ID
+
+
+@pytest.fixture(autouse=True)
+def isolated_runs(tmp_path, monkeypatch):
+    """Spill to a temporary directory with a small buffer and a fresh scheduler"""
+    monkeypatch.setattr(run_service, "RUN_SPILL_DIR", tmp_path)
+    monkeypatch.setattr(run_service, "RUN_BUFFER_EVENTS", 3)
+    monkeypatch.setattr(run_service, "scheduler", WorkflowScheduler(max_running=4))
+    monkeypatch.setattr(run_service, "_runs", {})
+    return tmp_path
+
+
+async def _workflow(count, pause=0.0):
+    for i in range(count):
+        yield {"event": "tool_call", "data": {"i": i}}
+        await asyncio.sleep(pause)
+
+
+def _payloads(items):
+    return [
+        json.loads(data).get("i") for _, event, data in items if event == "tool_call"
+    ]
+
+
+def test_replay_from_memory_and_spill():
+    """Test that a late subscriber replays spilled and buffered events in order"""
+
+    async def main():
+        ticket = run_service.scheduler.submit("s1")
+        run = start_run("s1", ticket, _workflow(10))
+        await run.task
+        everything = [item async for item in run.subscribe(0)]
+        resumed = [item async for item in run.subscribe(5)]
+        return run, everything, resumed
+
+    run, everything, resumed = asyncio.run(main())
+    assert [seq for seq, _, _ in everything] == list(range(1, run.last_seq + 1))
+    assert _payloads(everything) == list(range(10))
+    assert [seq for seq, _, _ in resumed] == list(range(6, run.last_seq + 1))
+    assert run_service.scheduler.stats() == {"running": 0, "queued": 0}
+
+
+def test_log_is_written_in_batches_off_the_loop(monkeypatch):
+    """Test that events reach the log in a few writes from a thread, all before the run is done"""
+    writes = []
+
+    async def main():
+        ticket = run_service.scheduler.submit("s1")
+        run = start_run("s1", ticket, _workflow(50))
+        write = run._write
+
+        def record(data):
+            writes.append(
+                (
+                    data.count(b"\n"),
+                    threading.current_thread() is threading.main_thread(),
+                )
+            )
+            write(data)
+
+        monkeypatch.setattr(run, "_write", record)
+        await run.task
+        return run
+
+    run = asyncio.run(main())
+    assert sum(lines for lines, _ in writes) == run.last_seq
+    assert len(writes) < run.last_seq / 10
+    assert not any(on_loop for _, on_loop in writes)
+    lines = run_service._log_path(run.run_id).read_bytes().splitlines()
+    assert [json.loads(line)[0] for line in lines] == list(range(1, run.last_seq + 1))
+
+
+def test_reattach_keeps_run_alive(monkeypatch):
+    """Test that a detached run continues within the grace period"""
+    monkeypatch.setattr(run_service, "RUN_REATTACH_GRACE_SECONDS", 10)
+
+    async def main():
+        ticket = run_service.scheduler.submit("s1")
+        run = start_run("s1", ticket, _workflow(5, pause=0.01))
+        subscription = run.subscribe(0)
+        async for seq, _, _ in subscription:
+            if seq == 2:
+                subscription.close()
+        await run.task
+        return run, [item async for item in run.subscribe(2)]
+
+    run, resumed = asyncio.run(main())
+    assert not run.task.cancelled()
+    assert _payloads(resumed) == [1, 2, 3, 4]
+
+
+def test_detached_run_is_cancelled_without_grace(monkeypatch):
+    """Test that a run with no client is cancelled when the grace period is 0"""
+    monkeypatch.setattr(run_service, "RUN_REATTACH_GRACE_SECONDS", 0)
+
+    async def main():
+        ticket = run_service.scheduler.submit("s1")
+        run = start_run("s1", ticket, _workflow(1000, pause=0.01))
+        subscription = run.subscribe(0)
+        async for _ in subscription:
+            subscription.close()
+        with pytest.raises(asyncio.CancelledError):
+            await run.task
+        return run
+
+    run = asyncio.run(main())
+    assert run.done
+
+
+def test_run_owner_is_recorded_until_eviction():
+    """Test that other workers can find which worker holds a run"""
+
+    async def main():
+        ticket = run_service.scheduler.submit("s1")
+        run = start_run("s1", ticket, _workflow(1))
+        await run.task
+        return run
+
+    run = asyncio.run(main())
+    assert get_run_owner(run.run_id) == WORKER_ID
+    run_service._evict(run.run_id)
+    assert get_run_owner(run.run_id) is None
+    assert get_run_owner("unknown") is None
+
+
+def test_follow_run_from_another_worker(monkeypatch):
+    """Test that a worker without the run follows it through the shared log"""
+    monkeypatch.setattr(run_service, "RUN_REMOTE_POLL_SECONDS", 0.01)
+
+    async def main():
+        ticket = run_service.scheduler.submit("s1")
+        run = start_run("s1", ticket, _workflow(10, pause=0.005))
+        remote = follow_run(run.run_id)
+        followed = [item async for item in remote.subscribe(3)]
+        return run, followed
+
+    run, followed = asyncio.run(main())
+    assert [seq for seq, _, _ in followed] == list(range(4, run.last_seq + 1))
+    assert _payloads(followed) == list(range(10))[-len(_payloads(followed)) :]
+    assert follow_run("not-a-run") is None
+
+
+def test_remote_client_keeps_detached_run_alive(monkeypatch):
+    """Test that a run detached from its worker survives while followed elsewhere"""
+    monkeypatch.setattr(run_service, "RUN_REATTACH_GRACE_SECONDS", 0.05)
+    monkeypatch.setattr(run_service, "RUN_REMOTE_POLL_SECONDS", 0.01)
+
+    async def main():
+        ticket = run_service.scheduler.submit("s1")
+        run = start_run("s1", ticket, _workflow(30, pause=0.01))
+        local = run.subscribe(0)
+        async for _ in local:
+            local.close()
+        # The client comes back through another worker
+        followed = [item async for item in follow_run(run.run_id).subscribe(0)]
+        await run.task
+        return run, followed
+
+    run, followed = asyncio.run(main())
+    assert not run.task.cancelled()
+    assert _payloads(followed) == list(range(30))
+
+
+def test_parse_event_id():
+    """Test that event ids are split into run id and sequence number"""
+    assert parse_event_id("abc:12") == ("abc", 12)
+    with pytest.raises(ValueError):
+        parse_event_id("abc")
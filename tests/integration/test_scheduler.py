@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+
+from src.service.scheduler import SchedulerFull, SessionLimitExceeded, WorkflowScheduler
+
+
+def test_global_and_session_caps():
+    """Test that runs beyond the caps queue and are admitted as slots free up"""
+    scheduler = WorkflowScheduler(
+        max_running=2, max_queued=10, session_max_running=1, session_max_pending=3
+    )
+    a1 = scheduler.submit("a")
+    a2 = scheduler.submit("a")
+    b1 = scheduler.submit("b")
+    c1 = scheduler.submit("c")
+
+    assert (a1.admitted, a2.admitted, b1.admitted, c1.admitted) == (
+        True,
+        False,
+        True,
+        False,
+    )
+    assert scheduler.position(a2) == 1
+    assert scheduler.position(c1) == 2
+
+    scheduler.release(b1)
+    # a2 is still held back by session a's cap, so c1 takes the slot
+    assert c1.admitted and not a2.admitted
+
+    scheduler.release(a1)
+    assert a2.admitted
+    assert scheduler.stats() == {"running": 2, "queued": 0}
+
+
+def test_priority_and_rejection():
+    """Test that interactive runs jump batch runs and a full queue rejects"""
+    scheduler = WorkflowScheduler(
+        max_running=1, max_queued=2, session_max_running=1, session_max_pending=1
+    )
+    running = scheduler.submit("a")
+    batch = scheduler.submit("b", priority="batch")
+    interactive = scheduler.submit("c")
+    assert scheduler.position(interactive) == 1
+    assert scheduler.position(batch) == 2
+
+    with pytest.raises(SchedulerFull):
+        scheduler.submit("d")
+    with pytest.raises(SessionLimitExceeded):
+        scheduler.submit("a")
+
+    scheduler.release(running)
+    assert interactive.admitted and not batch.admitted
+
+
+def test_wait_reports_positions():
+    """Test that a waiting run is told its position until it is admitted"""
+    scheduler = WorkflowScheduler(
+        max_running=1, max_queued=10, session_max_running=1, session_max_pending=3
+    )
+
+    async def main():
+        first = scheduler.submit("a")
+        second = scheduler.submit("b")
+        third = scheduler.submit("c")
+        positions = []
+
+        async def consume():
+            async for position in scheduler.wait(third):
+                positions.append(position)
+
+        waiter = asyncio.create_task(consume())
+        await asyncio.sleep(0)
+        scheduler.release(first)
+        await asyncio.sleep(0)
+        scheduler.release(second)
+        await asyncio.wait_for(waiter, 1)
+        return positions
+
+    assert asyncio.run(main()) == [2, 1]
+    assert scheduler.stats() == {"running": 1, "queued": 0}
+
+
+def test_session_caps_across_workers(tmp_path):
+    """Test that per-session caps hold across worker processes sharing a slot directory"""
+    worker_a = WorkflowScheduler(
+        max_running=4,
+        max_queued=10,
+        session_max_running=1,
+        session_max_pending=2,
+        slot_dir=tmp_path,
+    )
+    worker_b = WorkflowScheduler(
+        max_running=4,
+        max_queued=10,
+        session_max_running=1,
+        session_max_pending=2,
+        slot_dir=tmp_path,
+    )
+    running = worker_a.submit("a")
+    waiting = worker_b.submit("a")
+    assert running.admitted and not waiting.admitted
+    with pytest.raises(SessionLimitExceeded):
+        worker_a.submit("a")
+
+    async def main():
+        positions = [position async for position in worker_b.wait(waiting)]
+        return positions
+
+    worker_a.release(running)
+    # worker_b is not notified; it finds the freed slot when it polls
+    assert asyncio.run(main()) == [1]
+    assert waiting.admitted
+    worker_b.release(waiting)
+    assert worker_a.submit("a").admitted
+
+
+def test_requests_without_session_are_counted_per_client():
+    """Test that clients omitting session_id do not share one session's limits"""
+    from starlette.requests import Request
+
+    from src.api.app import _admission_key
+    from src.schema.schemas import ChatRequest
+
+    def request(host, **fields):
+        chat = ChatRequest(messages=[{"role": "user", "content": "hi"}], **fields)
+        return chat, Request({"type": "http", "client": (host, 1234), "headers": []})
+
+    assert _admission_key(*request("10.0.0.1")) == "client:10.0.0.1"
+    assert _admission_key(*request("10.0.0.1", session_id="s1")) == "s1"
+
+    scheduler = WorkflowScheduler(
+        max_running=8, max_queued=8, session_max_running=1, session_max_pending=1
+    )
+    for host in ("10.0.0.1", "10.0.0.2", "10.0.0.3", "10.0.0.4"):
+        assert scheduler.submit(_admission_key(*request(host))).admitted
+    with pytest.raises(SessionLimitExceeded):
+        scheduler.submit(_admission_key(*request("10.0.0.1")))
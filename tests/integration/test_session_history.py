@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import END, START, StateGraph
+
+from src.graph.types import State
+from src.service import workflow_service
+
+
+@pytest.fixture
+def seen(monkeypatch):
+    """Replace the agent graph with one that records the conversation it is given"""
+    seen = []
+
+    def reply(state):
+        seen.append([(message.type, message.content) for message in state["messages"]])
+        return {"messages": [AIMessage(content=f"reply {len(seen)}")]}
+
+    builder = StateGraph(State)
+    builder.add_node("coordinator", reply)
+    builder.add_edge(START, "coordinator")
+    builder.add_edge("coordinator", END)
+    monkeypatch.setattr(
+        workflow_service, "graph", builder.compile(checkpointer=MemorySaver())
+    )
+    return seen
+
+
+def _run(messages, session_id="s1", history="full"):
+    async def main():
+        async for _ in workflow_service.run_agent_workflow(
+            messages, session_id=session_id, history=history
+        ):
+            pass
+
+    asyncio.run(main())
+
+
+def _user(content):
+    return {"role": "user", "content": content}
+
+
+def test_full_history_sends_only_the_new_turn(seen):
+    """Test that a resent conversation only appends its last message to the checkpoint"""
+    _run([_user("first")])
+    _run([_user("first"), {"role": "assistant", "content": "reply 1"}, _user("second")])
+
+    assert seen[0] == [("human", "first")]
+    assert seen[1] == [("human", "first"), ("ai", "reply 1"), ("human", "second")]
+
+
+def test_delta_appends_to_the_checkpoint(seen):
+    """Test that history='delta' sends only the new messages when a checkpoint exists"""
+    _run([_user("first")], history="delta")
+    _run([_user("second")], history="delta")
+
+    assert seen[1] == [("human", "first"), ("ai", "reply 1"), ("human", "second")]
+
+
+def test_without_checkpoint_the_whole_conversation_is_sent(seen):
+    """Test that a session with no stored history takes every message given"""
+    conversation = [
+        _user("first"),
+        {"role": "assistant", "content": "earlier"},
+        _user("second"),
+    ]
+    _run(conversation, session_id="fresh")
+
+    assert seen[0] == [("human", "first"), ("ai", "earlier"), ("human", "second")]
+
+
+def test_history_endpoint_returns_the_checkpoint(seen):
+    """Test that /chat/history returns the checkpointed messages of a session"""
+    from src.api.app import app
+
+    _run([_user("first")])
+    client = TestClient(app)
+
+    data = client.get("/chat/history/s1").json()["data"]
+    assert data["session_id"] == "s1"
+    assert [(m["role"], m["content"]) for m in data["messages"]] == [
+        ("user", "first"),
+        ("assistant", "reply 1"),
+    ]
+    assert client.get("/chat/history/unknown").json()["data"]["messages"] == []
@@ -0,0 +1,103 @@
+import asyncio
+
+from langchain_core.callbacks import AsyncCallbackManager
+from langchain_core.messages import AIMessage, HumanMessage
+
+from src.graph import nodes
+from src.llms.prompt_cache import PromptCacheStats
+from src.utils.workflow_context import WorkflowContext, workflow_scope
+
+
+class _Coordinator:
+    def __init__(self, handoff):
+        self.handoff = handoff
+
+    def bind_tools(self, tools):
+        return self
+
+    async def ainvoke(self, messages):
+        await asyncio.sleep(0.05)
+        tool_calls = (
+            [{"name": "handoff_to_planner", "args": {}, "id": "1"}]
+            if self.handoff
+            else []
+        )
+        return AIMessage(content="hello", tool_calls=tool_calls)
+
+
+class _StreamingHandler(PromptCacheStats):
+    """Stands in for the astream_events handler"""
+
+    def tap_output_aiter(self, run_id, output):
+        return output
+
+    def tap_output_iter(self, run_id, output):
+        return output
+
+
+def _run_coordinator(monkeypatch, handoff, config=None, plan_configs=None):
+    async def generate_plan(state, config=None):
+        if plan_configs is not None:
+            plan_configs.append(config)
+        await asyncio.sleep(0.01)
+        return '{"steps": []}'
+
+    monkeypatch.setattr(
+        nodes, "get_llm_by_type", lambda llm_type: _Coordinator(handoff)
+    )
+    monkeypatch.setattr(nodes, "_generate_plan", generate_plan)
+    state = {
+        "messages": [HumanMessage(content="analyse my data")],
+        "TEAM_MEMBERS": [],
+        "speculative_planning": True,
+    }
+
+    async def main():
+        context = WorkflowContext("wf")
+        with workflow_scope(context):
+            command = await nodes.coordinator_node(state, config)
+            return command, context, await nodes._speculative_plan(context)
+
+    return asyncio.run(main())
+
+
+def test_speculative_plan_is_handed_to_planner(monkeypatch):
+    """Test that the plan started beside the coordinator is taken over by the planner"""
+    command, context, plan = _run_coordinator(monkeypatch, handoff=True)
+    assert command.goto == "planner"
+    assert plan == '{"steps": []}'
+    assert context.speculative_plan is None
+
+
+def test_speculative_plan_is_cancelled_on_direct_answer(monkeypatch):
+    """Test that speculation is dropped when the coordinator answers itself"""
+    command, context, plan = _run_coordinator(monkeypatch, handoff=False)
+    assert command.goto == "__end__"
+    assert plan is None and context.speculative_plan is None
+
+
+def test_speculative_plan_keeps_cache_stats(monkeypatch):
+    """Test that speculation drops the streaming handlers and keeps prompt cache stats"""
+    cache_stats, streaming = PromptCacheStats(), _StreamingHandler()
+    config = {"callbacks": AsyncCallbackManager(handlers=[streaming, cache_stats])}
+    plan_configs = []
+    _run_coordinator(
+        monkeypatch, handoff=True, config=config, plan_configs=plan_configs
+    )
+    assert plan_configs == [{"callbacks": [cache_stats]}]
+
+
+def test_failed_speculation_plans_again():
+    """Test that a failed speculative plan is ignored"""
+
+    async def failing():
+        raise RuntimeError("provider down")
+
+    async def main():
+        context = WorkflowContext("wf")
+        context.speculative_plan = asyncio.create_task(failing())
+        return await nodes._speculative_plan(context), context
+
+    plan, context = asyncio.run(main())
+    assert plan is None and context.speculative_plan is None
+    assert asyncio.run(nodes._speculative_plan(None)) is None
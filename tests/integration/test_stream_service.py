@@ -0,0 +1,87 @@
+import asyncio
+
+from src.service.stream_service import WorkflowStream, coalesce_deltas
+
+
+def _delta(message_id, text, field="content"):
+    return {
+        "event": "message",
+        "data": {"message_id": message_id, "delta": {field: text}},
+    }
+
+
+async def _events(*events, pause=0.0):
+    for event in events:
+        if pause:
+            await asyncio.sleep(pause)
+        yield event
+
+
+async def _collect(events, **kwargs):
+    return [event async for event in coalesce_deltas(events, **kwargs)]
+
+
+def test_consecutive_deltas_are_merged():
+    """Test that deltas of one message are merged and other events keep their order"""
+    events = _events(
+        {"event": "start_of_llm", "data": {"agent_name": "planner"}},
+        _delta("m1", "Hel"),
+        _delta("m1", "lo"),
+        _delta("m1", "think", field="reasoning_content"),
+        _delta("m2", "!"),
+        {"event": "end_of_llm", "data": {"agent_name": "planner"}},
+    )
+    result = asyncio.run(_collect(events, window_ms=1000, max_bytes=1024))
+    assert result == [
+        {"event": "start_of_llm", "data": {"agent_name": "planner"}},
+        _delta("m1", "Hello"),
+        _delta("m1", "think", field="reasoning_content"),
+        _delta("m2", "!"),
+        {"event": "end_of_llm", "data": {"agent_name": "planner"}},
+    ]
+
+
+def test_size_and_window_limits():
+    """Test that merged deltas are flushed at max_bytes and after the window"""
+    result = asyncio.run(
+        _collect(
+            _events(*(_delta("m1", "ab") for _ in range(3))),
+            window_ms=1000,
+            max_bytes=4,
+        )
+    )
+    assert [event["data"]["delta"]["content"] for event in result] == ["abab", "ab"]
+
+    result = asyncio.run(
+        _collect(
+            _events(_delta("m1", "a"), _delta("m1", "b"), pause=0.05), window_ms=10
+        )
+    )
+    assert [event["data"]["delta"]["content"] for event in result] == ["a", "b"]
+
+
+def test_disabled_passes_through():
+    """Test that a zero window leaves the stream untouched"""
+    events = [_delta("m1", "a"), _delta("m1", "b")]
+    assert asyncio.run(_collect(_events(*events), window_ms=0)) == events
+
+
+def test_cancelled_stream_ends():
+    """Test that cancelling a workflow stream ends iteration and cancels the source"""
+    cleanup = []
+
+    async def endless():
+        try:
+            while True:
+                yield _delta("m1", "a")
+                await asyncio.sleep(0.01)
+        finally:
+            cleanup.append(True)
+
+    async def run():
+        stream = WorkflowStream(endless())
+        asyncio.get_running_loop().call_later(0.05, stream.cancel)
+        return [event async for event in coalesce_deltas(stream, window_ms=0)]
+
+    assert asyncio.run(run())
+    assert cleanup == [True]
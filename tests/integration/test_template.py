@@ -1,5 +1,11 @@
 import pytest
-from src.prompts.template import get_prompt_template, apply_prompt_template
+from src.prompts.template import (
+    apply_prompt_template,
+    get_prompt_template,
+    prefix_cache_info,
+    render_prompt_prefix,
+    split_system_prompt,
+)
 
 
 def test_get_prompt_template_success():
@@ -103,3 +109,48 @@ def test_current_time_format():
     assert any(
         line.strip().startswith("CURRENT_TIME:") for line in system_content.split("\n")
     )
+
+
+def test_system_prompt_prefix_is_stable():
+    """Test that the current time only appears after the stable prefix"""
+    test_state = {
+        "messages": [],
+        "TEAM_MEMBERS": ["researcher", "coder"],
+        "TEAM_MEMBER_CONFIGRATIONS": {
+            "researcher": {"desc_for_llm": "searches"},
+            "coder": {"desc_for_llm": "codes"},
+        },
+    }
+
+    first = apply_prompt_template("supervisor", test_state)[0]["content"]
+    second = apply_prompt_template("supervisor", test_state)[0]["content"]
+    first_prefix, first_suffix = split_system_prompt(first)
+    second_prefix, _ = split_system_prompt(second)
+
+    assert first_prefix == second_prefix
+    assert "researcher, coder" in first_prefix
+    assert "CURRENT_TIME" not in first_prefix
+    assert first_suffix.strip().startswith("---\nCURRENT_TIME:")
+
+
+def test_prompt_prefix_is_memoised_per_team():
+    """Test that prefixes are rendered once per template and team"""
+    state = {
+        "messages": [],
+        "TEAM_MEMBERS": ["researcher"],
+        "TEAM_MEMBER_CONFIGRATIONS": {"researcher": {"desc_for_llm": "searches"}},
+    }
+    render_prompt_prefix("planner", state)
+    hits = prefix_cache_info().hits
+    assert render_prompt_prefix("planner", dict(state)) is render_prompt_prefix("planner", state)
+    assert prefix_cache_info().hits == hits + 2
+
+    other_team = {
+        **state,
+        "TEAM_MEMBERS": ["researcher", "coder"],
+        "TEAM_MEMBER_CONFIGRATIONS": {
+            "researcher": {"desc_for_llm": "searches"},
+            "coder": {"desc_for_llm": "codes"},
+        },
+    }
+    assert render_prompt_prefix("planner", other_team) != render_prompt_prefix("planner", state)
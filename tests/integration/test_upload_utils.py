@@ -0,0 +1,319 @@
+import asyncio
+import hashlib
+import io
+import os
+import time
+
+import pytest
+from fastapi import UploadFile
+
+from src.utils import blob_utils, upload_utils
+from src.utils.file_utils import save_file
+from src.utils.worker_utils import file_lock, try_file_lock
+from src.utils.upload_utils import (
+    UploadOffsetMismatch,
+    init_upload,
+    get_upload_status,
+    write_chunk,
+    complete_upload,
+    link_existing_upload,
+    collect_uploads,
+)
+
+
+async def _body(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+@pytest.fixture(autouse=True)
+def upload_tmp_dir(tmp_path, monkeypatch):
+    """Stage uploads and blobs in a temporary directory"""
+    monkeypatch.setattr(upload_utils, "UPLOAD_TMP_DIR", tmp_path / ".uploads")
+    monkeypatch.setattr(blob_utils, "BLOB_DIR", tmp_path / ".blobs")
+    return tmp_path
+
+
+def test_chunked_upload_roundtrip(upload_tmp_dir):
+    """Test that chunks are appended and moved into the session data dir"""
+    info = init_upload("s1", "counts.h5ad", total_size=6, storage_path=upload_tmp_dir)
+    upload_id = info["upload_id"]
+
+    assert asyncio.run(write_chunk(upload_id, 0, _body(b"abc"))) == 3
+    assert asyncio.run(write_chunk(upload_id, 3, _body(b"de", b"f"))) == 6
+
+    result = asyncio.run(
+        complete_upload(upload_id, hashlib.sha256(b"abcdef").hexdigest())
+    )
+    assert result["path"] == "s1/data/counts.h5ad"
+    assert result["size"] == 6
+    assert (upload_tmp_dir / "s1" / "data" / "counts.h5ad").read_bytes() == b"abcdef"
+
+
+def test_chunk_offset_mismatch(upload_tmp_dir):
+    """Test that a chunk at the wrong offset is rejected with the current offset"""
+    upload_id = init_upload("s1", "a.txt", storage_path=upload_tmp_dir)["upload_id"]
+    asyncio.run(write_chunk(upload_id, 0, _body(b"abc")))
+
+    with pytest.raises(UploadOffsetMismatch) as exc_info:
+        asyncio.run(write_chunk(upload_id, 0, _body(b"abc")))
+    assert exc_info.value.expected == 3
+    assert get_upload_status(upload_id)["offset"] == 3
+
+
+def test_resume_after_lost_hash_state(upload_tmp_dir):
+    """Test that completion re-hashes the staged file after a restart"""
+    upload_id = init_upload("s1", "a.txt", storage_path=upload_tmp_dir)["upload_id"]
+    asyncio.run(write_chunk(upload_id, 0, _body(b"abc")))
+    upload_utils._hash_state.clear()
+    asyncio.run(write_chunk(upload_id, 3, _body(b"def")))
+
+    result = asyncio.run(complete_upload(upload_id))
+    assert result["sha256"] == hashlib.sha256(b"abcdef").hexdigest()
+
+
+def test_chunks_on_two_workers(upload_tmp_dir, monkeypatch):
+    """Test that chunks reaching different workers are serialised and hashed correctly"""
+    upload_id = init_upload("s1", "a.txt", storage_path=upload_tmp_dir)["upload_id"]
+    asyncio.run(write_chunk(upload_id, 0, _body(b"abc")))
+
+    # Another worker process, with its own locks and hash state, takes the next chunk
+    worker_a = (upload_utils._hash_state, upload_utils._upload_locks)
+    monkeypatch.setattr(upload_utils, "_hash_state", {})
+    monkeypatch.setattr(upload_utils, "_upload_locks", {})
+
+    async def contended():
+        # While a worker holds the upload's file lock, others wait for it
+        async with file_lock(upload_utils._lock_path(upload_id)):
+            chunk = asyncio.create_task(write_chunk(upload_id, 3, _body(b"def")))
+            await asyncio.sleep(0.2)
+            assert not chunk.done()
+        return await chunk
+
+    assert asyncio.run(contended()) == 6
+
+    monkeypatch.setattr(upload_utils, "_hash_state", worker_a[0])
+    monkeypatch.setattr(upload_utils, "_upload_locks", worker_a[1])
+    asyncio.run(write_chunk(upload_id, 6, _body(b"ghi")))
+    result = asyncio.run(complete_upload(upload_id))
+    assert result["sha256"] == hashlib.sha256(b"abcdefghi").hexdigest()
+
+
+def test_complete_with_bad_checksum(upload_tmp_dir):
+    """Test that a checksum mismatch is reported"""
+    upload_id = init_upload("s1", "a.txt", storage_path=upload_tmp_dir)["upload_id"]
+    asyncio.run(write_chunk(upload_id, 0, _body(b"abc")))
+
+    with pytest.raises(ValueError):
+        asyncio.run(complete_upload(upload_id, "0" * 64))
+
+
+def test_unknown_upload():
+    """Test that unknown or unsafe upload ids are rejected"""
+    with pytest.raises(FileNotFoundError):
+        get_upload_status("../etc")
+
+
+def test_link_existing_upload(upload_tmp_dir):
+    """Test that known content is linked into another session without re-upload"""
+    upload_id = init_upload("s1", "ref.h5ad", storage_path=upload_tmp_dir)["upload_id"]
+    asyncio.run(write_chunk(upload_id, 0, _body(b"reference")))
+    digest = asyncio.run(complete_upload(upload_id))["sha256"]
+
+    # Only sessions holding the content may link it by hash
+    assert (
+        asyncio.run(link_existing_upload("s2", "ref.h5ad", digest, upload_tmp_dir))
+        is None
+    )
+    result = asyncio.run(
+        link_existing_upload(
+            "s2", "ref.h5ad", digest, upload_tmp_dir, source_session_id="s1"
+        )
+    )
+    assert result["path"] == "s2/data/ref.h5ad"
+    assert result["size"] == 9
+    assert (upload_tmp_dir / "s2" / "data" / "ref.h5ad").read_bytes() == b"reference"
+
+    assert (
+        asyncio.run(link_existing_upload("s2", "x", "0" * 64, upload_tmp_dir)) is None
+    )
+
+
+def _upload(storage_path, session_id, filename, content):
+    upload_id = init_upload(session_id, filename, storage_path=storage_path)[
+        "upload_id"
+    ]
+    asyncio.run(write_chunk(upload_id, 0, _body(content)))
+    return asyncio.run(complete_upload(upload_id))["sha256"]
+
+
+def _fake_reflink(source, target):
+    """A copy standing in for a copy-on-write clone"""
+    target.write_bytes(source.read_bytes())
+    return True
+
+
+def test_reflinked_copies_are_independent(upload_tmp_dir, monkeypatch):
+    """Test that reflinked session files are writable and editing one leaves the blob intact"""
+    monkeypatch.setattr(blob_utils, "_reflink", _fake_reflink)
+    digest = _upload(upload_tmp_dir, "s1", "ref.csv", b"reference")
+    asyncio.run(
+        link_existing_upload(
+            "s2", "ref.csv", digest, upload_tmp_dir, source_session_id="s1"
+        )
+    )
+
+    first = upload_tmp_dir / "s1" / "data" / "ref.csv"
+    second = upload_tmp_dir / "s2" / "data" / "ref.csv"
+    assert first.stat().st_ino != second.stat().st_ino
+    with second.open("r+b") as f:
+        f.write(b"EDITED")
+
+    assert first.read_bytes() == b"reference"
+    assert blob_utils.blob_path(digest).read_bytes() == b"reference"
+    # The edited copy no longer counts as holding the content
+    assert blob_utils.has_blob_ref(digest, ["s1"])
+    assert not blob_utils.has_blob_ref(digest, ["s2"])
+
+
+def test_hardlinks_share_the_blob(upload_tmp_dir, monkeypatch):
+    """Test that without reflinks session files are read-only hardlinks to the blob"""
+    monkeypatch.setattr(blob_utils, "_reflink", lambda source, target: False)
+    digest = _upload(upload_tmp_dir, "s1", "ref.csv", b"reference")
+    asyncio.run(
+        link_existing_upload(
+            "s2", "ref.csv", digest, upload_tmp_dir, source_session_id="s1"
+        )
+    )
+
+    blob = blob_utils.blob_path(digest)
+    for session_id in ("s1", "s2"):
+        session_file = upload_tmp_dir / session_id / "data" / "ref.csv"
+        assert session_file.stat().st_ino == blob.stat().st_ino
+        assert not session_file.stat().st_mode & 0o222
+    assert blob.stat().st_nlink == 3
+
+    # Storing the same content again touches the shared inode without
+    # invalidating the sessions' references
+    _upload(upload_tmp_dir, "s3", "ref.csv", b"reference")
+    assert blob_utils.has_blob_ref(digest, ["s1"]) and blob_utils.has_blob_ref(
+        digest, ["s2"]
+    )
+
+
+def test_copies_do_not_keep_the_blob(upload_tmp_dir, monkeypatch):
+    """Test that content is kept once when session files cannot share its blocks"""
+    monkeypatch.setattr(blob_utils, "_reflink", lambda source, target: False)
+    monkeypatch.setattr(blob_utils, "_hardlink", lambda source, target: False)
+    digest = _upload(upload_tmp_dir, "s1", "ref.csv", b"reference")
+    assert not blob_utils.has_blob(digest)
+
+    result = asyncio.run(
+        link_existing_upload(
+            "s2", "ref.csv", digest, upload_tmp_dir, source_session_id="s1"
+        )
+    )
+    assert result["size"] == 9
+    assert (upload_tmp_dir / "s2" / "data" / "ref.csv").read_bytes() == b"reference"
+    # Re-linking the only copy onto itself keeps it
+    asyncio.run(link_existing_upload("s1", "ref.csv", digest, upload_tmp_dir))
+    assert (upload_tmp_dir / "s1" / "data" / "ref.csv").read_bytes() == b"reference"
+
+    (upload_tmp_dir / "s1" / "data" / "ref.csv").unlink()
+    (upload_tmp_dir / "s2" / "data" / "ref.csv").unlink()
+    blob_utils.collect_blobs(grace_seconds=0)
+    assert not blob_utils._refs_dir(digest).exists()
+
+
+def test_unreferenced_blobs_are_collected(upload_tmp_dir):
+    """Test that a blob is deleted once no session holds an unchanged copy"""
+    upload_id = init_upload("s1", "a.txt", storage_path=upload_tmp_dir)["upload_id"]
+    asyncio.run(write_chunk(upload_id, 0, _body(b"abc")))
+    digest = asyncio.run(complete_upload(upload_id))["sha256"]
+
+    assert blob_utils.collect_blobs(grace_seconds=0) == {"kept": 1, "deleted": 0}
+    (upload_tmp_dir / "s1" / "data" / "a.txt").unlink()
+    assert blob_utils.collect_blobs(grace_seconds=0) == {"kept": 0, "deleted": 1}
+    assert not blob_utils.has_blob(digest)
+
+
+def _age(upload_id, seconds):
+    then = time.time() - seconds
+    for suffix in (".json", ".part"):
+        os.utime(upload_utils.UPLOAD_TMP_DIR / f"{upload_id}{suffix}", (then, then))
+
+
+def test_abandoned_uploads_are_collected(upload_tmp_dir):
+    """Test that uploads idle past the limit are deleted with their state, and others kept"""
+    abandoned = init_upload("s1", "a.txt", storage_path=upload_tmp_dir)["upload_id"]
+    active = init_upload("s1", "b.txt", storage_path=upload_tmp_dir)["upload_id"]
+    asyncio.run(write_chunk(abandoned, 0, _body(b"abc")))
+    _age(abandoned, 120)
+    # Left behind without a manifest
+    orphan = upload_utils.UPLOAD_TMP_DIR / "orphan.part"
+    orphan.touch()
+    os.utime(orphan, (time.time() - 120, time.time() - 120))
+
+    assert collect_uploads(max_age_seconds=60) == {"kept": 1, "deleted": 1}
+    assert sorted(p.name for p in upload_utils.UPLOAD_TMP_DIR.iterdir()) == [
+        f"{active}.json",
+        f"{active}.part",
+    ]
+    assert (
+        abandoned not in upload_utils._hash_state
+        and abandoned not in upload_utils._upload_locks
+    )
+    with pytest.raises(FileNotFoundError):
+        get_upload_status(abandoned)
+    assert asyncio.run(write_chunk(active, 0, _body(b"abc"))) == 3
+
+
+def test_uploads_in_progress_are_kept(upload_tmp_dir):
+    """Test that an idle upload whose lock is held by a worker is not deleted"""
+    upload_id = init_upload("s1", "a.txt", storage_path=upload_tmp_dir)["upload_id"]
+    _age(upload_id, 120)
+    with try_file_lock(upload_utils._lock_path(upload_id)) as locked:
+        assert locked
+        assert collect_uploads(max_age_seconds=60) == {"kept": 1, "deleted": 0}
+    assert collect_uploads(max_age_seconds=60) == {"kept": 0, "deleted": 1}
+
+
+def test_state_of_uploads_completed_elsewhere_is_dropped(upload_tmp_dir):
+    """Test that hash state and locks are dropped once another worker finished the upload"""
+    upload_id = init_upload("s1", "a.txt", storage_path=upload_tmp_dir)["upload_id"]
+    asyncio.run(write_chunk(upload_id, 0, _body(b"abc")))
+    assert (
+        upload_id in upload_utils._hash_state
+        and upload_id in upload_utils._upload_locks
+    )
+    # What another worker's complete_upload leaves behind
+    upload_utils._manifest_path(upload_id).unlink()
+    upload_utils._part_path(upload_id).unlink()
+
+    collect_uploads()
+    assert (
+        upload_id not in upload_utils._hash_state
+        and upload_id not in upload_utils._upload_locks
+    )
+
+
+def test_invalid_session_id(upload_tmp_dir):
+    """Test that session ids cannot point outside the work directory"""
+    with pytest.raises(ValueError):
+        init_upload("/etc", "a.txt", storage_path=upload_tmp_dir)
+
+
+@pytest.mark.parametrize("filename", ["", ".", "..", "data/.."])
+def test_invalid_file_name(upload_tmp_dir, filename):
+    """Test that names which would replace the data directory are rejected"""
+    digest = _upload(upload_tmp_dir, "s1", "a.txt", b"abc")
+    with pytest.raises(ValueError):
+        init_upload("s1", filename, storage_path=upload_tmp_dir)
+    with pytest.raises(ValueError):
+        asyncio.run(link_existing_upload("s1", filename, digest, upload_tmp_dir))
+    with pytest.raises(ValueError):
+        asyncio.run(
+            save_file(
+                "s1", UploadFile(io.BytesIO(b"abc"), filename=filename), upload_tmp_dir
+            )
+        )
@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from src.graph import nodes
+from src.tools import browser
+from src.utils.workflow_context import (
+    WorkflowContext,
+    WorkflowScopedConfig,
+    workflow_scope,
+)
+
+
+class _Config:
+    TASK_ID = None
+
+
+class _GhostCoder:
+    """Records the task id GhostCoder would see, from its input, its run config and its config object"""
+
+    def __init__(self, config):
+        self.config = config
+        self.seen = []
+
+    async def ainvoke(self, input_state, run_config=None):
+        await asyncio.sleep(0.01)
+        self.seen.append(
+            (
+                input_state["task_id"],
+                run_config["configurable"]["task_id"],
+                self.config.TASK_ID,
+            )
+        )
+        return {"task_result": "done"}
+
+
+def test_task_id_follows_the_workflow():
+    """Test that TASK_ID is the id of the workflow reading it, and the config's own outside one"""
+    wrapped = _Config()
+    config = WorkflowScopedConfig(wrapped)
+
+    async def read(workflow_id):
+        with workflow_scope(WorkflowContext(workflow_id)):
+            await asyncio.sleep(0.01)
+            return config.TASK_ID
+
+    async def main():
+        return await asyncio.gather(read("a"), read("b"))
+
+    assert asyncio.run(main()) == ["a", "b"]
+    assert config.TASK_ID is None
+    # Other attributes, and writes, go to the wrapped config unchanged
+    config.TASK_ID = "c"
+    config.WORK_DIR = "work"
+    assert (wrapped.TASK_ID, wrapped.WORK_DIR, config.WORK_DIR) == ("c", "work", "work")
+    assert config.TASK_ID == "c"
+    assert type(wrapped) is _Config
+
+
+def test_ghostcoder_node_runs_in_its_task(monkeypatch):
+    """Test that concurrent GhostCoder nodes each get their own task id"""
+    agent = _GhostCoder(WorkflowScopedConfig(_Config()))
+    monkeypatch.setattr(nodes, "ghostcoder_agent", agent)
+
+    async def index(state, name):
+        pass
+
+    monkeypatch.setattr(nodes, "_index_artifacts", index)
+
+    def state(task_id):
+        return {
+            "messages": [HumanMessage(content="cluster")],
+            "task_id": task_id,
+            "session_id": "s1",
+        }
+
+    async def main():
+        # One without a workflow context, one inside another workflow's context
+        with workflow_scope(WorkflowContext("outer")):
+            inside = asyncio.create_task(nodes.ghostcoder_node(state("t2")))
+        await asyncio.gather(nodes.ghostcoder_node(state("t1")), inside)
+
+    asyncio.run(main())
+    assert sorted(agent.seen) == [("t1", "t1", "t1"), ("t2", "t2", "t2")]
+
+    with pytest.raises(ValueError):
+        asyncio.run(
+            nodes.ghostcoder_node({"messages": [HumanMessage(content="cluster")]})
+        )
+
+
+class _Browser:
+    def __init__(self, config=None):
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class _BrowserAgent:
+    def __init__(self, task, llm, browser, generate_gif):
+        self.task = task
+        self.browser = browser
+
+    async def run(self):
+        await asyncio.sleep(3600)
+
+
+def test_browser_agents_belong_to_their_workflow(monkeypatch):
+    """Test that cancelling a workflow closes its browsers and no other's"""
+    monkeypatch.setattr(browser, "Browser", _Browser)
+    monkeypatch.setattr(browser, "BrowserAgent", _BrowserAgent)
+    tool = browser.BrowserTool()
+
+    async def main():
+        first, second = WorkflowContext("a"), WorkflowContext("b")
+        with workflow_scope(first):
+            first_run = asyncio.create_task(tool._arun("open a"))
+        with workflow_scope(second):
+            second_run = asyncio.create_task(tool._arun("open b"))
+        await asyncio.sleep(0.05)
+
+        assert [agent.task for agent in first.browser_agents] == ["open a"]
+        assert [agent.task for agent in second.browser_agents] == ["open b"]
+        (first_agent,) = first.browser_agents
+        (second_agent,) = second.browser_agents
+
+        await browser.terminate_workflow_browsers(first)
+        first_run.cancel()
+        assert first_agent.browser.closed and not second_agent.browser.closed
+        assert not first.browser_agents and second.browser_agents
+
+        second_run.cancel()
+        await asyncio.gather(first_run, second_run, return_exceptions=True)
+        # Finishing a run closes its browser and stops tracking it
+        assert second_agent.browser.closed and not second.browser_agents
+
+    asyncio.run(main())